@@ -17,6 +17,10 @@ class Params {
         if (params.metaspadesKmerSize.toString().split(" ").size() <= 1) {if (params.metaspadesKmerSize.toString() != 'auto') {print_error("'--metaspadesKmerSize' parameter must be a sequence of space separated numbers or 'auto'. Provided value: '$params.metaspadesKmerSize'")}}
         if (params.spadesKmerSize.toString().split(" ").size() <= 1) {if (params.spadesKmerSize.toString() != 'auto'){print_error("'--spadesKmerSize' parameter must be a sequence of space separated numbers or 'auto'. Provided value: '$params.spadesKmerSize'")}}
         if (!params.minLength.toString().isNumber()) {print_error("'--minLength' parameter must be a number. Provided value: '$params.minLength'")}
+        if (!(params.single_read_mapping instanceof Boolean)) {print_error("'--single_read_mapping' parameter must be a boolean. Provided value: '$params.single_read_mapping'")}
+        if (!(params.keep_read_sam instanceof Boolean)) {print_error("'--keep_read_sam' parameter must be a boolean. Provided value: '$params.keep_read_sam'")}
+        if (!params.reference_overlap.toString().isInteger()) {print_error("'--reference_overlap' parameter must be an integer. Provided value: '$params.reference_overlap'")}
+        if (!(params.html_plots in ['standalone', 'directory', 'cdn', 'none'])) {print_error("'--html_plots' parameter must be one of 'standalone', 'directory', 'cdn' or 'none'. Provided value: '$params.html_plots'")}
 
     }
 
@@ -46,6 +46,14 @@ class Help {
         println "    --mapped_reads_threshold   Value for the minimum percentage of a read aligning to the"
         println "                               contig to be considered as mapped."
         println "                               (default: $params.mapped_reads_threshold)"
+        println "    --single_read_mapping      Boolean to map the reads only to the original assembly and get the"
+        println "                               mapped reads of the filtered assembly from its contigs."
+        println "                               (default: $params.single_read_mapping)"
+        println "    --keep_read_sam            Boolean to keep the SAM files of the reads mapped to the assemblies."
+        println "                               (default: $params.keep_read_sam)"
+        println "    --reference_overlap        Length of the wrap-around overlap added to the end of each reference"
+        println "                               replicon, in basepairs. If 0, each replicon is tripled."
+        println "                               (default: $params.reference_overlap)"
         println ""
         println "Assembly quality assessment parameters:"
         println "    --n_target                 Target value for the N, NA and NG metrics, ranging from 0 to 1."
@@ -55,6 +63,10 @@ class Help {
         println "    --plot_scale               Scale of x-axis for the L, NA and NG metrics plots."
         println "                               Allowed values: 'linear' or 'log'."
         println "                               (default: $params.plot_scale)"
+        println "    --html_plots               How plotly.js is included in the standalone HTML plots in results/plots/."
+        println "                               Allowed values: 'standalone', 'directory' (one shared plotly.min.js),"
+        println "                               'cdn' or 'none' (no HTML plots)."
+        println "                               (default: $params.html_plots)"
         println ""
         println "Assembly execution parameters:"
         println "    --abyss                    Boolean controling the execution of the ABySS assembler."
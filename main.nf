@@ -69,21 +69,22 @@ workflow {
     assembly_wf(IN_fastq_raw)
 
     mapping_wf(assembly_wf.out.all_assemblies, 
-               preprocessing_wf.out.triple_reference)
+               preprocessing_wf.out.triple_reference,
+               preprocessing_wf.out.reference_catalogue,
+               preprocessing_wf.out.reads_report)
 
-    postprocessing_wf(preprocessing_wf.out.triple_reference,
+    postprocessing_wf(preprocessing_wf.out.reference_catalogue,
                       mapping_wf.out.boc_csv, 
                       mapping_wf.out.lx_csv, 
                       mapping_wf.out.nax_csv,
                       mapping_wf.out.ngx_csv,
                       mapping_wf.out.phred_csv,
                       mapping_wf.out.df_csv,
-                      mapping_wf.out.paf,
-                      mapping_wf.out.misassembly_paf)
+                      mapping_wf.out.paf)
  
     report_wf(preprocessing_wf.out.reads_info | collect, 
               mapping_wf.out.stats_global, 
-              IN_reference_raw, 
+              preprocessing_wf.out.reference_catalogue, 
               postprocessing_wf.out.contig_distribution_json, 
               mapping_wf.out.stats_mapping, 
               postprocessing_wf.out.completness_json, 
@@ -25,10 +25,11 @@ process READ_MAPPING{
     publishDir "results/$sample_id/mapping/reads"
 
     input:
-    tuple val(sample_id), val(assembler), path(assembly), path(filtered_assembly)
+    tuple val(sample_id), val(assembler), path(assembly), path(filtered_assembly), path(reads_report)
 
     output:
     path('*_read_mapping_*.txt') optional true
+    path('*_read_mapping_*.sam') optional true
     tuple val(sample_id), val(assembler), path('*_read_mapping_report.json'), emit: read_mapping_json
 
     script:
@@ -55,24 +56,19 @@ process ASSEMBLY_MAPPING{
     """
 }
 
-process ASSEMBLY_MAPPING_MISASSEMBLY{
+process CONVERT_PAF {
 
     tag { sample_id; assembler }
-    label 'process_mapping'
-    publishDir "results/$sample_id/mapping/assembly"
+    label 'process_script'
 
     input:
-    tuple val(sample_id), val(assembler), path(assembly) 
-    each path(reference)
+    tuple val(sample_id), val(assembler), path(assembly), path(mapping)
 
     output:
-    tuple val(sample_id), val(assembler), path(assembly), path('*.paf')
+    tuple val(sample_id), val(assembler), path(assembly), path('*.parquet')
 
     script:
-    """
-    minimap2 --cs -N 50 --secondary=no -t $task.cpus -r 10000 -g 10000 -x asm20 --eqx ${reference} ${assembly} \
-    > ${sample_id}_${assembler}.paf
-    """
+    template "convert_paf.py"
 }
 
 process ASSEMBLY_STATS_GLOBAL {
@@ -110,13 +106,13 @@ process PROCESS_ASSEMBLY_STATS_GLOBAL {
 
 process ASSEMBLY_STATS_MAPPING {
 
-    tag { assembler }
+    tag { sample_id }
     label 'process_script'
     publishDir "results/$sample_id/stats/"
 
     input:
     tuple val(sample_id), val(assembler), path(assembly), path(mapping) 
-    each reference
+    each path(reference_catalogue)
 
     output:
     path('*_report.json'), emit: json
@@ -153,23 +149,37 @@ workflow mapping_wf {
 
     minLength = Channel.value(params.minLength) 
 
+    // number of assemblies per sample, one per assembler enabled (failed assemblers emit an empty assembly)
+    n_assemblers = [params.abyss, params.gatb_minia, params.idba, params.megahit, params.metahipmer2,
+                    params.metaspades, params.minia, params.skesa, params.spades, params.strainxpress,
+                    params.unicycler, params.velvetoptimiser].count { it }
+
     take:
     assembly
     triple_reference
+    reference_catalogue
+    reads_report
 
     main:
     FILTER_ASSEMBLY(assembly, minLength)
-    READ_MAPPING(assembly | join(FILTER_ASSEMBLY.out, by:[0,1]))
+    READ_MAPPING(assembly | join(FILTER_ASSEMBLY.out, by:[0,1]) | combine(reads_report, by:0))
     ASSEMBLY_MAPPING(FILTER_ASSEMBLY.out, triple_reference)
-    ASSEMBLY_MAPPING_MISASSEMBLY(FILTER_ASSEMBLY.out, triple_reference)
+    CONVERT_PAF(ASSEMBLY_MAPPING.out)
     ASSEMBLY_STATS_GLOBAL(assembly | join(READ_MAPPING.out.read_mapping_json, by:[0,1]))
     PROCESS_ASSEMBLY_STATS_GLOBAL(ASSEMBLY_STATS_GLOBAL.out.tsv | collect, ASSEMBLY_STATS_GLOBAL.out.json | collect)
-    ASSEMBLY_STATS_MAPPING(ASSEMBLY_MAPPING.out, triple_reference)
+    // the assemblies of each sample are released as soon as all of them are converted, with the remainder
+    // emitted at the end in case a task was ignored
+    ASSEMBLY_STATS_MAPPING(CONVERT_PAF.out
+                           .map { sample_id, assembler, assembly, mapping ->
+                                  tuple(groupKey(sample_id, n_assemblers), assembler, assembly, mapping) }
+                           .groupTuple(remainder: true)
+                           .map { sample_key, assemblers, assemblies, mappings ->
+                                  tuple(sample_key.toString(), assemblers, assemblies, mappings) },
+                           reference_catalogue)
     PROCESS_ASSEMBLY_STATS_MAPPING(ASSEMBLY_STATS_MAPPING.out.json | collect)
 
     emit:
-    paf = ASSEMBLY_MAPPING.out
-    misassembly_paf = ASSEMBLY_MAPPING_MISASSEMBLY.out
+    paf = CONVERT_PAF.out
     stats_global = PROCESS_ASSEMBLY_STATS_GLOBAL.out
     stats_mapping = PROCESS_ASSEMBLY_STATS_MAPPING.out
     boc_csv = ASSEMBLY_STATS_MAPPING.out.boc_csv | collect
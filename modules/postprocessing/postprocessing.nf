@@ -4,13 +4,13 @@ nextflow.enable.dsl=2
 process PROCESS_COMPLETNESS {
 
     label 'process_script'
-    publishDir 'results/plots/', pattern: '*.html'
+    publishDir 'results/plots/', pattern: '*.{html,js}'
 
     input:
     path coverage_files 
 
     output:
-    path('*.html') optional true
+    path('*.{html,js}') optional true
     path('completness_plots.json'), emit: json
 
     script:
@@ -20,14 +20,14 @@ process PROCESS_COMPLETNESS {
 process PLOT_LX {
 
     label 'process_script'
-    publishDir 'results/plots/', pattern: '*.html'
+    publishDir 'results/plots/', pattern: '*.{html,js}'
 
     input:
     path lx_files 
     val(scale) 
 
     output:
-    path('*.html') optional true
+    path('*.{html,js}') optional true
     path('lx.json'), emit: json
 
     script:
@@ -37,14 +37,14 @@ process PLOT_LX {
 process PLOT_NAX {
 
     label 'process_script'
-    publishDir 'results/plots/', pattern: '*.html'
+    publishDir 'results/plots/', pattern: '*.{html,js}'
 
     input:
     path nax_files
     val(scale)
 
     output:
-    path('*.html') optional true
+    path('*.{html,js}') optional true
     path('nax.json'), emit: json
 
     script:
@@ -54,14 +54,14 @@ process PLOT_NAX {
 process PLOT_NGX {
 
     label 'process_script'
-    publishDir 'results/plots/', pattern: '*.html'
+    publishDir 'results/plots/', pattern: '*.{html,js}'
 
     input:
     path ngx_files 
     val(scale) 
 
     output:
-    path('*.html') optional true
+    path('*.{html,js}') optional true
     path('ngx.json'), emit: json
 
     script:
@@ -71,13 +71,13 @@ process PLOT_NGX {
 process PROCESS_SHRIMP_PLOT {
 
     label 'process_script'
-    publishDir 'results/plots/', pattern: '*.html'
+    publishDir 'results/plots/', pattern: '*.{html,js}'
 
     input:
     path phred_files 
 
     output:
-    path('*.html') optional true
+    path('*.{html,js}') optional true
     path('phred.json'), emit: json
 
     script:
@@ -87,13 +87,13 @@ process PROCESS_SHRIMP_PLOT {
 process PLOT_CONTIG_DISTRIBUTION {
 
     label 'process_script'
-    publishDir 'results/plots/', pattern: '*.html'
+    publishDir 'results/plots/', pattern: '*.{html,js}'
 
     input:
     path dataframes 
 
     output:
-    path('*.html') optional true
+    path('*.{html,js}') optional true
     path('*.json'), emit: json
 
     script:
@@ -108,7 +108,7 @@ process GAP_ASSESSMENT {
 
     input:
     tuple val(sample_id), val(assembler), path(assembly), path(mapping) 
-    each reference 
+    each path(reference_catalogue)
 
     output:
     path('*_gap_dict.json'), emit: json
@@ -121,13 +121,13 @@ process GAP_ASSESSMENT {
 process PLOT_GAP_BOXPLOT {
 
     label 'process_script'
-    publishDir 'results/plots/', pattern: '*.html'
+    publishDir 'results/plots/', pattern: '*.{html,js}'
 
     input:
     path gap_distance_json 
 
     output:
-    path('*.html') optional true
+    path('*.{html,js}') optional true
     path('*gap_distance_histogram.json'), emit: json
 
     script:
@@ -138,13 +138,13 @@ process PLOT_GAP_BOXPLOT {
 process PLOT_GAP_REFERENCE {
 
     label 'process_script'
-    publishDir 'results/plots/', pattern: '*.html'
+    publishDir 'results/plots/', pattern: '*.{html,js}'
 
     input:
     path gap_coords_dataframes 
 
     output:
-    path('*.html') optional true
+    path('*.{html,js}') optional true
     path('*.json'), emit: json
 
     script:
@@ -159,7 +159,7 @@ process SNP_ASSESSMENT {
 
     input:
     tuple val(sample_id), val(assembler), path(assembly), path(mapping) 
-    each reference
+    each path(reference_catalogue)
 
     output:
     path('*.tsv'), emit: tsv
@@ -173,14 +173,14 @@ process SNP_ASSESSMENT {
 process PLOT_SNP_REFERENCE {
 
     label 'process_script'
-    publishDir 'results/plots/', pattern: '*.html'
+    publishDir 'results/plots/', pattern: '*.{html,js}'
 
     input:
     path snp_coords_dataframes 
     path snps_jsons
 
     output:
-    path('*.html') optional true
+    path('*.{html,js}') optional true
     path('snps_in_reference.json'), emit: json
     path('snps_report_per_ref.json'), emit: reference_snps_json
 
@@ -195,10 +195,10 @@ process MISASSEMBLY {
 
     input:
     tuple val(sample_id), val(assembler), path(assembly), path(mapping) 
+    each path(reference_catalogue)
 
     output:
-    path('*_trace.pkl'), emit: trace_pkl
-    path('*_contig_lenght.pkl'), emit: contig_length_pkl
+    path('*_misassembled_contigs.parquet'), emit: contigs_parquet
     path('*_misassembly.json'), emit: misassembly_json
     path('*_misassembled_reference.json'), emit: misassembled_reference_json
     path('*_misassembly.csv'), emit: csv
@@ -211,16 +211,15 @@ process MISASSEMBLY {
 process PROCESS_MISASSEMBLY {
 
     label 'process_script'
-    publishDir 'results/plots/', pattern: '*.html'
+    publishDir 'results/plots/', pattern: '*.{html,js}'
 
     input:
-    path misassembly_trace 
     path misassembly_contigs
     path report_data 
     path report_per_reference 
 
     output: 
-    path('*.html') optional true
+    path('*.{html,js}') optional true
     path('*_misassembly.json'), emit: json
     path('misassembly_report.json'), emit: report_json
     path('misassembly_report_per_ref.json'), emit: reference_json
@@ -233,13 +232,13 @@ process PROCESS_MISASSEMBLY {
 process PLOT_MISASSEMBLY {
 
     label 'process_script'
-    publishDir 'results/plots/', pattern: '*.html'
+    publishDir 'results/plots/', pattern: '*.{html,js}'
 
     input:
     path misassembly_dataframes 
 
     output:
-    path('*.html') optional true
+    path('*.{html,js}') optional true
     path('*.json'), emit: json
 
     script:
@@ -260,7 +259,7 @@ workflow postprocessing_wf {
     }
 
     take:
-    triple_reference
+    reference_catalogue
     boc_csv
     lx_csv
     nax_csv
@@ -268,7 +267,6 @@ workflow postprocessing_wf {
     phred_csv
     mapping_df_csv
     paf
-    misassembly_paf
 
     main:
     PROCESS_COMPLETNESS(boc_csv | collect)
@@ -277,13 +275,13 @@ workflow postprocessing_wf {
     PLOT_NGX(ngx_csv, IN_PLOT_SCALE)
     PROCESS_SHRIMP_PLOT(phred_csv)
     PLOT_CONTIG_DISTRIBUTION(mapping_df_csv)
-    GAP_ASSESSMENT(paf, triple_reference)
+    GAP_ASSESSMENT(paf, reference_catalogue)
     PLOT_GAP_BOXPLOT(GAP_ASSESSMENT.out.json | collect)
     PLOT_GAP_REFERENCE(GAP_ASSESSMENT.out.csv | collect)
-    SNP_ASSESSMENT(paf, triple_reference)
+    SNP_ASSESSMENT(paf, reference_catalogue)
     PLOT_SNP_REFERENCE(SNP_ASSESSMENT.out.csv | collect, SNP_ASSESSMENT.out.json | collect)
-    MISASSEMBLY(misassembly_paf)
-    PROCESS_MISASSEMBLY(MISASSEMBLY.out.trace_pkl | collect, MISASSEMBLY.out.contig_length_pkl | collect, MISASSEMBLY.out.misassembly_json | collect, MISASSEMBLY.out.misassembled_reference_json | collect)
+    MISASSEMBLY(paf, reference_catalogue)
+    PROCESS_MISASSEMBLY(MISASSEMBLY.out.contigs_parquet | collect, MISASSEMBLY.out.misassembly_json | collect, MISASSEMBLY.out.misassembled_reference_json | collect)
     PLOT_MISASSEMBLY(MISASSEMBLY.out.csv | collect)
 
     emit:
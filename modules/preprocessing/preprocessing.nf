@@ -9,7 +9,8 @@ process PROCESS_REFERENCE {
     path reference_fasta 
 
     output:
-    path('triple_reference.fasta')
+    path('triple_reference.fasta'), emit: fasta
+    path('reference_catalogue.json'), emit: catalogue
 
     script:
     template "process_reference.py"
@@ -24,7 +25,8 @@ process PROCESS_READS {
     tuple val(sample_id), path(fastq) 
 
     output:
-    path('*_reads_report.json')
+    path('*_reads_report.json'), emit: json
+    tuple val(sample_id), path('*_reads_report.json'), emit: report
 
     script:
     template "process_reads.py"
@@ -42,6 +44,8 @@ workflow preprocessing_wf {
     PROCESS_READS(fastq)
 
     emit:
-    triple_reference = PROCESS_REFERENCE.out
-    reads_info = PROCESS_READS.out
+    triple_reference = PROCESS_REFERENCE.out.fasta
+    reference_catalogue = PROCESS_REFERENCE.out.catalogue
+    reads_info = PROCESS_READS.out.json
+    reads_report = PROCESS_READS.out.report
 }
\ No newline at end of file
@@ -26,7 +26,7 @@ process COMPILE_REPORT {
     file pipeline_stats
     file js
     file lmas_png 
-    file reference_file
+    file reference_catalogue
     file contig_size_distribution 
     file mapping_assembly_stats 
     file completness_plots 
@@ -49,6 +49,7 @@ process COMPILE_REPORT {
     output:
     path('pipeline_report*.json')
     path('index.html')
+    path('report_data')
     path('main.js')
     path('*.jpg')
     path('performance_metadata.json')
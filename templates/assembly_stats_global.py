@@ -44,7 +44,6 @@ https://github.com/cimendes
 
 import os
 import json
-import re
 try:
     import utils
 except ImportError:
@@ -75,8 +74,8 @@ if __file__.endswith(".command.sh"):
 
 def get_contig_lists(fasta, min_len):
     """
-    From a fasta iterator, get lists with contig lengths
-    :param fasta: yield tuples of header, sequence
+    From a fasta statistics iterator, get lists with contig lengths
+    :param fasta: yield tuples of header, sequence length, Ns and GC (utils.fasta_stats_iter)
     :param min_len: minimum contig lenght
     :return:
         - contig_len: list with all contig lenghts in the assembly
@@ -87,12 +86,12 @@ def get_contig_lists(fasta, min_len):
     Ns_all = 0
     Ns_over_1000 = 0
 
-    for header, seq in fasta:
-        Ns_all += len(re.findall("N", seq.upper()))
-        if len(seq) > int(min_len):
-            contigs_len_over_1000.append(len(seq))
-            Ns_over_1000 += len(re.findall("N", seq.upper()))
-        contigs_len.append(len(seq))
+    for header, seq_len, Ns, _ in fasta:
+        Ns_all += Ns
+        if seq_len > int(min_len):
+            contigs_len_over_1000.append(seq_len)
+            Ns_over_1000 += Ns
+        contigs_len.append(seq_len)
 
     return contigs_len, contigs_len_over_1000, Ns_all, Ns_over_1000
 
@@ -100,7 +99,7 @@ def get_contig_lists(fasta, min_len):
 def main(sample_id, assembler, assembly, read_mapping_stats, min_len, n_target):
     
 
-    contigs, contigs_over_min_len, Ns_all, Ns_over_1000 = get_contig_lists(utils.fasta_iter(assembly), min_len)
+    contigs, contigs_over_min_len, Ns_all, Ns_over_1000 = get_contig_lists(utils.fasta_stats_iter(assembly), min_len)
 
     n50_contigs = utils.get_Nx(contigs, n_target)
     n50_contigs_over_min_len = utils.get_Nx(contigs_over_min_len, n_target)
@@ -28,18 +28,21 @@ The following variables are expected whether using NextFlow or the
 :py:func:`main` executor.
 - ``sample_id``: Sample Identification string.
     - e.g.: ``'SampleA'``
-- ``assembler``: String with assembler name.
+- ``assembler``: String with assembler name (or list of names, in batch mode).
     - e.g.: ``'SPAdes'``
-- ``assembly``: fasta file from the assembler (filtered for minimum length size)
+- ``assembly``: fasta file from the assembler (filtered for minimum length size), or list of files
     - e.g.: ``'spades.fasta'``
-- ``mapping``: paf file of the assembly mapped to the complete triple reference genomes
+- ``mapping``: paf file of the assembly mapped to the complete triple reference genomes, or its Parquet cache,
+  or list of files
     - e.g.: ``'spades.paf' ``
-- ``reference``: fasta file of the complete triple reference genomes
-    - e.g.: ``'reference.fasta' ``
+- ``reference``: reference catalogue JSON (or fasta file of the complete triple reference genomes)
+    - e.g.: ``'reference_catalogue.json' ``
 - ``n_target``: target percetange, in float, for the NA and NG metrics
     - e.g.: ``'0.5' ``
 - ``l_target``: target percetange, in float, for the L metric
     - e.g.: ``'0.9' ``
+- ``cpus``: number of worker processes used to process the assemblies in batch mode
+    - e.g.: ``'2' ``
 
 Authorship
 ----------
@@ -49,11 +52,8 @@ https://github.com/cimendes
 
 import os
 import math
-import re
 import json
-import pandas as pd
-import numpy as np
-from itertools import groupby
+from concurrent.futures import ProcessPoolExecutor
 try:
     import utils
 except ImportError:
@@ -67,12 +67,13 @@ logger = utils.get_logger(__file__)
 
 if __file__.endswith(".command.sh"):
     SAMPLE_ID = '$sample_id'
-    ASSEMBLER = '$assembler'
-    ASSEMBLY = '$assembly'
-    MAPPING = '$mapping'
-    REFERENCE = '$reference'
+    ASSEMBLER = '${assembler.join(" ")}'.split()
+    ASSEMBLY = '$assembly'.split()
+    MAPPING = '$mapping'.split()
+    REFERENCE = '$reference_catalogue'
     N_TARGET = float("$params.n_target")
     L_TARGET = float("$params.l_target")
+    CPUS = int("$task.cpus")
     logger.debug("Running {} with parameters:".format(
         os.path.basename(__file__)))
     logger.debug("SAMPLE_ID: {}".format(SAMPLE_ID))
@@ -82,6 +83,7 @@ if __file__.endswith(".command.sh"):
     logger.debug("REFERENCE: {}".format(REFERENCE))
     logger.debug("N_TARGET: {}".format(N_TARGET))
     logger.debug("L_TARGET: {}".format(L_TARGET))
+    logger.debug("CPUS: {}".format(CPUS))
 
 
 def get_adjusted_basematches(contig_coords, base_matches):
@@ -103,21 +105,13 @@ def get_covered_bases(covered_bases_list, ref_len):
     :param ref_len: expected reference length
     :return: % of reference covered by the alignment
     """
-    sorted_list = sorted(covered_bases_list, key=lambda x: x[0])
+    # Due to the triple reference, the values need to be adjusted as not to over-estimate coverage breadth.
+    covered_bases, _, _ = utils.get_interval_stats(covered_bases_list, ref_len)
 
-    covered_bases = set()
-
-    for item in sorted_list:
-        start, stop = map(int, item[:])
-
-        # Due to the triple reference, the values need to be adjusted as not to over-estimate coverage breadth.
-        for base in range(start, stop):
-            covered_bases.add(utils.adjust_reference_coord(base, ref_len))
-
-    if len(covered_bases) == 0:
+    if covered_bases == 0:
         return 0 
     else: 
-        return len(covered_bases) - 1 #0 based index
+        return covered_bases - 1 #0 based index
 
 
 def get_aligned_bases(alignment_coods):
@@ -127,15 +121,7 @@ def get_aligned_bases(alignment_coods):
                             query end in the contig
     :return: length of bases in a contig that align to a reference
     """
-    sorted_list = sorted(alignment_coods, key=lambda x: x[0])
-
-    aligned_bases = set()
-    for item in sorted_list:
-        start, stop = map(int, item[:])
-        for base in range(start, stop):
-            aligned_bases.add(base)
-
-    alignment_block_len = len(aligned_bases)
+    alignment_block_len, _, _ = utils.get_interval_stats(alignment_coods)
     return alignment_block_len
 
 
@@ -162,165 +148,188 @@ def get_phred_quality_score(identity):
     return - math.log10(1-identity) * 10 if identity < 1 else 60
 
 
-def mapping_stats(sample_id, assembler, df, mapping_list, n_target, l_target):
+def reference_stats(assembler, alignment_dict, mapped_contigs, ns, n_target, l_target):
+    """
+    Computes the mapping statistics of an assembler for a single reference. The references are independent,
+    so this can run in a worker process.
+    :param assembler: string with assembler name
+    :param alignment_dict: dict with the mapping information for the reference, from :py:func:`parse_paf_file`
+    :param mapped_contigs: list with the lengths of the contigs mapped to the reference
+    :param ns: int with the number of uncalled bases in the contigs mapped to the reference
+    :param n_target: Target percentage reference length for NA and NG metrics
+    :param l_target: Target percentage reference length for L metric
+    :return: dict with the contiguity curves, the phred scores per contig, the breadth of coverage and the
+             stats for the report
+    """
+
+    import numpy as np
+
+    logger.debug("Calculating stats for {}".format(
+        alignment_dict['Reference']))
+
+    # targets for the contiguity curves
+    targets = np.round(np.arange(0.0, 1.01, 0.01), 2)
+
+    # Contiguity
+    nax, ngx, lx = utils.get_contiguity_curves(
+        mapped_contigs, alignment_dict['Reference_Length'], targets)
+
+    na50 = utils.get_Nx(mapped_contigs, n_target)
+    ng50 = utils.get_NGx(
+        mapped_contigs, alignment_dict['Reference_Length'], n_target)
+    l90 = utils.get_Lx(
+        mapped_contigs, alignment_dict['Reference_Length'], l_target)
+
+    # Calculate identity and Phred Score for all the contigs:
+    sum_contig_length = 0
+    alignment_block_list = []
+    n_identity = []
+    phred = {'Contig': [], 'Contig Length': [], 'Phred Quality Score': []}
+    for contig in alignment_dict['Contigs'].keys():
+        sum_contig_length += alignment_dict['Contigs'][contig]['Length']
+
+        # Sometimes this value is > 1 when a contig is split into multiple alignment blocks
+        # that overlap
+        contig_identity = alignment_dict['Contigs'][contig]['Base_Matches'] / \
+            alignment_dict['Contigs'][contig]['Length']
+        if contig_identity <= 1: # sanity test
+            n_identity.append(contig_identity)
+        else: # in case of an overlap, consider identity as 1 as all bases match the reference
+            n_identity.append(1)
+
+        phred['Contig'].append(contig)
+        phred['Contig Length'].append(alignment_dict['Contigs'][contig]['Length'])
+        phred['Phred Quality Score'].append(get_phred_quality_score(contig_identity))
+
+        # If a contig is broken into multiple blocks
+        # the coords are adjusted when calculating the length
+        if len(alignment_dict['Contigs'][contig]['Alignment_Blocks_Coords']) > 1:
+            alignment_block_len = get_aligned_bases(
+                alignment_dict['Contigs'][contig]['Alignment_Blocks_Coords'])
+            alignment_block_list.append(alignment_block_len)
+        else:
+            alignment_block_len = alignment_dict['Contigs'][contig]['Alignment_Blocks_Coords'][0][1] - \
+                alignment_dict['Contigs'][contig]['Alignment_Blocks_Coords'][0][0]
+            alignment_block_list.append(alignment_block_len)
+
+    identity, lowest_identity = get_identity(n_identity)
+
+    # Contiguity
+    contiguity = alignment_dict['Longest_Alignment'] / \
+        alignment_dict['Reference_Length']
+
+    # COMPASS Metrics
+    sum_ci = get_covered_bases(
+        alignment_dict['Covered_Bases'], alignment_dict['Reference_Length'])
+    sum_ri = alignment_dict['Reference_Length']
+    sum_ai = sum(alignment_block_list)
+    sum_si = sum_contig_length
+
+    coverage = sum_ci / sum_ri
+
+    validity = sum_ai / sum_si if sum_si != 0 else 0
+
+    multiplicity = sum_ai / sum_ci if sum_ci != 0 else 0
+
+    parsimony = sum_si / sum_ci if sum_ci != 0 else 0
+
+    stats = {
+        "assembler": assembler,
+        "contiguity": contiguity,
+        "multiplicity": multiplicity,
+        "validity": validity,
+        "parsimony": parsimony,
+        "identity": identity,
+        "lowest_identity": lowest_identity,
+        "breadth_of_coverage": coverage,
+        "L90": l90,
+        "aligned_contigs": len(mapped_contigs),
+        "NA50": na50,
+        "NG50": ng50,
+        "aligned_basepairs": sum_ci,
+        "Ns": ns,
+    }
+
+    logger.debug("  - Stats json: {}".format(stats))
+
+    return {'nax': nax, 'ngx': ngx, 'lx': lx, 'phred': phred, 'coverage': coverage, 'stats': stats}
+
+
+def mapping_stats(sample_id, assembler, df, mapping_list, n_target, l_target, cpus=1):
     """
-    Parses mapping and assembly data and returns mapping statistics
+    Parses mapping and assembly data and returns mapping statistics. The stats of each reference are
+    computed by :py:func:`reference_stats`, in a pool of `cpus` worker processes if more than one is
+    available, and merged in the order of the mapping_list.
     :param sample_id: string with sample identifier
-    :param df: pandas DataFrame with assembly stats
-    :param mapping: paf file
-    :param reference: path triple reference fasta file
     :param assembler: string with assembler name
+    :param df: pandas DataFrame with assembly stats
+    :param mapping_list: list of dicts with the mapping information per reference, from :py:func:`parse_paf_file`
     :param n_target: Target percentage reference length for NA and NG metrics
     :param l_target: Target percentage reference length for L metric
-    :return: pandas Dataframe with columns Reference, Assembler and C90
+    :param cpus: int with the number of worker processes for the per reference stats
+    :return: pandas Dataframes for the NAx, NGx, Lx, phred score and breadth of coverage plots, and the dict
+             with the mapping stats for the report
     """
 
+    import numpy as np
+
     # Dataframe for Phred Score plot
-    df_phred = pd.DataFrame(columns=[
-                            'Assembler', 'Reference', 'Contig', 'Contig Length', 'Phred Quality Score'])
+    df_phred = utils.DataFrameBuilder(
+        ['Assembler', 'Reference', 'Contig', 'Contig Length', 'Phred Quality Score'])
 
     # Dataframes for assembly stats
-    df_na = pd.DataFrame(
-        columns=['Reference', 'Assembler', 'NAx', 'Basepairs'])
-    df_ng = pd.DataFrame(
-        columns=['Reference', 'Assembler', 'NGx', 'Basepairs'])
-    df_lx = pd.DataFrame(columns=['Reference', 'Assembler', 'Lx', 'nContigs'])
+    df_na = utils.DataFrameBuilder(['Reference', 'Assembler', 'NAx', 'Basepairs'])
+    df_ng = utils.DataFrameBuilder(['Reference', 'Assembler', 'NGx', 'Basepairs'])
+    df_lx = utils.DataFrameBuilder(['Reference', 'Assembler', 'Lx', 'nContigs'])
 
-    df_coverage = pd.DataFrame(
-        columns=['Reference', 'Breadth of Coverage', 'Contigs'])
+    # targets for the contiguity curves
+    targets = np.round(np.arange(0.0, 1.01, 0.01), 2)
+    targets_percentage = np.round(targets * 100).astype(int)
+
+    df_coverage = utils.DataFrameBuilder(
+        ['Reference', 'Breadth of Coverage', 'Contigs'])
 
     # Mapping stats dict
     mapping_stats_dict = {
         "sample_id": sample_id,
         "ReferenceTables": {}}
 
-    # filter dataframe for the assembler
+    # filter dataframe for the assembler and split the mapped contigs per reference
     df_assembler = df[df['Assembler'] == assembler]
+    contigs_per_reference = {reference: (df_reference['Contig Len'].unique().astype('int').tolist(),
+                                         sum(df_reference['#N'].astype('int').tolist()))
+                             for reference, df_reference in df_assembler.groupby('Mapped', sort=False)}
 
     # calculate stats per reference
-    for alignment_dict in mapping_list:
-
-        logger.debug("Calculating stats for {}".format(
-            alignment_dict['Reference']))
-
-        df_assembler_reference = df_assembler[df_assembler['Mapped']
-                                              == alignment_dict['Reference']]
-
-        mapped_contigs = df_assembler_reference['Contig Len'].unique().astype(
-            'int').tolist()
-
-        # Uncalled bases
-        Ns = sum(df_assembler_reference['#N'].astype('int').tolist())
-
-        # Contiguity
-        for x in np.arange(0.0, 1.01, 0.01):
-
-            x = round(x, 2) 
-
-            # NAx
-            nax = utils.get_Nx(mapped_contigs, x)
-            df_na = df_na.append({'Reference': alignment_dict['Reference'], 'Assembler': assembler,
-                                  'NAx': round(x*100), 'Basepairs': nax}, ignore_index=True)
-            # NGx
-            ngx = utils.get_NGx(
-                mapped_contigs, alignment_dict['Reference_Length'], x)
-            df_ng = df_ng.append({'Reference': alignment_dict['Reference'], 'Assembler': assembler,
-                                  'NGx': round(x*100), 'Basepairs': ngx}, ignore_index=True)
-            # Lx
-            lx = utils.get_Lx(
-                mapped_contigs, alignment_dict['Reference_Length'], x)
-            df_lx = df_lx.append({'Reference': alignment_dict['Reference'], 'Assembler': assembler,
-                                  'Lx': round(x*100), 'nContigs': lx}, ignore_index=True)
-
-        na50 = utils.get_Nx(mapped_contigs, n_target)
-        ng50 = utils.get_NGx(
-            mapped_contigs, alignment_dict['Reference_Length'], n_target)
-        l90 = utils.get_Lx(
-            mapped_contigs, alignment_dict['Reference_Length'], l_target)
-
-        # Calculate identity and Phred Score for all the contigs:
-        sum_contig_length = 0
-        alignment_block_list = []
-        n_identity = []
-        for contig in alignment_dict['Contigs'].keys():
-            sum_contig_length += alignment_dict['Contigs'][contig]['Length']
-
-            # Sometimes this value is > 1 when a contig is split into multiple alignment blocks
-            # that overlap
-            alignment_dict['Contigs'][contig]['Identity'] = alignment_dict['Contigs'][contig]['Base_Matches'] / \
-                alignment_dict['Contigs'][contig]['Length']
-            if alignment_dict['Contigs'][contig]['Identity'] <= 1: # sanity test
-                n_identity.append(alignment_dict['Contigs'][contig]['Identity'])
-            else: # in case of an overlap, consider identity as 1 as all bases match the reference
-                n_identity.append(1)
-
-            alignment_dict['Contigs'][contig]['Phred'] = get_phred_quality_score(
-                alignment_dict['Contigs'][contig]['Identity'])
-            df_phred = df_phred.append({'Assembler': assembler,
-                                        'Reference': alignment_dict['Reference'],
-                                        'Contig': contig,
-                                        'Contig Length': alignment_dict['Contigs'][contig]['Length'],
-                                        'Phred Quality Score': alignment_dict['Contigs'][contig]['Phred']
-                                        }, ignore_index=True)
-
-            # If a contig is broken into multiple blocks
-            # the coords are adjusted when calculating the length
-            if len(alignment_dict['Contigs'][contig]['Alignment_Blocks_Coords']) > 1:
-                alignment_block_len = get_aligned_bases(
-                    alignment_dict['Contigs'][contig]['Alignment_Blocks_Coords'])
-                alignment_block_list.append(alignment_block_len)
-            else:
-                alignment_block_len = alignment_dict['Contigs'][contig]['Alignment_Blocks_Coords'][0][1] - \
-                    alignment_dict['Contigs'][contig]['Alignment_Blocks_Coords'][0][0]
-                alignment_block_list.append(alignment_block_len)
-
-        identity, lowest_identity = get_identity(n_identity)
-
-        # Contiguity
-        contiguity = alignment_dict['Longest_Alignment'] / \
-            alignment_dict['Reference_Length']
-
-        # COMPASS Metrics
-        sum_ci = get_covered_bases(
-            alignment_dict['Covered_Bases'], alignment_dict['Reference_Length'])
-        sum_ri = alignment_dict['Reference_Length']
-        sum_ai = sum(alignment_block_list)
-        sum_si = sum_contig_length
-
-        coverage = sum_ci / sum_ri
-
-        validity = sum_ai / sum_si if sum_si != 0 else 0
-
-        multiplicity = sum_ai / sum_ci if sum_ci != 0 else 0
-
-        parsimony = sum_si / sum_ci if sum_ci != 0 else 0
+    tasks = [(assembler, alignment_dict) + contigs_per_reference.get(alignment_dict['Reference'], ([], 0)) +
+             (n_target, l_target) for alignment_dict in mapping_list]
+    if cpus > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(cpus, len(tasks))) as executor:
+            results = list(executor.map(reference_stats, *zip(*tasks), chunksize=max(1, len(tasks) // (4 * cpus))))
+    else:
+        results = [reference_stats(*task) for task in tasks]
+
+    # merge the results in the order of the references
+    for alignment_dict, result in zip(mapping_list, results):
+        reference = alignment_dict['Reference']
+
+        df_na.extend({'Reference': reference, 'Assembler': assembler,
+                      'NAx': targets_percentage, 'Basepairs': result['nax']})
+        df_ng.extend({'Reference': reference, 'Assembler': assembler,
+                      'NGx': targets_percentage, 'Basepairs': result['ngx']})
+        df_lx.extend({'Reference': reference, 'Assembler': assembler,
+                      'Lx': targets_percentage, 'nContigs': result['lx']})
+
+        df_phred.extend(dict(result['phred'], Assembler=assembler, Reference=reference))
 
         # Update Coverage Dataframe
-        df_coverage = df_coverage.append({'Reference': alignment_dict['Reference'],
-                                          'Breadth of Coverage': coverage, 'Contigs': len(mapped_contigs)}, ignore_index=True)
+        df_coverage.append({'Reference': reference,
+                            'Breadth of Coverage': result['coverage'], 'Contigs': result['stats']['aligned_contigs']})
 
         # Update Mapping stats dict
-        mapping_stats_dict["ReferenceTables"][alignment_dict['Reference']] = {
-            "assembler": assembler,
-            "contiguity": contiguity,
-            "multiplicity": multiplicity,
-            "validity": validity,
-            "parsimony": parsimony,
-            "identity": identity,
-            "lowest_identity": lowest_identity,
-            "breadth_of_coverage": coverage,
-            "L90": l90,
-            "aligned_contigs": len(mapped_contigs),
-            "NA50": na50,
-            "NG50": ng50,
-            "aligned_basepairs": sum_ci,
-            "Ns": Ns,
-        }
-
-        logger.debug("  - Stats json: {}".format(
-            mapping_stats_dict["ReferenceTables"][alignment_dict['Reference']]))
-
-    return df_na, df_ng, df_lx, df_phred, df_coverage, mapping_stats_dict
+        mapping_stats_dict["ReferenceTables"][reference] = result['stats']
+
+    return df_na.to_df(), df_ng.to_df(), df_lx.to_df(), df_phred.to_df(), df_coverage.to_df(), mapping_stats_dict
 
 
 def parse_paf_file(paf_filename, reference):
@@ -330,7 +339,7 @@ def parse_paf_file(paf_filename, reference):
     per reference 
 
     :param paf_filename: path for tabular file with alignment information for an assembler, in PAF format
-    :param reference: path triple reference fasta file
+    :param reference: path to the reference catalogue JSON, or to the triple reference fasta file
 
     :return:
         - alignment_dictitonary_list: list of dictionary containing the information 
@@ -338,16 +347,17 @@ def parse_paf_file(paf_filename, reference):
     """
     alignment_dictitonary_list = []
 
-    # iterator for reference files (sequence length is needed)
-    references = (x[1] for x in groupby(
-        open(reference, "r"), lambda line: line[0] == ">"))
+    # single pass over the PAF file, alignment records grouped by reference
+    paf_index = utils.index_paf(paf_filename)
+
+    # reference names and lengths from the catalogue, the sequences are not needed
+    references = utils.load_reference_catalogue(reference)['references']
 
     logger.debug("Processing mapping information for...")
 
-    for header in references:
-        reference_name = header.__next__()[1:].strip()
-        seq = "".join(s.strip() for s in references.__next__())
-        reference_length = int(len(seq)/3)
+    for reference_entry in references:
+        reference_name = reference_entry['name']
+        reference_length = reference_entry['length']
 
         logger.debug(
             "  - {} with {} basepairs".format(reference_name, reference_length))
@@ -356,43 +366,39 @@ def parse_paf_file(paf_filename, reference):
                           'Reference_Length': reference_length, 'Longest_Alignment': 0,
                           'Covered_Bases': [], 'Contigs': {}}
 
-        with open(paf_filename) as paf:
-            for line in paf:
-                parts = line.strip().split('\t')
-                if parts[5] == reference_name:
-                    # parse values from PAF file
-                    # contig info
-                    contig_name, contig_length = parts[0], int(parts[1])
-                    contig_start, contig_end = int(parts[2]), int(parts[3])
-
-                    # coords in reference
-                    ref_start, ref_end = int(parts[7]), int(parts[8])
-
-                    # number of residue matches
-                    matching_bases = int(parts[9])
-
-                    # alignment block length - save coords in contig
-                    alignment_block_list = [
-                        int(parts[2]), int(parts[3])]
-
-                    if contig_name not in alignment_dict['Contigs'].keys():
-                        alignment_dict['Contigs'][contig_name] = {'Length': contig_length, 'Base_Matches': matching_bases,
-                                                                  'Identity': None, 'Phred': None, 'Covered_Bases': [[ref_start, ref_end]],
-                                                                  'Alignment_Blocks_Coords': [alignment_block_list],
-                                                                  'Contig_Coords': [[contig_start, contig_end]]}
-                    else:
-                        alignment_dict['Contigs'][contig_name]['Contig_Coords'].append(
-                            [contig_start, contig_end])
-                        alignment_dict['Contigs'][contig_name]['Base_Matches'] += matching_bases
-                        alignment_dict['Contigs'][contig_name]['Covered_Bases'].append([
-                            ref_start, ref_end])
-
-                    alignment_dict['Longest_Alignment'] = max(
-                        alignment_dict['Longest_Alignment'], ref_end - ref_start)
-                    alignment_dict['Covered_Bases'].append(
-                        [ref_start, ref_end])
-                    alignment_dict['Contigs'][contig_name]['Alignment_Blocks_Coords'].append(
-                        alignment_block_list)
+        for parts in paf_index.get(reference_name, []):
+            # parse values from PAF record
+            # contig info
+            contig_name, contig_length = parts[0], parts[1]
+            contig_start, contig_end = parts[2], parts[3]
+
+            # coords in reference
+            ref_start, ref_end = parts[7], parts[8]
+
+            # number of residue matches
+            matching_bases = parts[9]
+
+            # alignment block length - save coords in contig
+            alignment_block_list = [contig_start, contig_end]
+
+            if contig_name not in alignment_dict['Contigs'].keys():
+                alignment_dict['Contigs'][contig_name] = {'Length': contig_length, 'Base_Matches': matching_bases,
+                                                          'Identity': None, 'Phred': None, 'Covered_Bases': [[ref_start, ref_end]],
+                                                          'Alignment_Blocks_Coords': [alignment_block_list],
+                                                          'Contig_Coords': [[contig_start, contig_end]]}
+            else:
+                alignment_dict['Contigs'][contig_name]['Contig_Coords'].append(
+                    [contig_start, contig_end])
+                alignment_dict['Contigs'][contig_name]['Base_Matches'] += matching_bases
+                alignment_dict['Contigs'][contig_name]['Covered_Bases'].append([
+                    ref_start, ref_end])
+
+            alignment_dict['Longest_Alignment'] = max(
+                alignment_dict['Longest_Alignment'], ref_end - ref_start)
+            alignment_dict['Covered_Bases'].append(
+                [ref_start, ref_end])
+            alignment_dict['Contigs'][contig_name]['Alignment_Blocks_Coords'].append(
+                alignment_block_list)
 
         # calculate base matches compensating for possible overlap
         for contig_name in alignment_dict['Contigs']:
@@ -406,7 +412,18 @@ def parse_paf_file(paf_filename, reference):
     return alignment_dictitonary_list
 
 
-def main(sample_id, assembler, assembly, mapping, reference, n_target, l_target):
+def assembly_mapping_stats(sample_id, assembler, assembly, mapping, reference, n_target, l_target, cpus=1):
+    """
+    Computes the mapping statistics of an assembly and writes the output files for the sample and assembler.
+    :param sample_id: string with sample identifier
+    :param assembler: string with assembler name
+    :param assembly: path to the filtered assembly fasta file
+    :param mapping: path to the paf file (or its Parquet cache)
+    :param reference: reference catalogue, already loaded, or path to it
+    :param n_target: Target percentage reference length for NA and NG metrics
+    :param l_target: Target percentage reference length for L metric
+    :param cpus: int with the number of worker processes for the per reference stats
+    """
 
     # Dataframe with assembly info
     df = utils.parse_assemblies(sample_id, assembler, assembly, mapping)
@@ -417,7 +434,7 @@ def main(sample_id, assembler, assembly, mapping, reference, n_target, l_target)
 
     # get mapping stats
     to_plot_nax, to_plot_ngx, to_plot_lx, to_plot_phred, to_plot_coverage, json_dic = mapping_stats(
-        sample_id, assembler, df, alignment_dictitonary_list, n_target, l_target)
+        sample_id, assembler, df, alignment_dictitonary_list, n_target, l_target, cpus)
 
     # save output files
     with open("{}_{}_report.json".format(sample_id, assembler), "w") as json_report:
@@ -431,5 +448,38 @@ def main(sample_id, assembler, assembly, mapping, reference, n_target, l_target)
                             "_breadth_of_coverage_contigs.csv")
 
 
+def main(sample_id, assembler, assembly, mapping, reference, n_target, l_target, cpus=1):
+    """
+    Computes the mapping statistics for one assembly or, in batch mode, for many (sample, assembler, assembly,
+    paf) tuples given as lists of the same length. The reference catalogue is loaded once and the assemblies
+    are processed in a pool of `cpus` worker processes. Each assembly writes the same files as a single run.
+    The cpus left over by the assemblies (or all of them, for a single assembly) are used for the per
+    reference stats.
+    """
+
+    if isinstance(assembler, str):
+        assembler, assembly, mapping = [assembler], [assembly], [mapping]
+    if isinstance(sample_id, str):
+        sample_id = [sample_id] * len(assembler)
+
+    # the reference is loaded once for all the assemblies
+    reference_catalogue = utils.load_reference_catalogue(reference)
+
+    tasks = list(zip(sample_id, assembler, assembly, mapping))
+    workers = min(cpus, len(tasks))
+    logger.debug("Processing {} assemblies with {} workers".format(len(tasks), workers))
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(assembly_mapping_stats, *task, reference_catalogue, n_target, l_target,
+                                       cpus // workers)
+                       for task in tasks]
+            for future in futures:
+                future.result()
+    else:
+        for task in tasks:
+            assembly_mapping_stats(*task, reference_catalogue, n_target, l_target, cpus)
+
+
 if __name__ == '__main__':
-    main(SAMPLE_ID, ASSEMBLER, ASSEMBLY, MAPPING, REFERENCE, N_TARGET, L_TARGET)
+    main(SAMPLE_ID, ASSEMBLER, ASSEMBLY, MAPPING, REFERENCE, N_TARGET, L_TARGET, CPUS)
@@ -6,9 +6,8 @@ import zipfile
 import csv
 import re
 import fnmatch
+import tempfile
 from time import gmtime, strftime
-from itertools import groupby
-from pandas.core.common import flatten
 try:
     import utils
 except ImportError:
@@ -25,7 +24,7 @@ if __file__.endswith(".command.sh"):
     CONTIG_SIZE_DISTRIBUTION = "${contig_size_distribution}".split()
     MAPPING_STATS_REPORT = "$mapping_assembly_stats"
     COMPLETNESS_JSON = "$completness_plots"
-    REFERENCE_FILE = "$reference_file"
+    REFERENCE_FILE = "$reference_catalogue"
     LX_JSON = "$lx_plots"
     NAX_JSON = "$nax_plots"
     NGX_JSON = "$ngx_plots"
@@ -87,7 +86,7 @@ html_template = """
     <script> const _referenceData = {1} </script>
     <script> const _sampleData = {2} </script>
     <script> const _mainDataTables = {3} </script>
-    <script> const _mainDataPlots = {4} </script>
+    {4}
     <script> const _sampleList = {5} </script>
     <script> const _minContigSize = {6} </script>
     <script> const _overviewMD = {7} </script>
@@ -96,6 +95,30 @@ html_template = """
 </html>
 """
 
+# the plot data of each sample is kept in a separate script, loaded by the report before main.js. Each plot is
+# only built from its serialised JSON when the report first accesses it.
+plot_loader_template = """<script>
+      const _mainDataPlots = {};
+      function _addPlotData(sample, reference, plotType, loadPlot) {
+        const samplePlots = _mainDataPlots[sample] = _mainDataPlots[sample] || {PlotData: {}};
+        const referencePlots = samplePlots.PlotData[reference] = samplePlots.PlotData[reference] || {};
+        Object.defineProperty(referencePlots, plotType, {
+          configurable: true,
+          enumerable: true,
+          get: function () {
+            const plot = loadPlot();
+            Object.defineProperty(referencePlots, plotType, {value: plot, writable: true, enumerable: true, configurable: true});
+            return plot;
+          }
+        });
+      }
+    </script>"""
+
+plot_script_template = """
+    <script src="./{}"></script>"""
+
+PLOT_DATA_DIR = "report_data"
+
 logger = utils.get_logger(__file__)
 
 
@@ -290,23 +313,21 @@ def process_performance_data(pipeline_stats, versions_json, containers_config):
 
 def process_reference_data(reference_file):
     """
+    Gets the size and GC content of each replicon in the reference.
+    :param reference_file: path to the reference catalogue JSON, or to the original reference fasta file
+    :return: dict with the reference file name as key and a dict with the size and GC content per replicon
     """
 
-    reference_file_name = os.path.splitext(os.path.basename(reference_file))[0]
+    reference_catalogue = utils.load_reference_catalogue(reference_file, copies=1)
 
     ref_sequences_header = {}
 
-    with open(reference_file) as fh:
-        faiter = (x[1] for x in groupby(fh, lambda line: line[0] == ">"))
-        for header in faiter:
-            headerStr = header.__next__()[1:].strip().split(' ')[0]
-            seq = "".join(s.strip() for s in faiter.__next__())
-            gc_content = float(
-                (seq.count('G') + seq.count('C'))) / len(seq) * 100
-            ref_sequences_header[headerStr] = {
-                "size": len(seq), "GC": gc_content}
+    for reference in reference_catalogue['references']:
+        gc_content = float(reference['gc']) / reference['length'] * 100
+        ref_sequences_header[reference['name']] = {
+            "size": reference['length'], "GC": gc_content}
 
-    return_dict = {reference_file_name: ref_sequences_header}
+    return_dict = {reference_catalogue['source']: ref_sequences_header}
 
     return return_dict
 
@@ -326,6 +347,102 @@ def process_sample_reads(reads_jsons):
     return reads_report
 
 
+def add_plot_section(plot_index, spill_fh, sample_id, reference, plot_type, plot):
+    """
+    Serialises a plot into the spill file and stores its location in the plot index.
+    :param plot_index: dict with the location (offset, length) in the spill file of every plot, per sample, reference
+    and plot type
+    :param spill_fh: binary file handle where the serialised plots are written
+    :param sample_id: string with the sample ID
+    :param reference: string with the reference name, or 'Global' for the global plots
+    :param plot_type: string with the name of the plot in the report (e.g. 'lx')
+    :param plot: dict with the plotly figure
+    """
+    section = json.dumps(plot, separators=(",", ":")).encode()
+    plot_index[sample_id].setdefault(reference, {})[plot_type] = (spill_fh.tell(), len(section))
+    spill_fh.write(section)
+
+
+def add_global_plot(plot_index, spill_fh, sample_id, plot_files, plot_type):
+    """
+    Adds the global plot of a sample to the spill file.
+    :param plot_index: dict with the location in the spill file of every plot
+    :param spill_fh: binary file handle where the serialised plots are written
+    :param sample_id: string with the sample ID
+    :param plot_files: list of paths to the JSON files with the plot of each sample
+    :param plot_type: string with the name of the plot in the report (e.g. 'contig_size')
+    """
+    plot_file = fnmatch.filter(plot_files, sample_id + '*')[0]
+    logger.debug('Processing {0} data for {1}...'.format(plot_file, sample_id))
+    with open(plot_file) as plot_fh:
+        add_plot_section(plot_index, spill_fh, sample_id, "Global", plot_type, json.load(plot_fh))
+
+
+def add_reference_plots(plot_index, spill_fh, plot_file, plot_type, replace=False, optional=False):
+    """
+    Adds the plots per reference of every sample to the spill file. The plot file is only loaded once, and only one
+    plot is deserialised at a time.
+    :param plot_index: dict with the location in the spill file of every plot
+    :param spill_fh: binary file handle where the serialised plots are written
+    :param plot_file: path to the JSON file with the plots per sample and per reference
+    :param plot_type: string with the name of the plot in the report (e.g. 'lx')
+    :param replace: bool, if True the plot replaces the plots already added for the reference
+    :param optional: bool, if True the samples missing from the plot file are skipped
+    """
+    logger.debug('Processing {0} data...'.format(plot_file))
+    with open(plot_file) as plot_fh:
+        plot_json = json.load(plot_fh)
+
+    for sample_id in plot_index.keys():
+        try:
+            sample_plots = plot_json[sample_id]["PlotData"]
+        except KeyError:
+            if optional:
+                continue
+            raise
+        for reference, reference_plots in sample_plots.items():
+            if not reference_plots:
+                continue
+            if replace:
+                plot_index[sample_id][reference] = {}
+            add_plot_section(plot_index, spill_fh, sample_id, reference, plot_type, reference_plots[-1])
+
+
+def write_plot_data(plot_index, spill_fh, plots_json, plot_data_dir):
+    """
+    Copies the serialised plots from the spill file into the plots JSON report and into one script per sample, with
+    the plot data for the HTML report.
+    :param plot_index: dict with the location in the spill file of every plot
+    :param spill_fh: binary file handle where the serialised plots were written
+    :param plots_json: path to the JSON report with the plots of all samples
+    :param plot_data_dir: path to the directory for the plot data scripts
+    :return: list with the path to the plot data script of each sample
+    """
+    os.makedirs(plot_data_dir, exist_ok=True)
+    plot_scripts = []
+
+    with open(plots_json, "w") as json_fh:
+        json_fh.write('{')
+        for i, (sample_id, sample_plots) in enumerate(plot_index.items()):
+            plot_script = "{}/plots_{}.js".format(plot_data_dir, sample_id)
+            plot_scripts.append(plot_script)
+            json_fh.write((',' if i else '') + json.dumps(sample_id) + ':{"PlotData":{')
+            with open(plot_script, "w") as script_fh:
+                for j, (reference, reference_plots) in enumerate(sample_plots.items()):
+                    json_fh.write((',' if j else '') + json.dumps(reference) + ':{')
+                    for k, (plot_type, (offset, length)) in enumerate(reference_plots.items()):
+                        spill_fh.seek(offset)
+                        section = spill_fh.read(length).decode()
+                        json_fh.write((',' if k else '') + json.dumps(plot_type) + ':' + section)
+                        script_fh.write('_addPlotData({},{},{},function(){{return {};}});\\n'.format(
+                            json.dumps(sample_id), json.dumps(reference), json.dumps(plot_type), section))
+                    json_fh.write('}')
+            json_fh.write('}}')
+        json_fh.write('}')
+
+    return plot_scripts
+
+
 def main(main_js, pipeline_stats, assembly_stats_report, contig_size_plots, mapping_stats_report, completness_plot,
          lmas_logo, reference_file, lx_json, shrimp_json, gap_reference_json, gap_histogram, plot_misassembly, misassembly_report,
          min_contig_size, nax_json, ngx_json, reads_json, snp_reference_json, versions_json, misassembly_per_ref, about_md,
@@ -367,7 +484,6 @@ def main(main_js, pipeline_stats, assembly_stats_report, contig_size_plots, mapp
 
     # main report skeleton
     main_data_tables_js = {}
-    main_data_plots_js = {}
 
     # add global stats
     logger.debug('Processing {0} data...'.format(assembly_stats_report))
@@ -459,159 +575,25 @@ def main(main_js, pipeline_stats, assembly_stats_report, contig_size_plots, mapp
                         except KeyError:
                             item['snps'] = 0
 
-    for sample_id in main_data_tables_js.keys():
-        main_data_plots_js[sample_id] = {}
-        main_data_plots_js[sample_id]["PlotData"] = {}
-
-        # add global plots
-        main_data_plots_js[sample_id]["PlotData"]["Global"] = {}
-
-        #   contig size boxplot
-        contig_distribution_plot = fnmatch.filter(
-            contig_size_plots, sample_id + '*')[0]
-        logger.debug('Processing {0} data for {1}...'.format(
-            contig_distribution_plot, sample_id))
-        with open(contig_distribution_plot) as plot_fh:
-            plot_json = json.load(plot_fh)
-            main_data_plots_js[sample_id]["PlotData"]["Global"]["contig_size"] = plot_json
-
-        #   gap size boxplot
-        gap_distribution_plot = fnmatch.filter(
-            gap_histogram, sample_id + '*')[0]
-        logger.debug('Processing {0} data for {1}...'.format(
-            gap_distribution_plot, sample_id))
-        with open(gap_distribution_plot) as plot_fh:
-            plot_json = json.load(plot_fh)
-            main_data_plots_js[sample_id]["PlotData"]["Global"]["gap_size"] = plot_json
-
-        # misassembly plot
-        misassembled_contigs_plot = fnmatch.filter(
-            plot_misassembly, sample_id + '*')[0]
-        logger.debug('Processing {0} data for {1}...'.format(
-            misassembled_contigs_plot, sample_id))
-        with open(misassembled_contigs_plot) as plot_fh:
-            plot_json = json.load(plot_fh)
-            main_data_plots_js[sample_id]["PlotData"]["Global"]["misassembly"] = plot_json
-
-        # add reference plots
-        #    completness
-        logger.debug('Processing {0} data for {1}...'.format(
-            completness_plot, sample_id))
-        with open(completness_plot) as plot_fh:
-            plot_json = json.load(plot_fh)
-            for reference, reference_plots in plot_json[sample_id]["PlotData"].items():
-                for x in reference_plots:
-                    reference_plots_json = json.loads(x)
-                    main_data_plots_js[sample_id]["PlotData"][reference] = {
-                        "completness": reference_plots_json}
-
-        #    Lx
-        logger.debug('Processing {0} data for {1}...'.format(
-            lx_json, sample_id))
-        with open(lx_json) as lx_fh:
-            plot_json = json.load(lx_fh)
-            for reference, reference_plots in plot_json[sample_id]["PlotData"].items():
-                for x in reference_plots:
-                    reference_plots_json = json.loads(x)
-                    if reference not in main_data_plots_js[sample_id]["PlotData"].keys():
-                        main_data_plots_js[sample_id]["PlotData"][reference] = {
-                            "lx": reference_plots_json}
-                    else:
-                        main_data_plots_js[sample_id]["PlotData"][reference]["lx"] = reference_plots_json
-        #   NAx
-        logger.debug('Processing {0} data for {1}...'.format(
-            nax_json, sample_id))
-        with open(nax_json) as nax_fh:
-            plot_json = json.load(nax_fh)
-            for reference, reference_plots in plot_json[sample_id]["PlotData"].items():
-                for x in reference_plots:
-                    reference_plots_json = json.loads(x)
-                    if reference not in main_data_plots_js[sample_id]["PlotData"].keys():
-                        main_data_plots_js[sample_id]["PlotData"][reference] = {
-                            "nax": reference_plots_json}
-                    else:
-                        main_data_plots_js[sample_id]["PlotData"][reference]["nax"] = reference_plots_json
-
-        #   NGx
-        logger.debug('Processing {0} data for {1}...'.format(
-            ngx_json, sample_id))
-        with open(ngx_json) as ngx_fh:
-            plot_json = json.load(ngx_fh)
-            for reference, reference_plots in plot_json[sample_id]["PlotData"].items():
-                for x in reference_plots:
-                    reference_plots_json = json.loads(x)
-                    if reference not in main_data_plots_js[sample_id]["PlotData"].keys():
-                        main_data_plots_js[sample_id]["PlotData"][reference] = {
-                            "ngx": reference_plots_json}
-                    else:
-                        main_data_plots_js[sample_id]["PlotData"][reference]["ngx"] = reference_plots_json
-
-        #    phred-like plot
-        logger.debug('Processing {0} data for {1}...'.format(
-            shrimp_json, sample_id))
-        with open(shrimp_json) as phred_fh:
-            plot_json = json.load(phred_fh)
-            for reference, reference_plots in plot_json[sample_id]["PlotData"].items():
-                for x in reference_plots:
-                    reference_plots_json = json.loads(x)
-                    if reference not in main_data_plots_js[sample_id]["PlotData"].keys():
-                        main_data_plots_js[sample_id]["PlotData"][reference] = {
-                            "phred": reference_plots_json}
-                    else:
-                        main_data_plots_js[sample_id]["PlotData"][reference]["phred"] = reference_plots_json
-
-        #   gap plot
-        logger.debug('Processing {0} data for {1}...'.format(
-            gap_reference_json, sample_id))
-        with open(gap_reference_json) as gap_ref_fh:
-            plot_json = json.load(gap_ref_fh)
-            try:
-                for reference, reference_plots in plot_json[sample_id]["PlotData"].items():
-                    for x in reference_plots:
-                        reference_plots_json = json.loads(x)
-                        if reference not in main_data_plots_js[sample_id]["PlotData"].keys():
-                            main_data_plots_js[sample_id]["PlotData"][reference] = {
-                                "gaps": reference_plots_json}
-                        else:
-                            main_data_plots_js[sample_id]["PlotData"][reference]["gaps"] = reference_plots_json
-            except KeyError:
-                pass
-
-        # SNP plot
-        logger.debug('Processing {0} data for {1}...'.format(
-            snp_reference_json, sample_id))
-        with open(snp_reference_json) as snp_ref_fh:
-            plot_json = json.load(snp_ref_fh)
-            try:
-                for reference, reference_plots in plot_json[sample_id]["PlotData"].items():
-                    for x in reference_plots:
-                        reference_plots_json = json.loads(x)
-                        if reference not in main_data_plots_js[sample_id]["PlotData"].keys():
-                            main_data_plots_js[sample_id]["PlotData"][reference] = {
-                                "snps": reference_plots_json}
-                        else:
-                            main_data_plots_js[sample_id]["PlotData"][reference]["snps"] = reference_plots_json
-            except KeyError:
-                pass
-
-        # MISASSEMBLY plot
-        logger.debug('Processing {0} data for {1}...'.format(
-            plot_misassembly_per_reference_json, sample_id))
-        with open(plot_misassembly_per_reference_json) as misassembly_ref_fh:
-            plot_json = json.load(misassembly_ref_fh)
-            try:
-                for reference, reference_plots in plot_json[sample_id]["PlotData"].items():
-                    for x in reference_plots:
-                        reference_plots_json = json.loads(x)
-                        if reference not in main_data_plots_js[sample_id]["PlotData"].keys():
-                            main_data_plots_js[sample_id]["PlotData"][reference] = {
-                                "misassembly": reference_plots_json}
-                        else:
-                            main_data_plots_js[sample_id]["PlotData"][reference]["misassembly"] = reference_plots_json
-            except KeyError:
-                pass
-
-    #logger.debug("Report data dictionary: {}".format(main_data_plots_js))
+    # add plots, each serialised only once to a spill file on disk
+    plot_index = {}
+    with tempfile.TemporaryFile() as spill_fh:
+        for sample_id in main_data_tables_js.keys():
+            plot_index[sample_id] = {"Global": {}}
+            add_global_plot(plot_index, spill_fh, sample_id, contig_size_plots, "contig_size")
+            add_global_plot(plot_index, spill_fh, sample_id, gap_histogram, "gap_size")
+            add_global_plot(plot_index, spill_fh, sample_id, plot_misassembly, "misassembly")
+
+        add_reference_plots(plot_index, spill_fh, completness_plot, "completness", replace=True)
+        add_reference_plots(plot_index, spill_fh, lx_json, "lx")
+        add_reference_plots(plot_index, spill_fh, nax_json, "nax")
+        add_reference_plots(plot_index, spill_fh, ngx_json, "ngx")
+        add_reference_plots(plot_index, spill_fh, shrimp_json, "phred")
+        add_reference_plots(plot_index, spill_fh, gap_reference_json, "gaps", optional=True)
+        add_reference_plots(plot_index, spill_fh, snp_reference_json, "snps", optional=True)
+        add_reference_plots(plot_index, spill_fh, plot_misassembly_per_reference_json, "misassembly", optional=True)
+
+        plot_scripts = write_plot_data(plot_index, spill_fh, "pipeline_report_plots.json", PLOT_DATA_DIR)
 
     # add about markdown
     about_md_to_write = '` `'
@@ -620,23 +602,27 @@ def main(main_js, pipeline_stats, assembly_stats_report, contig_size_plots, mapp
         with open(about_md, 'r') as file:
             about_md_to_write = '`' + file.read() + '`'
 
+    performance_metadata_json = json.dumps(performance_metadata, separators=(",", ":"))
     with open("performance_metadata.json", "w") as json_fh:
-        json_fh.write(json.dumps(performance_metadata, separators=(",", ":")))
+        json_fh.write(performance_metadata_json)
 
+    reference_info_json = json.dumps(reference_info, separators=(",", ":"))
     with open("reference_metadata.json", "w") as json_fh:
-        json_fh.write(json.dumps(reference_info, separators=(",", ":")))
+        json_fh.write(reference_info_json)
 
+    main_data_tables_json = json.dumps(main_data_tables_js, separators=(",", ":"))
     with open("pipeline_report_tables.json", "w") as json_fh:
-        json_fh.write(json.dumps(main_data_tables_js, separators=(",", ":")))
-    with open("pipeline_report_plots.json", "w") as json_fh:
-        json_fh.write(json.dumps(main_data_plots_js, separators=(",", ":")))
+        json_fh.write(main_data_tables_json)
+
+    plot_data_html = plot_loader_template + ''.join(
+        plot_script_template.format(plot_script) for plot_script in plot_scripts)
 
     with open("index.html", "w") as html_fh:
-        html_fh.write(html_template.format(json.dumps(performance_metadata),
-                                           json.dumps(reference_info),
-                                           json.dumps(sample_reads),
-                                           json.dumps(main_data_tables_js),
-                                           json.dumps(main_data_plots_js),
+        html_fh.write(html_template.format(performance_metadata_json,
+                                           reference_info_json,
+                                           json.dumps(sample_reads, separators=(",", ":")),
+                                           main_data_tables_json,
+                                           plot_data_html,
                                            list(main_data_tables_js.keys()),
                                            min_contig_size,
                                            about_md_to_write))
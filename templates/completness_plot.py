@@ -10,6 +10,10 @@ The following variables are expected whether using NextFlow or the
 :py:func:`main` executor.
 - ``coverage_files``: list of files with completeness information to be plotted
         e.g.: ``'[SampleA_AssemblerA.csv, SampleB_AssemblerB.csv]'``
+- ``html_mode``: how plotly.js is included in the HTML plots ('standalone', 'directory' or 'cdn'), or 'none' to skip them
+        e.g.: ``'directory'``
+- ``cpus``: number of processes writing the HTML plots
+        e.g.: ``2``
 
 Authorship
 ----------
@@ -25,7 +29,7 @@ import pandas as pd
 import json
 from scipy import interpolate
 import plotly.graph_objs as go
-from plotly.offline import plot
+from plotly.utils import PlotlyJSONEncoder
 try:
     import utils
 except ImportError:
@@ -40,9 +44,13 @@ logger = utils.get_logger(__file__)
 
 if __file__.endswith(".command.sh"):
     COVERAGE_FILES = '$coverage_files'.split()
+    HTML_PLOTS = "$params.html_plots"
+    CPUS = int("$task.cpus")
     logger.debug("Running {} with parameters:".format(
         os.path.basename(__file__)))
     logger.debug("COVERAGE_FILE: {}".format(COVERAGE_FILES))
+    logger.debug("HTML_PLOTS: {}".format(HTML_PLOTS))
+    logger.debug("CPUS: {}".format(CPUS))
 
 
 def plot_data(species_data, sample_id):
@@ -121,18 +129,15 @@ def plot_data(species_data, sample_id):
             i['font']['color'] = 'black'
             i['font']['size'] = 16
 
-        plot(to_plot, filename='{0}_{1}_breadth_of_coverage_plot.html'.format(sample_id, species.replace(' ', '_')),
-             auto_open=False)
-
         if sample_id not in report_json.keys():
-            report_json[sample_id] = {species: to_plot.to_json()}
+            report_json[sample_id] = {species: to_plot.to_plotly_json()}
         else:
-            report_json[sample_id][species] = to_plot.to_json()
+            report_json[sample_id][species] = to_plot.to_plotly_json()
 
     return report_json
 
 
-def main(coverage_files):
+def main(coverage_files, html_mode='standalone', cpus=1):
 
     all_data = {}
     for coverage_file in coverage_files:
@@ -162,10 +167,13 @@ def main(coverage_files):
 
     with open("completness_plots.json", "w") as json_report:
         report_dict = {}
+        html_plots = []
         for sample_id in all_data.keys():
             report_json = plot_data(all_data[sample_id], sample_id)
 
             for species, plot_species in report_json[sample_id].items():
+                html_plots.append(('{0}_{1}_breadth_of_coverage_plot.html'.format(sample_id, species.replace(' ', '_')),
+                                   plot_species))
                 if sample_id not in report_dict.keys():
                     report_dict[sample_id] = {
                         "PlotData": {species: [plot_species]}}
@@ -177,8 +185,10 @@ def main(coverage_files):
                         report_dict[sample_id]["PlotData"][species].append(
                             plot_species)
 
-        json_report.write(json.dumps(report_dict, separators=(",", ":")))
+        json_report.write(json.dumps(report_dict, separators=(",", ":"), cls=PlotlyJSONEncoder))
+
+    utils.write_html_plots(html_plots, html_mode, cpus)
 
 
 if __name__ == '__main__':
-    main(COVERAGE_FILES)
+    main(COVERAGE_FILES, HTML_PLOTS, CPUS)
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Purpose
+-------
+This script converts the PAF file of an assembly mapped to the triple reference into the
+columnar PAF cache (Parquet), with typed columns and the cs tag kept as a separate column.
+The PAF text is parsed only once and the downstream templates read only the columns they need.
+
+Expected input
+--------------
+The following variables are expected whether using NextFlow or the
+:py:func:`main` executor.
+- ``sample_id``: Sample Identification string.
+    - e.g.: ``'SampleA'``
+- ``assembler``: String with assembler name.
+    - e.g.: ``'SPAdes'``
+- ``mapping``: paf file of the assembly mapped to the complete triple reference genomes
+    - e.g.: ``'spades.paf' ``
+
+Generated output
+----------------
+- ``<sample_id>_<assembler>.parquet``: columnar PAF cache
+
+Authorship
+----------
+Inês Mendes, cimendes@medicina.ulisboa.pt
+https://github.com/cimendes
+"""
+
+import os
+try:
+    import utils
+except ImportError:
+    from templates import utils
+
+__version__ = "0.0.1"
+__build__ = "18.10.2026"
+__template__ = "CONVERT_PAF-nf"
+
+logger = utils.get_logger(__file__)
+
+if __file__.endswith(".command.sh"):
+    SAMPLE_ID = '$sample_id'
+    ASSEMBLER = '$assembler'
+    MAPPING = '$mapping'
+    logger.debug("Running {} with parameters:".format(
+        os.path.basename(__file__)))
+    logger.debug("SAMPLE_ID: {}".format(SAMPLE_ID))
+    logger.debug("ASSEMBLER: {}".format(ASSEMBLER))
+    logger.debug("MAPPING: {}".format(MAPPING))
+
+
+def main(sample_id, assembler, mapping):
+
+    utils.paf_to_parquet(mapping, "{}_{}.parquet".format(sample_id, assembler))
+
+
+if __name__ == '__main__':
+    main(SAMPLE_ID, ASSEMBLER, MAPPING)
@@ -17,10 +17,10 @@ The following variables are expected whether using NextFlow or the
     - e.g.: ``'SPAdes'``
 - ``assembly``: fasta file from the assembler (filtered for minimum length size)
     - e.g.: ``'spades.fasta'``
-- ``mapping``: paf file of the assembly mapped to the complete triple reference genomes
+- ``mapping``: paf file of the assembly mapped to the complete triple reference genomes, or its Parquet cache
     - e.g.: ``'spades.paf' ``
-- ``reference``: paf file to the complete triple reference genomes
-    - e.g.: ``'references.fasta' ``
+- ``reference``: reference catalogue JSON (or fasta file of the complete triple reference genomes)
+    - e.g.: ``'reference_catalogue.json' ``
 
 Authorship
 ----------
@@ -30,8 +30,6 @@ https://github.com/cimendes
 
 import os
 import json
-from itertools import groupby
-import pandas as pd
 try:
     import utils
 except ImportError:
@@ -48,7 +46,7 @@ if __file__.endswith(".command.sh"):
     ASSEMBLER = '$assembler'
     ASSEMBLY = '$assembly'
     MAPPING = '$mapping'
-    REFERENCE = '$reference'
+    REFERENCE = '$reference_catalogue'
     logger.debug("Running {} with parameters:".format(
         os.path.basename(__file__)))
     logger.debug("SAMPLE_ID: {}".format(SAMPLE_ID))
@@ -60,73 +58,76 @@ if __file__.endswith(".command.sh"):
 COLUMNS = ['Sample', 'Assembler', 'Reference', 'Reference Length', 'Gap Start', 'Gap End']
 
 
+def get_covered_intervals(paf_file):
+    """
+    Function to process the mapping (*.paf) file in a single pass and collect the alignment coordinates for all
+    the references at once.
+    :param paf_file: tabular file with alignment information for an assembler (PAF or its Parquet cache)
+    :return: dict with the reference names as keys and the list of [start, end] alignment coords as values
+    """
+    covered_intervals = {}
+    for reference, start, end in utils.iter_paf(paf_file, ['tname', 'tstart', 'tend']):
+        covered_intervals.setdefault(reference, []).append([start, end])
+    return covered_intervals
+
+
+def get_reference_gaps(covered_bases_list, ref_len):
+    """
+    Function to output a list with gap sizes from the alignment coords of a reference.
+    :param covered_bases_list: list with the [start, end] alignment coords in the triple reference
+    :param ref_len: int with expected reference length
+    :return: gaps: list with gap coords in the reference in the assembly, and list with the gap sizes
+    """
+    # Due to the triple reference, the values need to be adjusted as not to over-estimate coverage breadth.
+    # Therefore, the coordinates are folded as follows:
+    # [0; ref_len][ref_len+1; 2*ref_len][(2*ref_len)+1; 3*ref_len]
+    _, gaps, _ = utils.get_interval_stats(covered_bases_list, ref_len)  # get list of gap coords
+    gap_sizes = [coord[1]-coord[0]-1 for coord in gaps]  # get list of gap sizes
+    return gaps, gap_sizes
+
+
 def get_gaps(paf_file, ref_name, ref_len):
     """
     Function to process the mapping (*.paf) file for a given reference and output a list with gap sizes from
     the alignment.
-    :param paf_file: tabular file with alignment information for an assembler
+    :param paf_file: tabular file with alignment information for an assembler (PAF or its Parquet cache)
     :param ref_name: reference name to filter from the paf_filename
     :param ref_len: int with expected reference length
     :return: gaps: list with gap coords in the reference in the assembly for the ref_name reference
     """
-    covered_bases_list = []
-
-    with open(paf_file) as paf:
-        for line in paf:
-            parts = line.strip().split('\t')
-            if parts[5] == ref_name:
-                start, end = int(parts[7]), int(parts[8])
-                covered_bases_list.append([start, end])
-
-    covered_bases = set()
-    for item in sorted(covered_bases_list, key=lambda x: x[0]):
-        start, stop = map(int, item[:])
-        for base in range(start, stop):
-            # Due to the triple reference, the values need to be adjusted as not to over-estimate coverage breadth.
-            # Therefore, the coordinates are adjusted as follows:
-            # [0; ref_len][ref_len+1; 2*ref_len][(2*ref_len)+1; 3*ref_len]
-            if base <= ref_len:
-                covered_bases.add(int(base))
-            elif base <= 2*ref_len:
-                covered_bases.add(int(base-ref_len))
-            else:
-                covered_bases.add(int(base-(2*ref_len)))
-
-    covered_bases = sorted(list(covered_bases))
-    gaps = [[s, e] for s, e in zip(covered_bases, covered_bases[1:]) if s+1 < e]  # get list of gap sizes coords
-    gap_sizes = [coord[1]-coord[0]-1 for coord in gaps]  # get list of gap sizes
-    return gaps, gap_sizes
+    return get_reference_gaps(get_covered_intervals(paf_file).get(ref_name, []), ref_len)
 
 
 def main(sample_id, assembler, assembly, mapping, reference):
 
     all_gap_sizes = []
 
-    df = pd.DataFrame(columns=COLUMNS)
+    df = utils.DataFrameBuilder(COLUMNS)
 
-    # iterator for reference files (sequence length is needed)
-    references = (x[1] for x in groupby(open(reference, "r"), lambda line: line[0] == ">"))
+    # reference names and lengths from the catalogue, the sequences are not needed
+    references = utils.load_reference_catalogue(reference)['references']
 
-    for header in references:
-        reference_name = header.__next__()[1:].strip()
+    # alignment coords for all the references, in a single pass of the paf file
+    covered_intervals = get_covered_intervals(mapping)
 
-        seq = "".join(s.strip() for s in references.__next__())
+    for reference_entry in references:
+        reference_name = reference_entry['name']
+        reference_length = reference_entry['length']
 
-        gaps, gap_sizes = get_gaps(mapping, reference_name, len(seq) / 3)
+        gaps, gap_sizes = get_reference_gaps(covered_intervals.get(reference_name, []), reference_length)
         all_gap_sizes.append(gap_sizes)  # for global plot
 
         # plot gap location per reference per reference
         for coords in gaps:
-            df = df.append({'Sample': sample_id, 'Assembler': assembler, 'Reference': reference_name,
-                            'Reference Length': len(seq)/3, 'Gap Start': coords[0], 'Gap End': coords[1]},
-                           ignore_index=True)
+            df.append({'Sample': sample_id, 'Assembler': assembler, 'Reference': reference_name,
+                       'Reference Length': reference_length, 'Gap Start': coords[0], 'Gap End': coords[1]})
 
     to_write = {sample_id: {assembler: sorted(all_gap_sizes)}}
 
     with open("{}_{}_gap_dict.json".format(sample_id, assembler), "w") as fh:
         fh.write(json.dumps(to_write, separators=(",", ":")))
 
-    df.to_csv(sample_id + '_' + assembler + '_gaps.csv')
+    df.to_df().to_csv(sample_id + '_' + assembler + '_gaps.csv')
 
 
 if __name__ == '__main__':
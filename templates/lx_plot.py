@@ -7,7 +7,7 @@ import os
 import pandas as pd
 import json
 import plotly.graph_objs as go
-from plotly.offline import plot
+from plotly.utils import PlotlyJSONEncoder
 try:
     import utils
 except ImportError:
@@ -24,14 +24,18 @@ if __file__.endswith(".command.sh"):
     LX_FILES = '$lx_files '.split()
     L_TARGET = float("$params.l_target")
     SCALE = '$scale'
+    HTML_PLOTS = "$params.html_plots"
+    CPUS = int("$task.cpus")
     logger.debug("Running {} with parameters:".format(
         os.path.basename(__file__)))
     logger.debug("C90_FILES: {}".format(LX_FILES))
     logger.debug("L_TARGET: {}".format(L_TARGET))
     logger.debug("SCALE: {}".format(SCALE))
+    logger.debug("HTML_PLOTS: {}".format(HTML_PLOTS))
+    logger.debug("CPUS: {}".format(CPUS))
 
 
-def main(c90files, l_target, scale):
+def main(c90files, l_target, scale, html_mode='standalone', cpus=1):
 
     df_Lx = pd.DataFrame(columns=['Sample', 'Reference', 'Assembler', 'Lx', 'nContigs'])
     #df_Lx = pd.concat((pd.read_csv(f) for f in c90files))
@@ -46,18 +50,16 @@ def main(c90files, l_target, scale):
 
     # Create plot - Lx per reference for each sample
     report_dict = {}
+    html_plots = []
+    lx_groups = utils.group_rows(df_Lx)
     for sample in sorted(df_Lx['Sample'].unique()):
         for reference in sorted(df_Lx['Reference'].unique()):
             fig_Lx = go.Figure()
             i = 0
             for assembler in sorted(df_Lx['Assembler'].unique(), key=lambda v: v.upper()):
-                if df_Lx['nContigs'][(df_Lx['Sample'] == sample) & (df_Lx['Reference'] == reference) & (df_Lx['Assembler'] == assembler)].nunique() > 1:
-                    fig_Lx.add_trace(go.Scatter(x=df_Lx['Lx'][(df_Lx['Sample'] == sample) &
-                                                            (df_Lx['Reference'] == reference) &
-                                                            (df_Lx['Assembler'] == assembler)],
-                                                y=df_Lx['nContigs'][(df_Lx['Sample'] == sample) &
-                                                                    (df_Lx['Reference'] == reference) &
-                                                                    (df_Lx['Assembler'] == assembler)],
+                data = lx_groups.get((sample, reference, assembler))
+                if data is not None and data['nContigs'].nunique() > 1:
+                    fig_Lx.add_trace(go.Scatter(x=data['Lx'], y=data['nContigs'],
                                                 name=assembler, line=dict(color=utils.COLOURS[i], width=2)))
                     i += 1
             # add target line
@@ -72,8 +74,8 @@ def main(c90files, l_target, scale):
                                             gridcolor='#DCDCDC'))
             fig_Lx.update_xaxes(type=scale)
 
-            plot(fig_Lx, filename='{0}_{1}_lx.html'.format(sample, reference.replace(' ', '_')), auto_open=False)
-            plot_species = fig_Lx.to_json()
+            plot_species = fig_Lx.to_plotly_json()
+            html_plots.append(('{0}_{1}_lx.html'.format(sample, reference.replace(' ', '_')), plot_species))
 
             if sample not in report_dict.keys():
                 report_dict[sample] = {"PlotData": {reference: [plot_species]}}
@@ -84,9 +86,11 @@ def main(c90files, l_target, scale):
                     report_dict[sample]["PlotData"][reference].append(plot_species)
 
 
+    utils.write_html_plots(html_plots, html_mode, cpus)
+
     with open("lx.json", "w") as json_report:
-        json_report.write(json.dumps(report_dict, separators=(",", ":")))
+        json_report.write(json.dumps(report_dict, separators=(",", ":"), cls=PlotlyJSONEncoder))
 
 
 if __name__ == '__main__':
-    main(LX_FILES, L_TARGET, SCALE)
+    main(LX_FILES, L_TARGET, SCALE, HTML_PLOTS, CPUS)
@@ -16,7 +16,8 @@ Expected input
 --------------
 This script takes the following arguments (in this order):
   * Path to the metagenomic assembly files (ending in *.fasta)
-  * Path to the mapped contigs to the triple reference genomes (ending in *.paf)
+  * Path to the mapped contigs to the triple reference genomes (ending in *.paf, or its Parquet cache *.parquet)
+  * Path to the reference catalogue, with the length of each replicon (optional, ending in *.json)
 
 Authorship
 ----------
@@ -24,15 +25,8 @@ Inês Mendes, cimendes@medicina.ulisboa.pt
 https://github.com/cimendes
 """
 
-import math
 import os
-from re import S
-import pandas as pd
-from plotly.offline import plot
-import plotly.graph_objects as go
-import pickle
 import json
-from plotly.validators.scatter.marker import SymbolValidator
 try:
     import utils
 except ImportError:
@@ -49,67 +43,73 @@ if __file__.endswith(".command.sh"):
     ASSEMBLER = '$assembler'
     ASSEMBLY = '$assembly'
     MAPPING = '$mapping'
+    REFERENCE = '$reference_catalogue'
     logger.debug("Running {} with parameters:".format(
         os.path.basename(__file__)))
     logger.debug("SAMPLE_ID: {}".format(SAMPLE_ID))
     logger.debug("ASSEMBLER: {}".format(ASSEMBLER))
     logger.debug("ASSEMBLY: {}".format(ASSEMBLY))
     logger.debug("MAPPING: {}".format(MAPPING))
+    logger.debug("REFERENCE: {}".format(REFERENCE))
 
 
-def parse_paf(paf_file):
+def parse_paf(paf_file, reference_lengths=None):
     """
     Parses a mapping paf file and stores mapping information into a dictionary for each contig.
-    :param paf_file: path to the paf files with mapping information.
+    :param paf_file: path to the paf files with mapping information (or to its Parquet cache).
+    :param reference_lengths: dict with the true length of each replicon. If not provided, the lengths
+                              are taken from the paf file, assuming the triple reference.
 
     :return: dictionary with contig mapping info
     """
 
     missmatch_dict = {}
 
-    with open(paf_file, 'r') as paf_fh:
-        for line in paf_fh:
-            line = line.split()
-
-            contig, contig_len, query_start, query_end, strand = line[0:5]
-            reference, reference_len, target_start, target_end = line[5:9]
-
-            # a non-perfect alignment or a different number of residue matches
-            if int(line[11]) != 0 or line[1] != line[9]:
-
-                cigar = line[-1]
-                exact_matches, snp, indel = utils.parse_cs(cigar)
-
-                contig_dict = {'contig length': contig_len,
-                               'query start': int(query_start),
-                               'query end': int(query_end),
-                               'strand': strand,
-                               'reference': reference,
-                               'reference length': int(reference_len)/3,
-                               'target start': utils.adjust_reference_coord(int(target_start),
-                                                                            int(reference_len)/3),
-                               'target end': utils.adjust_reference_coord(int(target_end),
-                                                                          int(reference_len)/3),
-                               'exact matches': exact_matches,
-                               'snp': snp,
-                               'indels': indel}
-            else:  # contig okay
-                contig_dict = {'contig length': contig_len,
-                               'query start': int(query_start),
-                               'query end': int(query_end),
-                               'strand': strand,
-                               'reference': reference,
-                               'reference length': int(reference_len) / 3,
-                               'target start': utils.adjust_reference_coord(int(target_start),
-                                                                            int(reference_len) / 3),
-                               'target end': utils.adjust_reference_coord(int(target_end),
-                                                                          int(reference_len) / 3)
-                               }
-
-            if contig in missmatch_dict.keys():
-                missmatch_dict[contig].append(contig_dict)
-            else:
-                missmatch_dict[contig] = [contig_dict]
+    columns = ['qname', 'qlen', 'qstart', 'qend', 'strand', 'tname', 'tlen', 'tstart', 'tend', 'matches', 'mapq',
+               'primary', 'cs']
+    for contig, contig_len, query_start, query_end, strand, reference, reference_len, target_start, target_end, \
+            matches, mapq, primary, cigar in utils.iter_paf(paf_file, columns):
+
+        # misassemblies are assessed on the primary alignments only
+        if not primary:
+            continue
+
+        if reference_lengths is not None:
+            reference_len = reference_lengths[reference]
+        else:
+            reference_len = reference_len / 3
+
+        # a non-perfect alignment or a different number of residue matches
+        if mapq != 0 or contig_len != matches:
+
+            exact_matches, snp, indel = utils.parse_cs(cigar)
+
+            contig_dict = {'contig length': contig_len,
+                           'query start': query_start,
+                           'query end': query_end,
+                           'strand': strand,
+                           'reference': reference,
+                           'reference length': reference_len,
+                           'target start': utils.adjust_reference_coord(target_start, reference_len),
+                           'target end': utils.adjust_reference_coord(target_end, reference_len),
+                           'exact matches': exact_matches,
+                           'snp': snp,
+                           'indels': indel}
+        else:  # contig okay
+            contig_dict = {'contig length': contig_len,
+                           'query start': query_start,
+                           'query end': query_end,
+                           'strand': strand,
+                           'reference': reference,
+                           'reference length': reference_len,
+                           'target start': utils.adjust_reference_coord(target_start, reference_len),
+                           'target end': utils.adjust_reference_coord(target_end, reference_len)
+                           }
+
+        if contig in missmatch_dict.keys():
+            missmatch_dict[contig].append(contig_dict)
+        else:
+            missmatch_dict[contig] = [contig_dict]
 
     return missmatch_dict
 
@@ -256,8 +256,10 @@ def classify_misassembled_contigs(mis_dict):
     return missassembled_contigs
 
 
-def make_plot(mis_contigs, sample_id, assembler):
-    """[summary]
+def make_plot_table(mis_contigs, sample_id, assembler):
+    """
+    Writes the data for the global misassembly plot as a typed columnar table, with one row per
+    misassembled contig. The plot traces are built from it by process_misassembly.py.
 
     Parameters
     ----------
@@ -269,37 +271,18 @@ def make_plot(mis_contigs, sample_id, assembler):
         assembler name
     """
 
-    x = []  # contig lengths
-    y = []  # n blocks
-    z = []  # misassembly type
-    w = []  # contig id
-    for item, value in mis_contigs.items():
-        x.append(value['contig length'])
-        y.append(value['n blocks'])
-        z.append(', '.join(value['misassembly']))
-        w.append(item)
-
-    df = pd.DataFrame(list(zip(x, y, z, w)),
-                      columns=['Contig Length', 'n blocks', 'Misassembly', "Contig ID"])
-
-    df['text'] = '<b>' + df['Misassembly'] + \
-        '</b><br><br>Contig Name: ' + df['Contig ID'] + '<br>'
+    import pyarrow as pa
 
-    trace = go.Scatter(x=df['Contig Length'],
-                       y=df['n blocks'],
-                       name=assembler, text=df['text'],
-                       mode='markers',
-                       opacity=0.7,
-                       hovertemplate="%{text}" +
-                       "Contig Length: %{x:.0f}bp<br>" +
-                       "Fragments: %{y:.0}<br>" +
-                       "<extra></extra>",)
-
-    with open('{}_{}_trace.pkl'.format(sample_id, assembler), 'wb') as f:
-        pickle.dump(trace, f)
+    table = {'Contig ID': [], 'Contig Length': [], 'n blocks': [], 'Misassembly': []}
+    for item, value in mis_contigs.items():
+        table['Contig ID'].append(item)
+        table['Contig Length'].append(value['contig length'])
+        table['n blocks'].append(value['n blocks'])
+        table['Misassembly'].append(value['misassembly'])
 
-    with open('{}_{}_contig_lenght.pkl'.format(sample_id, assembler), 'wb') as f:
-        pickle.dump(x, f)
+    utils.write_parquet(table, '{}_{}_misassembled_contigs.parquet'.format(sample_id, assembler),
+                        {'Contig Length': pa.int64(), 'n blocks': pa.int64(),
+                         'Misassembly': pa.list_(pa.string())})
 
 
 def make_df(sample_id, assembler, mis_contigs, filtered_paf_dict):
@@ -317,23 +300,28 @@ def make_df(sample_id, assembler, mis_contigs, filtered_paf_dict):
 
     """
 
-    df = pd.DataFrame(columns=["Contig", 'Sample', 'Reference',
-                               'Ref Start', 'Ref End', 'Misassembly', "Assembler", 'Reference Length'])
+    df = utils.DataFrameBuilder(["Contig", 'Sample', 'Reference',
+                                 'Ref Start', 'Ref End', 'Misassembly', "Assembler", 'Reference Length'])
 
     for contig_id in mis_contigs.keys():
         for contig_info in filtered_paf_dict[contig_id]:
-            df = df.append({'Contig': contig_id, 'Sample': sample_id, 'Assembler': assembler, 'Reference': contig_info['reference'],
-                            'Ref Start': contig_info['target start'], 'Ref End': contig_info['target end'],
-                            'Misassembly': mis_contigs[contig_id]['misassembly'], 'Reference Length': contig_info['reference length']},
-                           ignore_index=True)
+            df.append({'Contig': contig_id, 'Sample': sample_id, 'Assembler': assembler, 'Reference': contig_info['reference'],
+                       'Ref Start': contig_info['target start'], 'Ref End': contig_info['target end'],
+                       'Misassembly': mis_contigs[contig_id]['misassembly'], 'Reference Length': contig_info['reference length']})
+
+    df.to_df().to_csv(sample_id + '_' + assembler + '_misassembly.csv')
 
-    df.to_csv(sample_id + '_' + assembler + '_misassembly.csv')
 
+def main(sample_id, assembler, assembly, mapping, reference=None):
 
-def main(sample_id, assembler, assembly, mapping):
+    # true replicon lengths, from the reference catalogue
+    reference_lengths = None
+    if reference:
+        reference_lengths = {entry['name']: entry['length']
+                             for entry in utils.load_reference_catalogue(reference)['references']}
 
     # parse paf file
-    paf_dict = parse_paf(mapping)
+    paf_dict = parse_paf(mapping, reference_lengths)
 
     # filter for contigs broken into multiple alignment blocks
     filtered_paf_dict = filter_dict(paf_dict)
@@ -366,8 +354,8 @@ def main(sample_id, assembler, assembly, mapping):
     
     logger.debug("Misassembly reference report: {}".format(reference_report))
 
-    # make plot trace - global
-    make_plot(mis_contigs, sample_id, assembler)
+    # data for the global plot
+    make_plot_table(mis_contigs, sample_id, assembler)
 
     # prepare df for plot per reference
     make_df(sample_id, assembler, mis_contigs, filtered_paf_dict)
@@ -382,4 +370,4 @@ def main(sample_id, assembler, assembly, mapping):
 
 
 if __name__ == '__main__':
-    main(SAMPLE_ID, ASSEMBLER, ASSEMBLY, MAPPING)
+    main(SAMPLE_ID, ASSEMBLER, ASSEMBLY, MAPPING, REFERENCE)
@@ -7,7 +7,7 @@ import os
 import pandas as pd
 import json
 import plotly.graph_objs as go
-from plotly.offline import plot
+from plotly.utils import PlotlyJSONEncoder
 try:
     import utils
 except ImportError:
@@ -24,14 +24,18 @@ if __file__.endswith(".command.sh"):
     NAX_FILES = '$nax_files '.split()
     N_TARGET = float("$params.n_target")
     SCALE = '$scale'
+    HTML_PLOTS = "$params.html_plots"
+    CPUS = int("$task.cpus")
     logger.debug("Running {} with parameters:".format(
         os.path.basename(__file__)))
     logger.debug("NAX_FILES: {}".format(NAX_FILES))
     logger.debug("N_TARGET: {}".format(N_TARGET))
     logger.debug("SCALE: {}".format(SCALE))
+    logger.debug("HTML_PLOTS: {}".format(HTML_PLOTS))
+    logger.debug("CPUS: {}".format(CPUS))
 
 
-def main(nax_files, n_target, scale):
+def main(nax_files, n_target, scale, html_mode='standalone', cpus=1):
 
     df_nax = pd.DataFrame(columns=['Sample', 'Reference', 'Assembler', 'NAx', 'Basepairs'])
 
@@ -43,19 +47,17 @@ def main(nax_files, n_target, scale):
 
     # Create plot - Lx per reference for each sample
     report_dict = {}
+    html_plots = []
+    nax_groups = utils.group_rows(df_nax)
     for sample in sorted(df_nax['Sample'].unique()):
         for reference in sorted(df_nax['Reference'].unique()):
             fig_nax = go.Figure()
             i = 0
             for assembler in sorted(df_nax['Assembler'].unique(), key=lambda v: v.upper()):
-                if df_nax['Basepairs'][(df_nax['Sample'] == sample) &(df_nax['Reference'] == reference) & (df_nax['Assembler'] == assembler)].nunique() > 1:
-                    fig_nax.add_trace(go.Scatter(x=df_nax['NAx'][(df_nax['Sample'] == sample) &
-                                                                (df_nax['Reference'] == reference) &
-                                                                (df_nax['Assembler'] == assembler)],
-                                                    y=df_nax['Basepairs'][(df_nax['Sample'] == sample) &
-                                                                    (df_nax['Reference'] == reference) &
-                                                                    (df_nax['Assembler'] == assembler)],
-                                                    name=assembler, line=dict(color=utils.COLOURS[i], width=2)))
+                data = nax_groups.get((sample, reference, assembler))
+                if data is not None and data['Basepairs'].nunique() > 1:
+                    fig_nax.add_trace(go.Scatter(x=data['NAx'], y=data['Basepairs'],
+                                                 name=assembler, line=dict(color=utils.COLOURS[i], width=2)))
                     i += 1
             
             fig_nax.add_shape(type="line", yref="paper",
@@ -70,8 +72,8 @@ def main(nax_files, n_target, scale):
             
             fig_nax.update_xaxes(type=scale)
 
-            plot(fig_nax, filename='{0}_{1}_nax.html'.format(sample, reference.replace(' ', '_')), auto_open=False)
-            plot_species = fig_nax.to_json()
+            plot_species = fig_nax.to_plotly_json()
+            html_plots.append(('{0}_{1}_nax.html'.format(sample, reference.replace(' ', '_')), plot_species))
 
             if sample not in report_dict.keys():
                 report_dict[sample] = {"PlotData": {reference: [plot_species]}}
@@ -81,9 +83,11 @@ def main(nax_files, n_target, scale):
                 else:
                     report_dict[sample]["PlotData"][reference].append(plot_species)
 
+    utils.write_html_plots(html_plots, html_mode, cpus)
+
     with open("nax.json", "w") as json_report:
-        json_report.write(json.dumps(report_dict, separators=(",", ":")))
+        json_report.write(json.dumps(report_dict, separators=(",", ":"), cls=PlotlyJSONEncoder))
 
 
 if __name__ == '__main__':
-    main(NAX_FILES, N_TARGET, SCALE)
+    main(NAX_FILES, N_TARGET, SCALE, HTML_PLOTS, CPUS)
@@ -7,7 +7,7 @@ import os
 import pandas as pd
 import json
 import plotly.graph_objs as go
-from plotly.offline import plot
+from plotly.utils import PlotlyJSONEncoder
 try:
     import utils
 except ImportError:
@@ -24,14 +24,18 @@ if __file__.endswith(".command.sh"):
     NGX_FILES = '$ngx_files '.split()
     N_TARGET = float("$params.n_target")
     SCALE = '$scale'
+    HTML_PLOTS = "$params.html_plots"
+    CPUS = int("$task.cpus")
     logger.debug("Running {} with parameters:".format(
         os.path.basename(__file__)))
     logger.debug("NAX_FILES: {}".format(NGX_FILES))
     logger.debug("N_TARGET: {}".format(N_TARGET))
     logger.debug("SCALE: {}".format(SCALE))
+    logger.debug("HTML_PLOTS: {}".format(HTML_PLOTS))
+    logger.debug("CPUS: {}".format(CPUS))
 
 
-def main(ngx_files, n_target, scale):
+def main(ngx_files, n_target, scale, html_mode='standalone', cpus=1):
 
     df_ngx = pd.DataFrame(columns=['Sample', 'Reference', 'Assembler', 'NGx', 'Basepairs'])
 
@@ -44,19 +48,17 @@ def main(ngx_files, n_target, scale):
     
     # Create plot - Lx per reference for each sample
     report_dict = {}
+    html_plots = []
+    ngx_groups = utils.group_rows(df_ngx)
     for sample in sorted(df_ngx['Sample'].unique()):
         for reference in sorted(df_ngx['Reference'].unique()):
             fig_ngx = go.Figure()
             i = 0
             for assembler in sorted(df_ngx['Assembler'].unique(), key=lambda v: v.upper()):
-                if df_ngx['Basepairs'][(df_ngx['Sample'] == sample) & (df_ngx['Reference'] == reference) & (df_ngx['Assembler'] == assembler)].nunique() > 1:
-                    fig_ngx.add_trace(go.Scatter(x=df_ngx['NGx'][(df_ngx['Sample'] == sample) &
-                                                                    (df_ngx['Reference'] == reference) &
-                                                                    (df_ngx['Assembler'] == assembler)],
-                                                y=df_ngx['Basepairs'][(df_ngx['Sample'] == sample) &
-                                                                      (df_ngx['Reference'] == reference) &
-                                                                      (df_ngx['Assembler'] == assembler)],
-                                                name=assembler, line=dict(color=utils.COLOURS[i], width=2)))
+                data = ngx_groups.get((sample, reference, assembler))
+                if data is not None and data['Basepairs'].nunique() > 1:
+                    fig_ngx.add_trace(go.Scatter(x=data['NGx'], y=data['Basepairs'],
+                                                 name=assembler, line=dict(color=utils.COLOURS[i], width=2)))
                     i += 1
             
             fig_ngx.add_shape(type="line", yref="paper",
@@ -71,8 +73,8 @@ def main(ngx_files, n_target, scale):
             
             fig_ngx.update_xaxes(type=scale)
 
-            plot(fig_ngx, filename='{0}_{1}_ngx.html'.format(sample, reference.replace(' ', '_')), auto_open=False)
-            plot_species = fig_ngx.to_json()
+            plot_species = fig_ngx.to_plotly_json()
+            html_plots.append(('{0}_{1}_ngx.html'.format(sample, reference.replace(' ', '_')), plot_species))
 
             if sample not in report_dict.keys():
                 report_dict[sample] = {"PlotData": {reference: [plot_species]}}
@@ -82,10 +84,11 @@ def main(ngx_files, n_target, scale):
                 else:
                     report_dict[sample]["PlotData"][reference].append(plot_species)
 
+    utils.write_html_plots(html_plots, html_mode, cpus)
+
     with open("ngx.json", "w") as json_report:
-        json_report.write(json.dumps(report_dict, separators=(",", ":")))
+        json_report.write(json.dumps(report_dict, separators=(",", ":"), cls=PlotlyJSONEncoder))
 
 
 if __name__ == '__main__':
-    main(NGX_FILES, N_TARGET, SCALE)
-
+    main(NGX_FILES, N_TARGET, SCALE, HTML_PLOTS, CPUS)
@@ -11,6 +11,10 @@ The following variables are expected whether using NextFlow or the
 :py:func:`main` executor.
 - ``coverage_files``: list of files with dataframe as csv to be concatenated and parsed
         e.g.: ``'[SampleA_AssemblerA.csv, SampleB_AssemblerB.csv]'``
+- ``html_mode``: how plotly.js is included in the HTML plots ('standalone', 'directory' or 'cdn'), or 'none' to skip them
+        e.g.: ``'directory'``
+- ``cpus``: number of processes writing the HTML plots
+        e.g.: ``2``
 
 Authorship
 ----------
@@ -20,7 +24,6 @@ https://github.com/cimendes
 
 import os
 import pandas as pd
-from plotly.offline import plot
 import plotly.graph_objects as go
 try:
     import utils
@@ -35,41 +38,54 @@ logger = utils.get_logger(__file__)
 
 if __file__.endswith(".command.sh"):
     DATAFRAME_FILES = '$dataframes'.split()
+    HTML_PLOTS = "$params.html_plots"
+    CPUS = int("$task.cpus")
     logger.debug("Running {} with parameters:".format(
         os.path.basename(__file__)))
     logger.debug("COVERAGE_FILE: {}".format(DATAFRAME_FILES))
+    logger.debug("HTML_PLOTS: {}".format(HTML_PLOTS))
+    logger.debug("CPUS: {}".format(CPUS))
 
 
-def main(dataframe_files):
+def main(dataframe_files, html_mode='standalone', cpus=1):
     """
 
     :param dataframe_files:
+    :param html_mode: string with how plotly.js is included in the HTML plots, or 'none' to skip them
+    :param cpus: int with the number of processes writing the HTML plots
     :return:
     """
 
     df = pd.concat((pd.read_csv(f) for f in dataframe_files))
 
+    html_plots = []
+    contig_groups = utils.group_rows(df, ('Sample', 'Assembler'))
+    no_rows = df.iloc[0:0]
+
     for sample_id in sorted(df['Sample'].unique(), reverse=True):
 
         fig = go.Figure()
 
         for assembler in sorted(df['Assembler'].unique(), key=lambda v: v.upper(), reverse=True):
+            contigs = contig_groups.get((sample_id, assembler), no_rows)
 
             # mapped contigs as boxplots
-            fig.add_trace(go.Box(x=df['Contig Len'][(df['Mapped'] != 'Unmapped') & (df['Assembler'] == assembler) & (df['Sample'] == sample_id)],
+            fig.add_trace(go.Box(x=contigs['Contig Len'][contigs['Mapped'] != 'Unmapped'],
                                  name=assembler, boxpoints='outliers',
                                  boxmean=False, fillcolor='#D3D3D3', line=dict(color='#000000')))
             # unmapped contigs as scatter-like plot (boxplot showing only the underlying data)
-            fig.add_trace(go.Box(x=df['Contig Len'][(df['Mapped'] == 'Unmapped') & (df['Assembler'] == assembler) & (df['Sample'] == sample_id)],
+            fig.add_trace(go.Box(x=contigs['Contig Len'][contigs['Mapped'] == 'Unmapped'],
                                  name=assembler, boxpoints='all', pointpos=0, marker=dict(color='rgba(178,37,34,0.7)'),
                                  line=dict(color='rgba(0,0,0,0)'), fillcolor='rgba(0,0,0,0)'))
 
         fig.update_layout(showlegend=False, xaxis_type="log", xaxis_title="Contig size (Log bp)",
                           plot_bgcolor='rgb(255,255,255)', xaxis=dict(zeroline=False, gridcolor='#DCDCDC'))
 
-        plot(fig, filename='{}_contig_size_distribution.html'.format(sample_id), auto_open=False)
+        html_plots.append(('{}_contig_size_distribution.html'.format(sample_id), fig))
         fig.write_json(file='{}_contig_size_distribution.json'.format(sample_id))
 
+    utils.write_html_plots(html_plots, html_mode, cpus)
+
 
 if __name__ == '__main__':
-    main(DATAFRAME_FILES)
+    main(DATAFRAME_FILES, HTML_PLOTS, CPUS)
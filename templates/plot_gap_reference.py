@@ -13,6 +13,10 @@ The following variables are expected whether using NextFlow or the
 :py:func:`main` executor.
 - ``gap_coords_dataframes``: list of csv files containing the dataframe with gap location information
         e.g.: ``'[SampleA.csv, SampleB.csv]'``
+- ``html_mode``: how plotly.js is included in the HTML plots ('standalone', 'directory' or 'cdn'), or 'none' to skip them
+        e.g.: ``'directory'``
+- ``cpus``: number of processes writing the HTML plots
+        e.g.: ``2``
 
 Expected input
 --------------
@@ -31,9 +35,7 @@ https://github.com/rfm-targa
 import os
 import json
 import pandas as pd
-from copy import deepcopy
-from itertools import groupby
-from plotly.offline import plot
+from plotly.utils import PlotlyJSONEncoder
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
@@ -50,77 +52,16 @@ logger = utils.get_logger(__file__)
 
 if __file__.endswith(".command.sh"):
     DATAFRAME_LIST = '$gap_coords_dataframes'.split()
+    HTML_PLOTS = "$params.html_plots"
+    CPUS = int("$task.cpus")
     logger.debug("Running {} with parameters:".format(
         os.path.basename(__file__)))
     logger.debug("DATAFRAME_LIST: {}".format(DATAFRAME_LIST))
+    logger.debug("HTML_PLOTS: {}".format(HTML_PLOTS))
+    logger.debug("CPUS: {}".format(CPUS))
 
 
-def determine_missing_intervals(intervals, total_len):
-    """
-    """
-
-    start = 0
-    missing_regions = []
-    for i in intervals:
-        diff = i[0] - start
-        if diff > 0:
-            missing_regions.append([start, start+diff-1])
-            start = i[1]
-
-    # add terminal region
-    if start != total_len:
-        missing_regions.append([start, total_len])
-
-    return missing_regions
-
-
-def merge_intervals(intervals):
-    """ Merges intersecting intervals.
-    """
-    merged = [deepcopy(intervals[0])]
-    for current in intervals[1:]:
-        previous = merged[-1]
-        # current and previous intervals intersect
-        if current[0] <= previous[1]:
-            # determine top position
-            previous[1] = max(previous[1], current[1])
-            # merge coverage dictionaries
-            previous_cov = previous[2]
-            current_cov = current[2]
-            for k, v in current_cov.items():
-                if k not in previous_cov:
-                    previous_cov[k] = v
-                else:
-                    previous_cov[k] += v
-            previous[2] = previous_cov
-        # current and previous intervals do not intersect
-        else:
-            merged.append(deepcopy(current))
-
-    return merged
-
-
-def intervals_subgroups(intervals):
-    """
-    """
-
-    subgroups = {}
-    for i in intervals:
-        start = i[0]
-        current_interval = i[2]
-        # identify groups of subsequent equal values
-        values_groups = [list(v)
-                         for k, v in groupby(current_interval.values())]
-        for g in values_groups:
-            # keep only the start and end points for each group
-            subgroups[start] = g[0]
-            subgroups[start+len(g)-1] = g[0]
-            start += len(g)
-
-    return subgroups
-
-
-def main(dataframes):
+def main(dataframes, html_mode='standalone', cpus=1):
 
     li = []
     for filename in dataframes:
@@ -129,7 +70,11 @@ def main(dataframes):
 
     frame = pd.concat(li, ignore_index=True)
 
+    coords_groups = utils.group_rows(frame)
+    reference_lengths = dict(zip(frame['Reference'], frame['Reference Length']))
+
     report_dict = {}
+    html_plots = []
     samples = sorted(frame['Sample'].unique())
     for sample in samples:
         report_dict[sample] = {"PlotData": {}}
@@ -147,56 +92,34 @@ def main(dataframes):
             assemblers_in_plot = []
             for assembler in assemblers:
                 print(assembler)
-                coords = frame[(frame['Sample'] == sample) & (frame['Reference'] == reference) &
-                               (frame['Assembler'] == assembler)]
-                if coords.empty:
+                coords = coords_groups.get((sample, reference, assembler))
+                if coords is None:
                     continue
                 else:
                     assemblers_in_plot.append(assembler)
                     starts = list(coords['Gap Start'])
                     stops = list(coords['Gap End'])
-                    for i in range(len(starts)):
-                        gap_size = stops[i]-starts[i]
-                        # trace with gap location - one per gap
-                        fig.add_trace(go.Scatter(x=[starts[i], stops[i]],
-                                                 y=[y, y],
-                                                 mode='lines',
-                                                 line=dict(
-                                                     color='#000000', width=12),
-                                                 name=assembler,
-                                                 showlegend=False,
-                                                 text=[gap_size, gap_size],
-                                                 hovertemplate='<b>Gap size</b>: %{text}' +
-                                                 '<br><b>Coord</b>: %{x}<br>'),
-                                      row=2, col=1)
-                        gaps_dict = {i: 1 for i in range(
-                            starts[i], stops[i]+1)}
-                        gaps_intervals.append(
-                            [starts[i], stops[i]+1, gaps_dict])
+                    texts = ['<b>Gap size</b>: {}'.format(stop - start) for start, stop in zip(starts, stops)]
+                    # trace with gap locations - one per assembler, with the gaps separated by None
+                    x_values, y_values, text_values = utils.get_track_coords(starts, stops, texts, y,
+                                                                             '<b>Merged gaps</b>: {}')
+                    fig.add_trace(go.Scattergl(x=x_values,
+                                               y=y_values,
+                                               mode='lines',
+                                               line=dict(
+                                                   color='#000000', width=12),
+                                               name=assembler,
+                                               showlegend=False,
+                                               text=text_values,
+                                               hovertemplate='%{text}' +
+                                               '<br><b>Coord</b>: %{x}<br>'),
+                                  row=2, col=1)
+                    gaps_intervals.extend(zip(starts, stops))
                     y += 1
 
-            reference_length = int(
-                frame['Reference Length'][frame['Reference'] == reference].unique())
-            if len(gaps_intervals) == 0:
-                data_points = gaps_intervals
-            else:
-                # sort intervals before merging
-                gaps_intervals = sorted(gaps_intervals, key=lambda x: x[0])
-                merged_intervals = merge_intervals(gaps_intervals)
-
-                # determine missing intervals
-                missing_intervals = determine_missing_intervals(
-                    merged_intervals, reference_length)
-
-                # identify start and end points for gaps subgroups
-                gaps_points = intervals_subgroups(merged_intervals)
-
-                # add points for intervals without gaps
-                for i in missing_intervals:
-                    gaps_points[i[0]] = 0
-                    gaps_points[i[1]] = 0
-
-                data_points = sorted(gaps_points.items(), key=lambda x: x[0])
+            reference_length = int(reference_lengths[reference])
+            # coverage depth steps of the gaps of all assemblers
+            data_points = utils.get_coverage_steps(gaps_intervals, reference_length)
 
             labels = [c[0] for c in data_points]
             values = [c[1] for c in data_points]
@@ -224,16 +147,17 @@ def main(dataframes):
 
             html_filename = '{0}_{1}_gaps.html'.format(
                 sample, reference.replace(' ', '_'))
-            plot(fig, filename=html_filename, auto_open=False)
-
-            plot_json = fig.to_json()
+            plot_json = fig.to_plotly_json()
+            html_plots.append((html_filename, plot_json))
 
             report_dict[sample]['PlotData'].setdefault(
                 reference, []).append(plot_json)
 
     with open('gaps_in_reference.json', 'w') as json_report:
-        json_report.write(json.dumps(report_dict, separators=(",", ":")))
+        json_report.write(json.dumps(report_dict, separators=(",", ":"), cls=PlotlyJSONEncoder))
+
+    utils.write_html_plots(html_plots, html_mode, cpus)
 
 
 if __name__ == '__main__':
-    main(DATAFRAME_LIST)
+    main(DATAFRAME_LIST, HTML_PLOTS, CPUS)
@@ -13,6 +13,10 @@ The following variables are expected whether using NextFlow or the
 :py:func:`main` executor.
 - ``gap_distance_json``: list of JSON files containing the sample ID and the list of gap sizes
         e.g.: ``'[SampleA.json, SampleB.json]'``
+- ``html_mode``: how plotly.js is included in the HTML plots ('standalone', 'directory' or 'cdn'), or 'none' to skip them
+        e.g.: ``'directory'``
+- ``cpus``: number of processes writing the HTML plots
+        e.g.: ``2``
 
 Expected input
 --------------
@@ -27,9 +31,7 @@ https://github.com/cimendes
 
 import os
 import json
-import pandas as pd
 from pandas.core.common import flatten
-from plotly.offline import plot
 import plotly.graph_objects as go
 try:
     import utils
@@ -44,14 +46,18 @@ logger = utils.get_logger(__file__)
 
 if __file__.endswith(".command.sh"):
     GAP_JSON = '$gap_distance_json'.split()
+    HTML_PLOTS = "$params.html_plots"
+    CPUS = int("$task.cpus")
     logger.debug("Running {} with parameters:".format(
         os.path.basename(__file__)))
     logger.debug("GAP_JSON: {}".format(GAP_JSON))
+    logger.debug("HTML_PLOTS: {}".format(HTML_PLOTS))
+    logger.debug("CPUS: {}".format(CPUS))
 
 COLUMNS = ['Assembler', 'Gap size']  # columns for dataframe
 
 
-def main(gap_json):
+def main(gap_json, html_mode='standalone', cpus=1):
 
     all_data = {}
 
@@ -69,15 +75,16 @@ def main(gap_json):
                         else:
                             all_data[sample][assembler].append(gap for gap in data[sample][assembler])
 
+    html_plots = []
     for sample in all_data.keys():
 
-        df = pd.DataFrame(columns=COLUMNS)
+        df = utils.DataFrameBuilder(COLUMNS)
 
         fig = go.Figure()
         for k, v in all_data[sample].items():
             flatlist = list(flatten(v))
-            for gap in flatlist:
-                df = df.append({'Assembler': k, 'Gap size': gap}, ignore_index=True)
+            df.extend({'Assembler': k, 'Gap size': flatlist})
+        df = df.to_df()
         
         for assembler in sorted(df['Assembler'].unique(), key=lambda v: v.upper(), reverse=True):
             fig.add_trace(go.Box(x=df['Gap size'][df['Assembler'] == assembler],
@@ -87,9 +94,11 @@ def main(gap_json):
         fig.update_layout(showlegend=False, xaxis_type="log", xaxis_title="Gap size (Log bp)",
                           plot_bgcolor='rgb(255,255,255)', xaxis=dict(zeroline=False, gridcolor='#DCDCDC'))
 
-        plot(fig, filename='{}_gap_size_boxplot.html'.format(sample), auto_open=False)
+        html_plots.append(('{}_gap_size_boxplot.html'.format(sample), fig))
         fig.write_json(file='{}_gap_distance_histogram.json'.format(sample))
 
+    utils.write_html_plots(html_plots, html_mode, cpus)
+
 
 if __name__ == '__main__':
-    main(GAP_JSON)
+    main(GAP_JSON, HTML_PLOTS, CPUS)
@@ -13,6 +13,10 @@ The following variables are expected whether using NextFlow or the
 :py:func:`main` executor.
 - ``snp_coords_dataframes``: list of csv files containing the dataframe with gap location information
         e.g.: ``'[SampleA.csv, SampleB.csv]'``
+- ``html_mode``: how plotly.js is included in the HTML plots ('standalone', 'directory' or 'cdn'), or 'none' to skip them
+        e.g.: ``'directory'``
+- ``cpus``: number of processes writing the HTML plots
+        e.g.: ``2``
 
 Expected input
 --------------
@@ -29,11 +33,8 @@ https://github.com/cimendes
 import os
 import json
 import pandas as pd
-import numpy as np
 from collections import Counter
-from copy import deepcopy
-from itertools import groupby
-from plotly.offline import plot
+from plotly.utils import PlotlyJSONEncoder
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
@@ -51,10 +52,14 @@ logger = utils.get_logger(__file__)
 if __file__.endswith(".command.sh"):
     DATAFRAME_LIST = '$snp_coords_dataframes'.split()
     JSON_LIST = '$snps_jsons'.split()
+    HTML_PLOTS = "$params.html_plots"
+    CPUS = int("$task.cpus")
     logger.debug("Running {} with parameters:".format(
         os.path.basename(__file__)))
     logger.debug("DATAFRAME_LIST: {}".format(DATAFRAME_LIST))
     logger.debug("JSON_LIST: {}".format(JSON_LIST))
+    logger.debug("HTML_PLOTS: {}".format(HTML_PLOTS))
+    logger.debug("CPUS: {}".format(CPUS))
 
 def snps_per_ref(report_per_reference):
     """
@@ -80,7 +85,7 @@ def snps_per_ref(report_per_reference):
         json_report.write(json.dumps(
             master_report_data_per_reference, separators=(",", ":")))
 
-def main(dataframes, jsons):
+def main(dataframes, jsons, html_mode='standalone', cpus=1):
 
     li = []
     for filename in dataframes:
@@ -89,7 +94,11 @@ def main(dataframes, jsons):
 
     frame = pd.concat(li, ignore_index=True)
 
+    coords_groups = utils.group_rows(frame)
+    reference_lengths = dict(zip(frame['Reference'], frame['Reference Length']))
+
     report_dict = {}
+    html_plots = []
     try:
         samples = sorted(frame['Sample'].unique())
     except TypeError:
@@ -107,8 +116,7 @@ def main(dataframes, jsons):
                                 vertical_spacing=0.02)
 
             y = 0
-            reference_length = int(
-                frame['Reference Length'][frame['Reference'] == reference].unique())
+            reference_length = int(reference_lengths[reference])
 
             #indexes = np.arange(reference_length)
             _count = Counter()
@@ -119,9 +127,8 @@ def main(dataframes, jsons):
             assemblers_in_plot = []
 
             for assembler in assemblers:
-                coords = frame[(frame['Sample'] == sample) & (frame['Reference'] == reference) &
-                               (frame['Assembler'] == assembler)]
-                if coords.empty:
+                coords = coords_groups.get((sample, reference, assembler))
+                if coords is None:
                     continue
                 else:
                     assemblers_in_plot.append(assembler)
@@ -170,19 +177,20 @@ def main(dataframes, jsons):
 
             html_filename = '{0}_{1}_snps.html'.format(
                 sample, str(reference).replace(' ', '_'))
-            plot(fig, filename=html_filename, auto_open=False)
-
-            plot_json = fig.to_json()
+            plot_json = fig.to_plotly_json()
+            html_plots.append((html_filename, plot_json))
 
             report_dict[sample]['PlotData'].setdefault(
                 reference, []).append(plot_json)
 
     with open('snps_in_reference.json', 'w') as json_report:
-        json_report.write(json.dumps(report_dict, separators=(",", ":")))
+        json_report.write(json.dumps(report_dict, separators=(",", ":"), cls=PlotlyJSONEncoder))
+
+    utils.write_html_plots(html_plots, html_mode, cpus)
     
     # SNPS STATS PER REF
     snps_per_ref(jsons)
 
 
 if __name__ == '__main__':
-    main(DATAFRAME_LIST, JSON_LIST)
+    main(DATAFRAME_LIST, JSON_LIST, HTML_PLOTS, CPUS)
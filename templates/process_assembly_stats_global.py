@@ -20,7 +20,6 @@ None
 
 import os
 import json
-import collections
 try:
     import utils
 except ImportError:
@@ -10,8 +10,16 @@ Expected input
 --------------
 The following variables are expected whether using NextFlow or the
 :py:func:`main` executor.
-- ``assembly_stats_global_file`` : Path to output file.
-    - e.g.: ``'assembly_stats_global.tsv'``
+- ``misassembly_contigs`` : Paths to the tables of misassembled contigs of each sample and assembler.
+    - e.g.: ``'sampleA_SPAdes_misassembled_contigs.parquet'``
+- ``report_data`` : Paths to the misassembly reports of each sample and assembler.
+    - e.g.: ``'sampleA_SPAdes_misassembly.json'``
+- ``report_per_reference`` : Paths to the misassembly reports per reference of each sample and assembler.
+    - e.g.: ``'sampleA_SPAdes_misassembled_reference.json'``
+- ``html_mode`` : How plotly.js is included in the HTML plots ('standalone', 'directory' or 'cdn'), or 'none' to skip them.
+    - e.g.: ``'directory'``
+- ``cpus`` : Number of processes writing the HTML plots.
+    - e.g.: ``2``
 
 Generated output
 ----------------
@@ -21,9 +29,7 @@ None
 import os
 import json
 import pandas as pd
-from plotly.offline import plot
 import plotly.graph_objects as go
-import pickle
 from plotly.subplots import make_subplots
 from pandas.core.common import flatten
 try:
@@ -38,48 +44,79 @@ __template__ = "PROCESS_MISASSEMBLY-nf"
 logger = utils.get_logger(__file__)
 
 if __file__.endswith(".command.sh"):
-    MISASSEMBLY_TRACE = '$misassembly_trace'.split()
     MISASSEMBLY_CONTIGS = "$misassembly_contigs".split()
     REPORT_DATA = "$report_data".split()
     REPORT_PER_REFERENCE = "$report_per_reference".split()
+    HTML_PLOTS = "$params.html_plots"
+    CPUS = int("$task.cpus")
     logger.debug("Running {} with parameters:".format(
         os.path.basename(__file__)))
-    logger.debug("MISASSEMBLY_TRACE: {}".format(MISASSEMBLY_TRACE))
     logger.debug("MISASSEMBLY_CONTIGS: {}".format(MISASSEMBLY_CONTIGS))
     logger.debug("REPORT_DATA: {}".format(REPORT_DATA))
     logger.debug("REPORT_PER_REFERENCE: {}".format(REPORT_PER_REFERENCE))
+    logger.debug("HTML_PLOTS: {}".format(HTML_PLOTS))
+    logger.debug("CPUS: {}".format(CPUS))
 
 
-def make_plot(misassembly_trace, misassembly_contigs):
+def make_trace(table, assembler):
     """
+    Builds the plot trace of an assembler from its table of misassembled contigs.
+    :param table: dict with the 'Contig ID', 'Contig Length', 'n blocks' and 'Misassembly' columns
+    :param assembler: string with assembler name
+    :return: plotly Scatter trace
+    """
+    df = pd.DataFrame({'Contig Length': table['Contig Length'],
+                       'n blocks': table['n blocks'],
+                       'Misassembly': [', '.join(misassembly) for misassembly in table['Misassembly']],
+                       'Contig ID': table['Contig ID']})
+
+    df['text'] = '<b>' + df['Misassembly'] + \
+        '</b><br><br>Contig Name: ' + df['Contig ID'] + '<br>'
+
+    return go.Scatter(x=df['Contig Length'],
+                      y=df['n blocks'],
+                      name=assembler, text=df['text'],
+                      mode='markers',
+                      opacity=0.7,
+                      hovertemplate="%{text}" +
+                      "Contig Length: %{x:.0f}bp<br>" +
+                      "Fragments: %{y:.0}<br>" +
+                      "<extra></extra>",)
+
+
+def make_plot(misassembly_contigs, html_mode='standalone', cpus=1):
+    """
+    Builds the global misassembly plot for each sample from the tables of misassembled contigs of
+    each assembler.
+    :param misassembly_contigs: list of paths to the misassembled contigs tables (*_misassembled_contigs.parquet)
+    :param html_mode: string with how plotly.js is included in the HTML plots, or 'none' to skip them
+    :param cpus: int with the number of processes writing the HTML plots
     """
     data_dict = {}
     contig_size = {}
 
-    sorted_misassembly_trace = sorted(
-        misassembly_trace, key=lambda v: v.upper(), reverse=True)
+    tables = {contig_file: utils.read_parquet(contig_file) for contig_file in misassembly_contigs}
 
-    for file_trace in sorted_misassembly_trace:
-        sample_name = file_trace.split("_")[0]
-        assembler_name = file_trace.split("_")[1]
-        with open(file_trace, 'rb') as f:
-            trace = pickle.load(f)
+    sorted_misassembly_contigs = sorted(
+        misassembly_contigs, key=lambda v: v.upper(), reverse=True)
+
+    for contig_file in sorted_misassembly_contigs:
+        sample_name = contig_file.split("_")[0]
+        assembler_name = contig_file.split("_")[1]
         if sample_name not in data_dict.keys():
-            data_dict[sample_name] = {assembler_name: trace}
+            data_dict[sample_name] = {assembler_name: tables[contig_file]}
         else:
             if assembler_name not in data_dict[sample_name].keys():
-                data_dict[sample_name][assembler_name] = trace
+                data_dict[sample_name][assembler_name] = tables[contig_file]
 
     for contig_file in misassembly_contigs:
         sample_name = contig_file.split("_")[0]
-        assembler_name = contig_file.split("_")[1]
-        with open(contig_file, 'rb') as f:
-            x = pickle.load(f)
         if sample_name not in contig_size.keys():
-            contig_size[sample_name] = [x]
+            contig_size[sample_name] = [tables[contig_file]['Contig Length']]
         else:
-            contig_size[sample_name].append(x)
+            contig_size[sample_name].append(tables[contig_file]['Contig Length'])
 
+    html_plots = []
     for sample in data_dict.keys():
 
         fig = make_subplots(rows=2, cols=1,
@@ -88,9 +125,9 @@ def make_plot(misassembly_trace, misassembly_contigs):
         flatlist = list(flatten(contig_size[sample]))
         fig.add_trace(go.Box(x=flatlist, name="",
                              showlegend=False), row=2, col=1)
-        for assembler, trace in sorted(data_dict[sample].items(), key=lambda item: item[0].isupper()):
+        for assembler, table in sorted(data_dict[sample].items(), key=lambda item: item[0].isupper()):
             logger.debug("Processing {}...".format(assembler))
-            fig.add_trace(trace, row=1, col=1)
+            fig.add_trace(make_trace(table, assembler), row=1, col=1)
 
         fig.update_traces(marker=dict(
             line_width=1, symbol='circle', size=16), col=1)
@@ -102,9 +139,11 @@ def make_plot(misassembly_trace, misassembly_contigs):
         fig.update_xaxes(showline=True, linewidth=1,
                          linecolor='#DCDCDC', gridcolor='#DCDCDC')
 
-        plot(fig, filename='{}_misassembly.html'.format(sample), auto_open=False)
+        html_plots.append(('{}_misassembly.html'.format(sample), fig))
         fig.write_json(file='{}_misassembly.json'.format(sample))
 
+    utils.write_html_plots(html_plots, html_mode, cpus)
+
 
 def global_misassembly(report_data):
     """
@@ -155,12 +194,12 @@ def misassembly_per_ref(report_per_reference):
     
 
 
-def main(misassembly_trace, misassembly_contigs, report_data, report_per_reference):
+def main(misassembly_contigs, report_data, report_per_reference, html_mode='standalone', cpus=1):
     """
     """
 
     # GLOBAL MISASSEMBLY PLOT
-    make_plot(misassembly_trace, misassembly_contigs)
+    make_plot(misassembly_contigs, html_mode, cpus)
 
     # GLOBAL MISASSEMBLY STATS
     global_misassembly(report_data)
@@ -170,5 +209,4 @@ def main(misassembly_trace, misassembly_contigs, report_data, report_per_referen
 
 
 if __name__ == '__main__':
-    main(MISASSEMBLY_TRACE, MISASSEMBLY_CONTIGS,
-         REPORT_DATA, REPORT_PER_REFERENCE)
+    main(MISASSEMBLY_CONTIGS, REPORT_DATA, REPORT_PER_REFERENCE, HTML_PLOTS, CPUS)
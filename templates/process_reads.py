@@ -12,6 +12,12 @@ The following variables are expected whether using NextFlow or the
     - e.g.: ``'SampleA'``
 - ``fastq``: glob path file to read files for matching with sample_id
     - e.g.: ``'data/fastq/*_{1,2}.*'``
+- ``cpus``: number of threads for the decompression of the read files
+    - e.g.: ``'2'``
+
+Generated output
+----------------
+- ``<sample_id>_reads_report.json``: number of read pairs of the sample, also used by read_mapping.py
 
 Authorship
 ----------
@@ -20,7 +26,6 @@ https://github.com/cimendes
 """
 
 import os
-import gzip
 import json
 try:
     import utils
@@ -36,16 +41,19 @@ logger = utils.get_logger(__file__)
 if __file__.endswith(".command.sh"):
     SAMPLE_ID = '$sample_id'
     FASTQ = '$fastq'.split()
+    CPUS = int("$task.cpus")
     logger.debug("Running {} with parameters:".format(
         os.path.basename(__file__)))
     logger.debug("SAMPLE_ID: {}".format(SAMPLE_ID))
     logger.debug("FASTQ: {}".format(FASTQ))
+    logger.debug("CPUS: {}".format(CPUS))
 
 
-def main(sample_id, fastq):
+def main(sample_id, fastq, cpus=1):
 
     # get total number of reads
-    n_reads_total = (sum(1 for line in gzip.open(fastq[0], 'rb'))/4)  # To get read pairs seeing only one file is enough
+    n_reads_total = utils.count_lines(fastq[0], cpus) / 4  # To get read pairs seeing only one file is enough
+    logger.debug("Number of read pairs: {}".format(n_reads_total))
 
     with open("{}_reads_report.json".format(sample_id), "w") as json_report:
         json_dic = {
@@ -54,4 +62,4 @@ def main(sample_id, fastq):
         json_report.write(json.dumps(json_dic, separators=(",", ":")))
 
 if __name__ == '__main__':
-    main(SAMPLE_ID, FASTQ)
+    main(SAMPLE_ID, FASTQ, CPUS)
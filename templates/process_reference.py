@@ -4,7 +4,14 @@ Purpose
 -------
 This script takes the multifasta file with the reference sequences and
 converts them to tripled replicon reference sequences for assembly 
-quality metric processing
+quality metric processing. It also writes the reference catalogue, a JSON file with the
+length, GC and N counts of each replicon, so downstream processes don't need to parse the
+reference again.
+
+Optionally, each replicon can instead be followed by a shorter wrap-around overlap (its first
+bases), sized to the longest expected contig, so that the reference indexed by the mapping
+processes is smaller. Downstream, coordinates are folded back using the true replicon lengths
+from the reference catalogue.
 
 Expected input
 --------------
@@ -12,6 +19,13 @@ The following variables are expected whether using NextFlow or the
 :py:func:`main` executor.
 - ``reference_fasta``: path file to reference sequence
     - e.g.: ``'data/reference/*.fasta'``
+- ``overlap``: length of the wrap-around overlap. If 0, each replicon is tripled
+    - e.g.: ``'0'``
+
+Generated output
+----------------
+- ``triple_reference.fasta``: fasta file with each replicon concatenated 3 times (or followed by the overlap)
+- ``reference_catalogue.json``: length, GC and N counts of each replicon
 
 Authorship
 ----------
@@ -20,7 +34,7 @@ https://github.com/cimendes
 """
 
 import os
-from itertools import groupby
+import json
 try:
     import utils
 except ImportError:
@@ -34,23 +48,29 @@ logger = utils.get_logger(__file__)
 
 if __file__.endswith(".command.sh"):
     REFERENCE = '$reference_fasta'
+    OVERLAP = int("$params.reference_overlap")
     logger.debug("Running {} with parameters:".format(
         os.path.basename(__file__)))
     logger.debug("REFERENCE: {}".format(REFERENCE))
+    logger.debug("OVERLAP: {}".format(OVERLAP))
 
 
-def main(reference):
+def main(reference, overlap=0):
 
-    fasta_iter = utils.fasta_iter(reference)
-
-    fh = open(reference)
+    # replicon metadata, without holding the sequences in memory
+    catalogue = utils.build_reference_catalogue(reference)
 
     with open("triple_reference.fasta", "w") as fh:
-        for header, seq in fasta_iter:
-            print(header)
-            fh.write('>' + header + '\\n')
-            fh.write(seq * 3 + '\\n')
+        for header, seq in utils.fasta_iter(reference):
+            logger.debug("Processing {} with {} basepairs".format(header, len(seq)))
+            header_line = '>' + header + '\\n'
+            virtual_seq = seq * 3 if overlap <= 0 else seq + seq[:overlap]
+            fh.write(header_line)
+            fh.write(virtual_seq + '\\n')
+
+    with open("reference_catalogue.json", "w") as json_fh:
+        json_fh.write(json.dumps(catalogue, separators=(",", ":")))
 
 
 if __name__ == '__main__':
-    main(REFERENCE)
+    main(REFERENCE, OVERLAP)
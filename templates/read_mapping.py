@@ -16,6 +16,13 @@ The following variables are expected whether using NextFlow or the
     - e.g.: ``'spades.fasta'``
 - ``fastq``: glob path file to read files for matching with sample_id
     - e.g.: ``'data/fastq/*_{1,2}.*'``
+- ``reads_report``: json with the number of read pairs of the sample, from process_reads.py
+    - e.g.: ``'SampleA_reads_report.json'``
+- ``single_mapping``: map the reads only to the original assembly and get the mapped reads of the filtered
+  assembly from the contigs over the minimum length
+    - e.g.: ``'false'``
+- ``keep_sam``: write the SAM files of the reads mapped to the assemblies
+    - e.g.: ``'false'``
 
 Authorship
 ----------
@@ -23,14 +30,12 @@ Inês Mendes, cimendes@medicina.ulisboa.pt
 https://github.com/cimendes
 """
 
-import sys
 import os
 import subprocess
 from subprocess import PIPE
 import glob
-import gzip
 import json
-import csv
+import tempfile
 try:
     import utils
 except ImportError:
@@ -50,6 +55,9 @@ if __file__.endswith(".command.sh"):
     FASTQ = '$params.fastq'
     BASEDIR = '$baseDir'
     THRESHOLD = '$params.mapped_reads_threshold'
+    READS_REPORT = '$reads_report'
+    SINGLE_MAPPING = json.loads("$params.single_read_mapping")
+    KEEP_SAM = json.loads("$params.keep_read_sam")
     logger.debug("Running {} with parameters:".format(
         os.path.basename(__file__)))
     logger.debug("SAMPLE_ID: {}".format(SAMPLE_ID))
@@ -59,63 +67,87 @@ if __file__.endswith(".command.sh"):
     logger.debug("FASTQ: {}".format(FASTQ))
     logger.debug("BASEDIR: {}".format(BASEDIR))
     logger.debug("THRESHOLD: {}".format(THRESHOLD))
-
-def map_to_assembly(assembly, reads, sample_id, assembler,threshold, n_reads_total):
+    logger.debug("READS_REPORT: {}".format(READS_REPORT))
+    logger.debug("SINGLE_MAPPING: {}".format(SINGLE_MAPPING))
+    logger.debug("KEEP_SAM: {}".format(KEEP_SAM))
+
+def map_to_assembly(assembly, reads, sample_id, assembler, threshold, n_read_pairs, sam_file=None,
+                    contig_subset=None):
+    """
+    Maps the reads to an assembly with minimap2 and counts the mapped reads directly from its SAM output,
+    without writing the SAM file unless sam_file is given.
+    :param assembly: path to the assembly fasta file
+    :param reads: list with the paths to the paired-end read files
+    :param sample_id: string with sample identifier
+    :param assembler: string with assembler name
+    :param threshold: float with the minimum fraction of the read length aligned
+    :param n_read_pairs: number of read pairs in the sample
+    :param sam_file: optional path to keep the SAM file with the read alignments
+    :param contig_subset: optional set of contig names of the assembly, to also get the reads mapping to them
+    :return: fraction of reads mapping to the assembly, and fraction of reads mapping to the contig_subset
+             (None if not given)
+    """
 
     mapped_reads = 0
+    mapped_reads_subset = None if contig_subset is None else 0
 
     cli = [
         "minimap2",
+        "-a",
         "--sr",
         "-k21",
         "-N5",
         "--secondary=no",
         assembly,
         reads[0],
-        reads[1],
-        ">",
-        "{}_{}_read_mapping_original.paf".format(sample_id, assembler)
+        reads[1]
     ]
 
     logger.debug("Running minimap2 subprocess with command: {}".format(' '.join(cli)))
 
-    p = subprocess.Popen(' '.join(cli), shell=True, stdout=PIPE, stderr=PIPE)
-    stdout, stderr = p.communicate()
+    # stderr goes to a temporary file, so that minimap2 never blocks while its output is being read
+    with tempfile.TemporaryFile() as stderr_fh:
+        p = subprocess.Popen(cli, stdout=PIPE, stderr=stderr_fh, universal_newlines=True)
+        sam_handle = open(sam_file, 'w') if sam_file else None
+        try:
+            n_records_mapping, n_reads_mapping, n_reads_mapping_subset = utils.count_mapped_reads(
+                p.stdout, threshold, sam_handle, contig_subset)
+        finally:
+            p.stdout.close()
+            p.wait()
+            if sam_handle is not None:
+                sam_handle.close()
+        stderr_fh.seek(0)
+        stderr = stderr_fh.read()
 
     try:
         stderr = stderr.decode("utf8")
-        stdout = stdout.decode("utf8")
     except (UnicodeDecodeError, AttributeError):
         stderr = str(stderr)
-        stdout = str(stdout)
 
-    logger.info("Finished minimap2 subprocess with STDOUT:\\n"
-                "======================================\\n{}".format(stdout))
     logger.info("Fished minimap2 subprocesswith STDERR:\\n"
                 "======================================\\n{}".format(stderr))
     logger.info("Finished minimap2 with return code: {}".format(p.returncode))
 
     if p.returncode == 0:
-        # count number of reads mapping
-        with open("{}_{}_read_mapping_original.paf".format(sample_id, assembler)) as fh:
-            csv_paf_file = csv.reader(fh, delimiter='\t')
-            n_reads_mapping = 0
-            for row in csv_paf_file:
-                if int(row[10]) >= (int(row[1]) * float(threshold)):
-                    n_reads_mapping += 1
+        logger.debug("Number of alignments over the threshold: {}".format(n_records_mapping))
         logger.debug("Number of reads mapping to assembly: {}".format(n_reads_mapping))
 
-
         try:
-            mapped_reads = n_reads_mapping / n_reads_total
+            mapped_reads = n_reads_mapping / (2 * n_read_pairs)
             logger.debug("Percentage of mapped reads to assembly: {}".format(mapped_reads))
+            if contig_subset is not None:
+                mapped_reads_subset = n_reads_mapping_subset / (2 * n_read_pairs)
+                logger.debug("Percentage of mapped reads to the {} contigs in the subset: {}".format(
+                    len(contig_subset), mapped_reads_subset))
         except ZeroDivisionError:
             mapped_reads = 0
 
-    return mapped_reads
+    return mapped_reads, mapped_reads_subset
 
 
-def main(sample_id, assembler, assembly, filtered_assembly, fastq, basedir, threshold):
+def main(sample_id, assembler, assembly, filtered_assembly, fastq, basedir, threshold, reads_report=None,
+         single_mapping=False, keep_sam=False):
     # get correct fastq files from directory
     all_readfiles = glob.glob(os.path.join(basedir, '/'.join(fastq.split('/')[:-1]), '*'))
     logger.debug("Read files found: {}".format(all_readfiles))
@@ -125,18 +157,33 @@ def main(sample_id, assembler, assembly, filtered_assembly, fastq, basedir, thre
             reads.append(file)
     logger.debug("Matching read files: {}".format(reads))
 
-    # get total number of reads
-    n_reads_total = (sum(1 for line in gzip.open(reads[1], 'rb'))/4) * 2
-    logger.debug("Number of reads in fastq file: {}".format(n_reads_total))
-
+    # get total number of read pairs, from the count of process_reads.py if available
+    if reads_report:
+        n_read_pairs = utils.load_read_count(reads_report, sample_id)
+    else:
+        n_read_pairs = utils.count_lines(reads[1]) / 4
+    logger.debug("Number of reads in fastq file: {}".format(n_read_pairs * 2))
+
+    if single_mapping:
+        # map to original assembly only, the filtered assembly is the subset of contigs over the minimum length
+        filtered_contigs = set(header for header, _, _, _ in utils.fasta_stats_iter(filtered_assembly))
+        mapped_reads_original, mapped_reads_filtered = map_to_assembly(
+            assembly, reads, sample_id, assembler, threshold, n_read_pairs,
+            "{}_{}_read_mapping_original.sam".format(sample_id, assembler) if keep_sam else None, filtered_contigs)
+    else:
+        # map to original assembly
+        mapped_reads_original, _ = map_to_assembly(
+            assembly, reads, sample_id, assembler, threshold, n_read_pairs,
+            "{}_{}_read_mapping_original.sam".format(sample_id, assembler) if keep_sam else None)
+
+        # map to filtered assembly
+        mapped_reads_filtered, _ = map_to_assembly(
+            filtered_assembly, reads, sample_id, assembler, threshold, n_read_pairs,
+            "{}_{}_read_mapping_filtered.sam".format(sample_id, assembler) if keep_sam else None)
 
-    # map to original assembly
-    mapped_reads_original = map_to_assembly(assembly, reads, sample_id, assembler,threshold, n_reads_total)
     with open("{}_{}_read_mapping_original.txt".format(sample_id, assembler), 'w') as fh:
         fh.write(str(mapped_reads_original * 100))
 
-    # map to filtered assembly
-    mapped_reads_filtered = map_to_assembly(filtered_assembly, reads, sample_id, assembler,threshold, n_reads_total)
     with open("{}_{}_read_mapping_filtered.txt".format(sample_id, assembler), 'w') as fh:
         fh.write(str(mapped_reads_filtered * 100))
 
@@ -152,4 +199,5 @@ def main(sample_id, assembler, assembly, filtered_assembly, fastq, basedir, thre
 
 
 if __name__ == '__main__':
-    main(SAMPLE_ID, ASSEMBLER, ASSEMBLY, FILTERED_ASSEMBLY, FASTQ, BASEDIR, THRESHOLD)
+    main(SAMPLE_ID, ASSEMBLER, ASSEMBLY, FILTERED_ASSEMBLY, FASTQ, BASEDIR, THRESHOLD, READS_REPORT, SINGLE_MAPPING,
+         KEEP_SAM)
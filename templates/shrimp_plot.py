@@ -4,10 +4,9 @@
 """
 
 import os
-import pandas as pd
 import json
 import plotly.graph_objs as go
-from plotly.offline import plot
+from plotly.utils import PlotlyJSONEncoder
 try:
     import utils
 except ImportError:
@@ -22,20 +21,26 @@ logger = utils.get_logger(__file__)
 
 if __file__.endswith(".command.sh"):
     PHRED_FILES = '$phred_files'.split()
+    HTML_PLOTS = "$params.html_plots"
+    CPUS = int("$task.cpus")
     logger.debug("Running {} with parameters:".format(
         os.path.basename(__file__)))
     logger.debug("PHRED_FILES: {}".format(PHRED_FILES))
+    logger.debug("HTML_PLOTS: {}".format(HTML_PLOTS))
+    logger.debug("CPUS: {}".format(CPUS))
 
 
-def main(phred_files):
+def main(phred_files, html_mode='standalone', cpus=1):
     """
 
     :param phred_files:
+    :param html_mode: string with how plotly.js is included in the HTML plots, or 'none' to skip them
+    :param cpus: int with the number of processes writing the HTML plots
     :return:
     """
 
-    df_phred = pd.DataFrame(columns=['Sample', 'Assembler', 'Reference', 'Contig', 'Contig Length',
-                                     'Phred Quality Score'])
+    df_phred = utils.DataFrameBuilder(['Sample', 'Assembler', 'Reference', 'Contig', 'Contig Length',
+                                       'Phred Quality Score'])
 
     for file_phred in phred_files:
         print(file_phred)
@@ -50,12 +55,17 @@ def main(phred_files):
                 contig = line[3]
                 contig_length = line[4]
                 phred_score = line[5]
-                df_phred = df_phred.append({'Sample': sample_name, 'Assembler': assembler, 'Reference': reference,
-                                            'Contig': contig, 'Contig Length': contig_length,
-                                            'Phred Quality Score': phred_score}, ignore_index=True)
+                df_phred.append({'Sample': sample_name, 'Assembler': assembler, 'Reference': reference,
+                                 'Contig': contig, 'Contig Length': contig_length,
+                                 'Phred Quality Score': phred_score})
+
+    df_phred = df_phred.to_df()
 
     # Create plot 
     report_dict = {}
+    html_plots = []
+    phred_groups = utils.group_rows(df_phred)
+    no_rows = df_phred.iloc[0:0]
     for sample in sorted(df_phred['Sample'].unique()):
         print(sample)
         for reference in sorted(df_phred['Reference'].unique()):
@@ -63,12 +73,9 @@ def main(phred_files):
             i = 0
 
             for assembler in sorted(df_phred['Assembler'].unique(), key=lambda v: v.upper()):
-                fig_phred.add_trace(go.Scatter(y=df_phred['Phred Quality Score'][(df_phred['Reference'] == reference) &
-                                                                                 (df_phred['Assembler'] == assembler) &
-                                                                                 (df_phred['Sample'] == sample)],
-                                               x=df_phred['Contig Length'][(df_phred['Reference'] == reference) &
-                                                                           (df_phred['Assembler'] == assembler) &
-                                                                           (df_phred['Sample'] == sample)],
+                data = phred_groups.get((sample, reference, assembler), no_rows)
+                fig_phred.add_trace(go.Scatter(y=data['Phred Quality Score'],
+                                               x=data['Contig Length'],
                                     name=assembler,
                                     opacity=0.7,
                                     mode='markers',
@@ -81,9 +88,8 @@ def main(phred_files):
                                     xaxis=dict(showline=True, zeroline=False, linewidth=1, linecolor='black',
                                                gridcolor='#DCDCDC'))
 
-            plot(fig_phred, filename='{0}_{1}_phred.html'.format(sample, reference.replace(' ', '_')), auto_open=False)
-
-            plot_species = fig_phred.to_json()
+            plot_species = fig_phred.to_plotly_json()
+            html_plots.append(('{0}_{1}_phred.html'.format(sample, reference.replace(' ', '_')), plot_species))
 
             if sample not in report_dict.keys():
                 report_dict[sample] = {"PlotData": {reference: [plot_species]}}
@@ -95,9 +101,11 @@ def main(phred_files):
 
         print(report_dict[sample]['PlotData'].keys())
 
+    utils.write_html_plots(html_plots, html_mode, cpus)
+
     with open("phred.json", "w") as json_report:
-        json_report.write(json.dumps(report_dict, separators=(",", ":")))
+        json_report.write(json.dumps(report_dict, separators=(",", ":"), cls=PlotlyJSONEncoder))
 
 
 if __name__ == '__main__':
-    main(PHRED_FILES)
+    main(PHRED_FILES, HTML_PLOTS, CPUS)
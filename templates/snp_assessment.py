@@ -17,10 +17,10 @@ The following variables are expected whether using NextFlow or the
     - e.g.: ``'SPAdes'``
 - ``assembly``: fasta file from the assembler (filtered for minimum length size)
     - e.g.: ``'spades.fasta'``
-- ``mapping``: paf file of the assembly mapped to the complete triple reference genomes
+- ``mapping``: paf file of the assembly mapped to the complete triple reference genomes, or its Parquet cache
     - e.g.: ``'spades.paf' ``
-- ``reference``: paf file to the complete triple reference genomes
-    - e.g.: ``'references.fasta' ``
+- ``reference``: reference catalogue JSON (or fasta file of the complete triple reference genomes)
+    - e.g.: ``'reference_catalogue.json' ``
 
 Authorship
 ----------
@@ -29,10 +29,6 @@ https://github.com/cimendes
 """
 
 import os
-import re
-from itertools import groupby
-from numpy.lib.function_base import append
-import pandas as pd
 import json
 try:
     import utils
@@ -50,7 +46,7 @@ if __file__.endswith(".command.sh"):
     ASSEMBLER = '$assembler'
     ASSEMBLY = '$assembly'
     MAPPING = '$mapping'
-    REFERENCE = '$reference'
+    REFERENCE = '$reference_catalogue'
     logger.debug("Running {} with parameters:".format(
         os.path.basename(__file__)))
     logger.debug("SAMPLE_ID: {}".format(SAMPLE_ID))
@@ -59,89 +55,80 @@ if __file__.endswith(".command.sh"):
     logger.debug("MAPPING: {}".format(MAPPING))
     logger.debug("REFERENCE: {}".format(REFERENCE))
 
-COLUMNS = ['Sample', 'Assembler', 'Reference', 'Reference Length', 'SNP Location']
+COLUMNS = ['Sample', 'Assembler', 'Reference', 'Reference Length', 'SNP Location', 'Substitution Type']
 
 
 def get_position(start, end, cigar):
     """
+    Gets the reference position of the substitutions in an alignment
+    :param start: reference coordinate where the alignment starts
+    :param end: reference coordinate where the alignment ends
+    :param cigar: cs tag of the alignment
+    :return: tuples with the reference position and the reference and substituting bases (yield)
     """
-    #parse cigar components - exact matches, insertions, deletions and substitutions
-    matches = re.findall(r'([:=*+-])(\\d+|[A-Za-z]+)', cigar)
-    
-    coord = start
-    substitution = []
-    for match in matches:
-        if match[0] == ':':
-            if match[1] == 'Z':
-                continue
-            if int(match[1]): #exact matches to the ref
-                coord += int(match[1])
-        if match[0] == '-': # if deletion, coords in the ref need to be ajusted
-            coord += len(match[1])
-        #if match[0] == '+': # insertions to the reference don't matter
-            #coord += len(match[1])
-        if match[0] == '*': 
-            substitution = match[1]
-            coord += 1
-            yield coord, substitution
-
-
-def get_snps(paf_file, ref_name, ref_len, sample_id, assembler):
+    _, substitutions, _, _ = utils.parse_cs_operations(cigar, start)
+    for substitution in substitutions:
+        yield substitution
+
+
+def get_snps(paf_file, reference_lengths):
     """
-    Function to process the mapping (*.paf) file for a given reference and output a list with snp locations from
-    the alignment.
-    :param paf_file: tabular file with alignment information for an assembler
-    :param ref_name: reference name to filter from the paf_filename
-    :param ref_len: int with expected reference length
-    :return: snps: list with snp coords in the reference in the assembly for the ref_name reference
+    Function to process the mapping (*.paf) file in a single pass and output, for all the references at once,
+    a list with snp locations from the alignments.
+    :param paf_file: tabular file with alignment information for an assembler (PAF or its Parquet cache)
+    :param reference_lengths: dict with the expected length of each reference, by name. Alignments to other
+                              targets are ignored.
+    :return: snps: dict with the list of (location, (reference base, substituting base)) for each reference
+             with substitutions, in the order of the paf file
     """
-    snps = []
-    tsv_report = open("{}_{}_{}_substitutions.tsv".format(sample_id, assembler, ref_name), "w")
-
-    with open(paf_file) as paf:
-        for line in paf:
-            parts = line.strip().split()
-            if parts[5] == ref_name:
-                if parts[4] == '+':
-                    start, end = int(parts[7]), int(parts[8])
-                else:
-                    start, end = int(parts[8]), int(parts[7])
-                cigar = parts[-1]
-                if len(re.findall(r'\\*', cigar)) > 0:
-                    snps_iterator = get_position(start, end, cigar)
-                    for snp in snps_iterator:
-                        tsv_report.write('\\t'.join([str(utils.adjust_reference_coord(snp[0], ref_len)), str(snp[1][0]), str(snp[1][1])]) + '\\n')
-                        snps.append((utils.adjust_reference_coord(snp[0], ref_len), snp[1]))
-                else:
-                    continue
-
-    tsv_report.close()
+    snps = {}
+
+    for strand, reference, target_start, target_end, cigar in utils.iter_paf(
+            paf_file, ['strand', 'tname', 'tstart', 'tend', 'cs']):
+        if reference in reference_lengths:
+            if strand == '+':
+                start, end = target_start, target_end
+            else:
+                start, end = target_end, target_start
+            record_snps = list(get_position(start, end, cigar))
+            if record_snps:
+                # map all the snp coords of the alignment to the original reference at once
+                locations = utils.fold_coords([snp[0] for snp in record_snps], reference_lengths[reference]).tolist()
+                snps.setdefault(reference, []).extend(
+                    (location, substitution) for location, (_, substitution) in zip(locations, record_snps))
+
     return snps
 
 
 def main(sample_id, assembler, assembly, mapping, reference):
 
-    df = pd.DataFrame(columns=COLUMNS)
+    df = utils.DataFrameBuilder(COLUMNS)
 
     reference_report = {"sample": sample_id,
                     "assembler": assembler, "reference": {}}
 
-    # iterator for reference files (sequence length is needed)
-    references = (x[1] for x in groupby(open(reference, "r"), lambda line: line[0] == ">"))
+    # reference names and lengths from the catalogue, the sequences are not needed
+    references = utils.load_reference_catalogue(reference)['references']
+
+    # snps for all the references, in a single pass of the paf file
+    all_snps = get_snps(mapping, {reference_entry['name']: reference_entry['length'] for reference_entry in references})
+
+    for reference_entry in references:
+        reference_name = reference_entry['name']
+        reference_length = reference_entry['length']
+        snps = all_snps.get(reference_name, [])
 
-    for header in references:
-        reference_name = header.__next__()[1:].strip()
-        print(reference_name)
-        seq = "".join(s.strip() for s in references.__next__())
-        snps = get_snps(mapping, reference_name, len(seq) / 3, sample_id, assembler)
+        with open("{}_{}_{}_substitutions.tsv".format(sample_id, assembler, reference_name), "w") as tsv_report:
+            for location, substitution in snps:
+                tsv_report.write('\\t'.join([str(location), str(substitution[0]), str(substitution[1])]) + '\\n')
 
         # plot gap location per reference per reference
         for snip_info in snps:
             coord = snip_info[0]
             substitution = '{}->{}'.format(snip_info[1][0], snip_info[1][1])
             #print(coord, substitution)
-            df = df.append({'Sample': sample_id, 'Assembler': assembler, 'Reference': reference_name,
-                            'Reference Length': len(seq)/3, 'SNP Location': coord, 'Substitution Type': substitution}, ignore_index=True)
+            df.append({'Sample': sample_id, 'Assembler': assembler, 'Reference': reference_name,
+                       'Reference Length': reference_length, 'SNP Location': coord, 'Substitution Type': substitution})
             
             if reference_name not in reference_report['reference'].keys():
                 reference_report['reference'][reference_name] = {"snps": 1}
@@ -152,7 +139,7 @@ def main(sample_id, assembler, assembly, mapping, reference):
     with open("{}_{}_snps.json".format(sample_id, assembler), "w") as json_report:
         json_report.write(json.dumps(reference_report, separators=(",", ":")))
     
-    df.to_csv(sample_id + '_' + assembler + '_snps.csv')
+    df.to_df().to_csv(sample_id + '_' + assembler + '_snps.csv')
 
 
 if __name__ == '__main__':
@@ -2,10 +2,12 @@
 # -*- coding: utf-8 -*-
 
 import os
+import json
 from itertools import groupby
-import pandas as pd
 import re
 import logging
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
 
 COLUMNS = ['Sample', 'Assembler', 'Contig', 'Contig Len',
            'Mapped', '#N']  # columns for dataframe
@@ -20,6 +22,95 @@ ASSEMBLER_NAMES = ["ABySS", "GATBMiniaPipeline", "MetaHipMer2", "MINIA", "MEGAHI
 ASSEMBLER_PROCESS_LIST = ["ABYSS", "GATBMINIAPIPELINE", "MINIA", "METAHIPMER2", "MEGAHIT", "METASPADES", "UNICYCLER", "SPADES",
                           "STRAINXPRESS", "SKESA", "VELVETOPTIMISER", "IDBA"]
 
+# size of the binary chunks read when scanning fasta files (4 MB)
+FASTA_CHUNK_SIZE = 4 * 1024 * 1024
+
+# PAF columns kept in the columnar PAF cache, with the index of the column in the PAF file.
+# The cs tag (last column) and the primary flag (from the tp tag) are parsed from the optional fields.
+PAF_COLUMNS = {'qname': 0, 'qlen': 1, 'qstart': 2, 'qend': 3, 'strand': 4, 'tname': 5, 'tlen': 6, 'tstart': 7,
+               'tend': 8, 'matches': 9, 'blocklen': 10, 'mapq': 11, 'primary': None, 'cs': None}
+PAF_INT_COLUMNS = ['qlen', 'qstart', 'qend', 'tlen', 'tstart', 'tend', 'matches', 'blocklen', 'mapq']
+# number of PAF records per row group of the columnar PAF cache
+PAF_CHUNK_ROWS = 100000
+
+# how plotly.js is included in the standalone HTML plots, per value of the html_plots parameter ('none' writes no HTML)
+HTML_PLOTLYJS = {'standalone': True, 'directory': 'directory', 'cdn': 'cdn'}
+
+# maximum number of segments drawn in a track of the gap and misassembly plots; above it, close segments are merged
+MAX_TRACK_SEGMENTS = 5000
+
+# operations of the cs tag: operation symbol and the length or the bases of the operation
+CS_OPERATION = re.compile(r'([:=*+-])(\d+|[A-Za-z]+)')
+
+# operations of the SAM CIGAR string: length and operation symbol
+SAM_CIGAR_OPERATION = re.compile(r'(\d+)([MIDNSHP=X])')
+# SAM flags of the records not counted as mapped reads: unmapped (0x4), secondary (0x100) and supplementary (0x800)
+SAM_SKIP_FLAGS = 0x4 | 0x100 | 0x800
+# SAM flags of the first (0x40) and last (0x80) read of a pair
+SAM_MATE_FLAGS = 0x40 | 0x80
+
+
+class DataFrameBuilder:
+    """
+    Collects rows into one list per column and builds the pandas DataFrame once at the end,
+    instead of appending rows one by one to a DataFrame (quadratic, and DataFrame.append no longer
+    exists in pandas 2).
+    """
+
+    def __init__(self, columns):
+        """
+        :param columns: list with the column names, in order
+        """
+        self.columns = list(columns)
+        self.data = {column: [] for column in self.columns}
+
+    def __len__(self):
+        return len(self.data[self.columns[0]]) if self.columns else 0
+
+    def append(self, row):
+        """
+        Adds a row to the builder.
+        :param row: dict with the column names as keys
+        """
+        for column in self.columns:
+            self.data[column].append(row[column])
+
+    def extend(self, rows):
+        """
+        Adds several rows at once to the builder.
+        :param rows: dict with the column names as keys and lists (or arrays) with the values of each row.
+                     Single values are repeated for all the rows.
+        """
+        import numpy as np
+
+        n_rows = max((len(values) for values in rows.values() if not np.isscalar(values)), default=1)
+        for column in self.columns:
+            values = rows[column]
+            if np.isscalar(values):
+                self.data[column].extend([values] * n_rows)
+            else:
+                self.data[column].extend(values)
+
+    def to_df(self):
+        """
+        Builds the DataFrame with the collected rows.
+        :return: pandas DataFrame
+        """
+        import pandas as pd
+
+        return pd.DataFrame(self.data, columns=self.columns)
+
+
+def group_rows(df, keys=('Sample', 'Reference', 'Assembler')):
+    """
+    Splits a DataFrame into the rows of each combination of values of the key columns, in a single groupby pass,
+    so the plot templates do not filter the whole DataFrame for every sample, reference and assembler.
+    :param df: pandas DataFrame
+    :param keys: sequence with the names of the key columns
+    :return: dict with the tuple of key values as key and the DataFrame with its rows (in the original order) as value
+    """
+    return {key: rows for key, rows in df.groupby(list(keys), sort=False)}
+
 
 def get_logger(filepath, level=logging.DEBUG):
     """
@@ -87,17 +178,299 @@ def fasta_iter(fasta_name):
         yield headerStr, seq
 
 
+def fasta_stats_iter(fasta_name, chunk_size=FASTA_CHUNK_SIZE):
+    """
+    Given a fasta file, yield tuples of header, sequence length, number of Ns and number of G and C bases
+    for each record. The file is read in binary chunks and the counts are updated chunk by chunk, so the
+    sequences are never held in memory. Headers are parsed as in fasta_iter and the counts are case insensitive.
+    :param fasta_name: string with fasta file to parse
+    :param chunk_size: int with the size of the chunks read from the file, in bytes
+    :return: tuples with header, length, Ns, GC (yield)
+    """
+    header = None
+    header_buffer = b''
+    in_header = False
+    at_line_start = True
+    length, n_count, gc_count = 0, 0, 0
+
+    with open(fasta_name, 'rb') as fh:
+        while True:
+            chunk = fh.read(chunk_size)
+            if not chunk:
+                break
+            pos = 0
+            while pos < len(chunk):
+                if in_header:
+                    end = chunk.find(b'\n', pos)
+                    if end == -1:
+                        header_buffer += chunk[pos:]
+                        pos = len(chunk)
+                    else:
+                        header_buffer += chunk[pos:end]
+                        header = header_buffer.decode().strip().split(' ')[0]
+                        in_header = False
+                        at_line_start = True
+                        pos = end + 1
+                elif at_line_start and chunk[pos:pos + 1] == b'>':
+                    if header is not None:
+                        yield header, length, n_count, gc_count
+                    length, n_count, gc_count = 0, 0, 0
+                    header_buffer = b''
+                    in_header = True
+                    pos += 1
+                else:
+                    # sequence lines up to the next header line
+                    end = chunk.find(b'\n>', pos)
+                    end = len(chunk) if end == -1 else end + 1
+                    sequence = chunk[pos:end].translate(None, b' \t\r\n')
+                    length += len(sequence)
+                    n_count += sequence.count(b'N') + sequence.count(b'n')
+                    gc_count += sequence.count(b'G') + sequence.count(b'C') + \
+                        sequence.count(b'g') + sequence.count(b'c')
+                    at_line_start = chunk[end - 1:end] == b'\n'
+                    pos = end
+
+    if in_header:
+        header = header_buffer.decode().strip().split(' ')[0]
+    if header is not None:
+        yield header, length, n_count, gc_count
+
+
+@contextmanager
+def open_decompressed(file_name, threads=1):
+    """
+    Opens a, possibly gzip compressed, file for binary reading. Gzip files are decompressed with the fastest
+    decompressor available: the isal library (python-isal), then pigz (with the given number of threads),
+    then the gzip module.
+    :param file_name: path to the file
+    :param threads: int with the number of threads for pigz
+    :return: binary file object (context manager)
+    """
+    if not file_name.endswith('.gz'):
+        with open(file_name, 'rb') as fh:
+            yield fh
+        return
+
+    try:
+        from isal import igzip
+    except ImportError:
+        igzip = None
+    if igzip is not None:
+        with igzip.open(file_name, 'rb') as fh:
+            yield fh
+        return
+
+    import shutil
+    if shutil.which('pigz'):
+        import subprocess
+        with subprocess.Popen(['pigz', '-dc', '-p', str(threads), file_name], stdout=subprocess.PIPE) as process:
+            yield process.stdout
+        if process.returncode != 0:
+            raise OSError("pigz failed to decompress {} (return code {})".format(file_name, process.returncode))
+        return
+
+    import gzip
+    with gzip.open(file_name, 'rb') as fh:
+        yield fh
+
+
+def count_lines(file_name, threads=1, chunk_size=FASTA_CHUNK_SIZE):
+    """
+    Counts the lines of a, possibly gzip compressed, file by counting the newlines in large binary chunks.
+    A last line without a trailing newline is counted, as when iterating the file line by line.
+    :param file_name: path to the file
+    :param threads: int with the number of threads for the decompression (see open_decompressed)
+    :param chunk_size: int with the size of the chunks read from the file, in bytes
+    :return: int with the number of lines
+    """
+    n_lines = 0
+    last_byte = b'\n'
+    with open_decompressed(file_name, threads) as fh:
+        while True:
+            chunk = fh.read(chunk_size)
+            if not chunk:
+                break
+            n_lines += chunk.count(b'\n')
+            last_byte = chunk[-1:]
+    if last_byte != b'\n':
+        n_lines += 1
+    return n_lines
+
+
+def load_read_count(reads_report, sample_id):
+    """
+    Gets the number of read pairs of a sample from its reads report (*_reads_report.json), written by
+    process_reads.py.
+    :param reads_report: path to the reads report
+    :param sample_id: string with sample identifier
+    :return: number of read pairs
+    """
+    with open(reads_report) as fh:
+        return json.load(fh)[sample_id]["reads"]
+
+
+def build_reference_catalogue(fasta_name, copies=1):
+    """
+    Scans a reference fasta file and builds the reference catalogue, with the length, number of G and C
+    bases and number of Ns of each replicon. If the fasta file holds the replicons repeated several times
+    (e.g. the triple reference), the values are divided by the number of copies.
+    :param fasta_name: string with reference fasta file to parse
+    :param copies: int with the number of times each replicon is repeated in the fasta file
+    :return: dict with the source file name and the list of replicons, in file order
+    """
+    references = []
+    for header, length, n_count, gc_count in fasta_stats_iter(fasta_name):
+        references.append({"name": header, "length": length // copies,
+                           "gc": gc_count // copies, "n": n_count // copies})
+
+    return {"source": os.path.splitext(os.path.basename(fasta_name))[0], "references": references}
+
+
+def load_reference_catalogue(reference, copies=3):
+    """
+    Loads the reference catalogue JSON written by the PROCESS_REFERENCE process. If a fasta file is given
+    instead (e.g. a triple reference produced without the catalogue), the catalogue is built by scanning it.
+    :param reference: path to the catalogue JSON or to the reference fasta file (or the catalogue, already loaded)
+    :param copies: int with the number of times each replicon is repeated in the fasta file, if a fasta is given
+    :return: dict with the source file name and the list of replicons, in file order
+    """
+    if isinstance(reference, dict):
+        return reference
+    if reference.endswith('.json'):
+        with open(reference) as fh:
+            return json.load(fh)
+    return build_reference_catalogue(reference, copies)
+
+
+def parse_paf_record(parts, columns):
+    """
+    Gets the values of the requested columns from a PAF record.
+    :param parts: list with the tab separated fields of the PAF record
+    :param columns: list with the names of the columns (from PAF_COLUMNS)
+    :return: tuple with the column values
+    """
+    values = []
+    for column in columns:
+        if column == 'cs':
+            values.append(parts[-1] if len(parts) > 12 else '')
+        elif column == 'primary':
+            values.append('tp:A:S' not in parts[12:])
+        elif column in PAF_INT_COLUMNS:
+            values.append(int(parts[PAF_COLUMNS[column]]))
+        else:
+            values.append(parts[PAF_COLUMNS[column]])
+    return tuple(values)
+
+
+def iter_paf(paf_file, columns=None):
+    """
+    Reads the requested columns of a PAF file one record at a time, either from the PAF text file or from the
+    columnar (Parquet) PAF cache written by paf_to_parquet, in which case only those columns are read from disk,
+    one row group at a time.
+    Besides the 12 mandatory PAF columns, 'primary' is False for the secondary alignments (tp:A:S) and
+    'cs' holds the last column of the record (the cs tag, or '' if the record has no optional fields).
+    :param paf_file: path to the PAF file or to the Parquet PAF cache (*.parquet)
+    :param columns: list with the names of the columns to read (from PAF_COLUMNS). Defaults to all columns
+    :return: tuples with the values of the requested columns of each PAF record, in PAF record order (yield)
+    """
+    columns = list(PAF_COLUMNS) if columns is None else columns
+
+    if paf_file.endswith('.parquet'):
+        yield from iter_parquet(paf_file, columns)
+    else:
+        with open(paf_file) as paf:
+            for line in paf:
+                yield parse_paf_record(line.rstrip('\n').split('\t'), columns)
+
+
+def write_parquet(data, parquet_file, types=None):
+    """
+    Writes a table, given as one list per column, into a typed columnar (Parquet) file.
+    :param data: dict with the column names as keys and lists with the column values
+    :param parquet_file: path to the Parquet file to write
+    :param types: dict with the pyarrow type of each column. Columns not in it are stored as strings
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {} if types is None else types
+    table = pa.table({column: pa.array(values, type=types.get(column, pa.string()))
+                      for column, values in data.items()})
+    pq.write_table(table, parquet_file)
+
+
+def read_parquet(parquet_file, columns=None):
+    """
+    Reads a table written by write_parquet.
+    :param parquet_file: path to the Parquet file
+    :param columns: list with the names of the columns to read. Defaults to all columns
+    :return: dict with the column name as key and list with the column values
+    """
+    import pyarrow.parquet as pq
+
+    return pq.read_table(parquet_file, columns=columns).to_pydict()
+
+
+def iter_parquet(parquet_file, columns=None):
+    """
+    Reads the rows of a Parquet file one row group at a time, so that only one row group is held in memory.
+    :param parquet_file: path to the Parquet file
+    :param columns: list with the names of the columns to read. Defaults to all columns
+    :return: tuples with the values of the requested columns of each row, in file order (yield)
+    """
+    import pyarrow.parquet as pq
+
+    parquet = pq.ParquetFile(parquet_file)
+    for row_group_index in range(parquet.num_row_groups):
+        row_group = parquet.read_row_group(row_group_index, columns=columns)
+        names = row_group.column_names if columns is None else columns
+        yield from zip(*(row_group.column(name).to_pylist() for name in names))
+
+
+def paf_to_parquet(paf_file, parquet_file, chunk_rows=PAF_CHUNK_ROWS):
+    """
+    Converts a PAF file into the typed columnar PAF cache (Parquet), so that the PAF text is parsed only once
+    and each analysis reads only the columns it needs. The PAF file is read one record at a time and written
+    in row groups of chunk_rows records, so only one chunk is held in memory.
+    :param paf_file: path to the PAF file
+    :param parquet_file: path to the Parquet file to write
+    :param chunk_rows: int with the number of PAF records per row group
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = list(PAF_COLUMNS)
+    types = {column: pa.int64() for column in PAF_INT_COLUMNS}
+    types['primary'] = pa.bool_()
+    schema = pa.schema([(column, types.get(column, pa.string())) for column in columns])
+
+    def write_chunk(chunk):
+        arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*chunk), schema)]
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+
+    writer = pq.ParquetWriter(parquet_file, schema)
+    try:
+        chunk = []
+        for record in iter_paf(paf_file, columns):
+            chunk.append(record)
+            if len(chunk) == chunk_rows:
+                write_chunk(chunk)
+                chunk = []
+        if chunk:
+            write_chunk(chunk)
+    finally:
+        writer.close()
+
+
 def get_mapped_contigs(paf_file):
     """
     Gets list with the sizes of the mapped contigs.
     In the paf file, the first col is the contig name,
     the second is the contig size (excludes gaps)
-    :param paf_file: path to the PAF file
+    :param paf_file: path to the PAF file or to the Parquet PAF cache
     :return: list with contig sizes
     """
-    with open(paf_file) as f:
-        mapped_contigs = [line.split()[0] for line in f]
-    return mapped_contigs
+    return [contig for contig, in iter_paf(paf_file, ['qname'])]
 
 
 def get_mapped_contigs_with_ref(paf_file):
@@ -105,19 +478,86 @@ def get_mapped_contigs_with_ref(paf_file):
     Gets a dictionary with references and the the mapped contigs.
     In the paf file, the first col is the contig name,
     the sixth is the reference name
-    :param paf_file: path to the PAF file
+    :param paf_file: path to the PAF file or to the Parquet PAF cache
     :return: dict with reference and aligned contigs
     """
     mapped_contigs = {}
-    with open(paf_file) as f:
-        for line in f:
-            if line.split()[0] not in mapped_contigs.keys():
-                mapped_contigs[line.split()[0]] = [line.split()[5]]
-            else:
-                mapped_contigs[line.split()[0]].append(line.split()[5])
+    for contig, reference in iter_paf(paf_file, ['qname', 'tname']):
+        if contig not in mapped_contigs.keys():
+            mapped_contigs[contig] = [reference]
+        else:
+            mapped_contigs[contig].append(reference)
     return mapped_contigs
 
 
+def index_paf(paf_file):
+    """
+    Reads a PAF file (or its Parquet cache) in a single pass and groups the alignment records by target
+    (reference) name, the sixth column of the PAF file. The numeric columns are converted to int and the last
+    column (the cs tag, if present) is kept as a string at the end of the record.
+    :param paf_file: path to the PAF file or to the Parquet PAF cache
+    :return: dict with reference name as key and list of alignment records (list with the PAF columns)
+    """
+    columns = ['qname', 'qlen', 'qstart', 'qend', 'strand', 'tname', 'tlen', 'tstart', 'tend', 'matches',
+               'blocklen', 'mapq', 'cs']
+    paf_index = {}
+    for record in iter_paf(paf_file, columns):
+        record = list(record)
+        if record[5] not in paf_index:
+            paf_index[record[5]] = [record]
+        else:
+            paf_index[record[5]].append(record)
+    return paf_index
+
+
+def count_mapped_reads(sam_lines, threshold, sam_handle=None, contig_subset=None):
+    """
+    Counts the reads mapping to an assembly from a stream of SAM records. A read is mapped if its primary alignment
+    block covers the threshold fraction of the read length. Unmapped, secondary and supplementary records are
+    skipped and reads are counted once by name and mate (first or second of the pair), as minimap2 gives both mates
+    of a pair the same name.
+    :param sam_lines: iterable with the SAM lines, header included
+    :param threshold: float with the minimum fraction of the read length aligned
+    :param sam_handle: optional file handle where the SAM lines are also written
+    :param contig_subset: optional set of contig names, to also count the reads mapped to those contigs only
+    :return: int with the number of records over the threshold, int with the number of distinct reads mapped
+             and int with the number of distinct reads mapped to the contig_subset (None if not given)
+    """
+    threshold = float(threshold)
+    n_records_mapping = 0
+    mapped_reads = set()
+    subset_reads = set()
+
+    for line in sam_lines:
+        if sam_handle is not None:
+            sam_handle.write(line)
+        if line.startswith('@'):
+            continue
+        parts = line.split('\t', 6)
+        flag = int(parts[1])
+        if flag & SAM_SKIP_FLAGS:
+            continue
+
+        # read length (clipped bases included) and alignment block length (gaps included), as in the PAF format
+        query_length = 0
+        block_length = 0
+        for length, operation in SAM_CIGAR_OPERATION.findall(parts[5]):
+            if operation in 'MIS=XH':
+                query_length += int(length)
+            if operation in 'MID=X':
+                block_length += int(length)
+
+        if block_length >= query_length * threshold:
+            n_records_mapping += 1
+            read = (parts[0], flag & SAM_MATE_FLAGS)
+            mapped_reads.add(read)
+            if contig_subset is not None and parts[2] in contig_subset:
+                subset_reads.add(read)
+
+    return n_records_mapping, len(mapped_reads), \
+        (len(subset_reads) if contig_subset is not None else None)
+
+
 def parse_assemblies(sample_id, assembler, assembly, mapping):
     """
     Parses fastas and paf files and returns info on 'Assembler','Contig', 'Contig Len', 'Mapped' as dataframe
@@ -127,28 +567,66 @@ def parse_assemblies(sample_id, assembler, assembly, mapping):
     :param mapping: paf files
     :return: pandas dataframe
     """
-    df = pd.DataFrame(columns=COLUMNS)
+    records = DataFrameBuilder(COLUMNS)
 
     mapped_contigs = get_mapped_contigs_with_ref(mapping)
 
-    fasta = fasta_iter(assembly)
-    for header, seq in fasta:
-        Ns = len(re.findall("N", seq.upper()))
+    fasta = fasta_stats_iter(assembly)
+    for header, contig_len, Ns, _ in fasta:
         if header in mapped_contigs.keys():
             for reference in mapped_contigs[header]:
                 is_mapped = reference
-                df = df.append({'Sample': sample_id, 'Assembler': assembler, 'Contig': header, 'Contig Len': len(seq),
-                        'Mapped': is_mapped, '#N': Ns}, ignore_index=True)
+                records.append({'Sample': sample_id, 'Assembler': assembler, 'Contig': header, 'Contig Len': contig_len,
+                                'Mapped': is_mapped, '#N': Ns})
         else:
             is_mapped = 'Unmapped'
-            df = df.append({'Sample': sample_id, 'Assembler': assembler, 'Contig': header, 'Contig Len': len(seq),
-                            'Mapped': is_mapped, '#N': Ns}, ignore_index=True)
+            records.append({'Sample': sample_id, 'Assembler': assembler, 'Contig': header, 'Contig Len': contig_len,
+                            'Mapped': is_mapped, '#N': Ns})
 
-    df = df.reset_index()
+    df = records.to_df().reset_index()
 
     return df
 
 
+def write_html_plot(html_plot):
+    """
+    Writes a figure to an HTML file.
+    :param html_plot: tuple with the HTML file name, the figure (plotly figure or its dict) and the include_plotlyjs
+    value for plotly
+    """
+    from plotly.offline import plot
+
+    filename, figure, include_plotlyjs = html_plot
+    plot(figure, filename=filename, include_plotlyjs=include_plotlyjs, validate=False, auto_open=False)
+
+
+def write_html_plots(html_plots, html_mode='standalone', cpus=1):
+    """
+    Writes the figures to HTML files, in a process pool when more than one cpu is available.
+    With the 'directory' mode, all HTML files load a single plotly.min.js file written to the working directory.
+    :param html_plots: list of tuples with the HTML file name and the figure (plotly figure or its dict)
+    :param html_mode: string with how plotly.js is included, 'standalone', 'directory' or 'cdn'. If 'none', no HTML is
+    written.
+    :param cpus: int with the number of worker processes
+    """
+    if html_mode == 'none' or not html_plots:
+        return
+
+    include_plotlyjs = HTML_PLOTLYJS[html_mode]
+    if include_plotlyjs == 'directory' and not os.path.exists('plotly.min.js'):
+        from plotly.offline import get_plotlyjs
+        with open('plotly.min.js', 'w') as plotlyjs_fh:
+            plotlyjs_fh.write(get_plotlyjs())
+
+    tasks = [(filename, figure, include_plotlyjs) for filename, figure in html_plots]
+    if cpus > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(cpus, len(tasks))) as executor:
+            list(executor.map(write_html_plot, tasks, chunksize=max(1, len(tasks) // (4 * cpus))))
+    else:
+        for task in tasks:
+            write_html_plot(task)
+
+
 def get_Nx(alignment_lengths, target):
     """
     Calculate NAx (x=target) form a list of contig lenghts
@@ -219,6 +697,40 @@ def get_Lx(alignment_lengths, ref_len, target):
     return Lx
 
 
+def get_contiguity_curves(alignment_lengths, ref_len, targets):
+    """
+    Calculates the NAx, NGx and Lx metrics for a vector of targets at once. The contig lengths are
+    sorted a single time and the cumulative length is searched for every target, giving the same
+    values as get_Nx, get_NGx and get_Lx for each target.
+    :param alignment_lengths: list of aligned contig length sizes (unordered)
+    :param ref_len: int with the expected reference length
+    :param targets: array of percentages of the reference length, from 0 to 1 (float)
+    :return: numpy arrays with the NAx, NGx and Lx values for each target
+    """
+    import numpy as np
+
+    targets = np.asarray(targets, dtype=float)
+    sorted_lengths = np.sort(np.asarray(alignment_lengths, dtype=np.int64))[::-1]  # from longest to shortest
+    cumulative_lengths = np.cumsum(sorted_lengths)
+    n_contigs = len(sorted_lengths)
+    total_length = int(cumulative_lengths[-1]) if n_contigs > 0 else 0
+
+    # length of the first contig where the cumulative length reaches the target length
+    padded_lengths = np.append(sorted_lengths, 0)
+    nax = padded_lengths[np.searchsorted(cumulative_lengths, total_length * targets, side='left')]
+    ngx = padded_lengths[np.searchsorted(cumulative_lengths, ref_len * targets, side='left')]
+
+    # number of contigs whose cumulative length doesn't exceed the target length
+    target_lengths = ref_len * targets
+    if n_contigs == 1:
+        lx = np.ones(len(targets), dtype=np.int64)
+    else:
+        lx = np.searchsorted(cumulative_lengths, target_lengths, side='right').astype(np.int64)
+    lx[total_length < target_lengths] = 0
+
+    return nax, ngx, lx
+
+
 def is_number(n):
     """
     Verify if n is a number by trying to set it to float
@@ -232,64 +744,295 @@ def is_number(n):
         return False
 
 
+def parse_cs_operations(string, start=0):
+    """
+    Parses PAF's cigar string (cs tag) in a single pass, with one compiled tokenizer, and returns the exact
+    matches, substitutions, insertions and deletions together.
+    The exact matches are marked with ":" followed by the number of identical bases, the substitutions with "*"
+    followed by the reference base and the substituting base, the insertions with '+' followed by the bases
+    inserted in comparison to the reference, and the deletions with '-' followed by the bases deleted in
+    comparison to the reference.
+    :param string: Cigar-like string to be parsed (e.g. 'cs:Z::10*ga:5-ac+t')
+    :param start: reference coordinate where the alignment starts, for the substitution positions
+    :return:
+        - exact_matches: int with the number of identical bases
+        - substitutions: list of tuples with the reference position and the reference and substituting bases
+        - insertions: list with the length of each insertion
+        - deletions: list with the length of each deletion
+    """
+    exact_matches = 0
+    substitutions = []
+    insertions = []
+    deletions = []
+
+    coord = start
+    for operation, value in CS_OPERATION.findall(string):
+        if operation == ':':
+            if value.isdigit():  # skip the 'cs:Z:' prefix
+                exact_matches += int(value)
+                coord += int(value)
+        elif operation == '*':
+            coord += 1
+            substitutions.append((coord, value))
+        elif operation == '-':  # deletions advance the coords in the reference
+            deletions.append(len(value))
+            coord += len(value)
+        elif operation == '+':  # insertions to the reference don't
+            insertions.append(len(value))
+        else:  # identical bases in the long form of the cs tag
+            exact_matches += len(value)
+            coord += len(value)
+
+    return exact_matches, substitutions, insertions, deletions
+
+
 def parse_cs(string):
     """
     Parses PAF's cigar string to obtain the number of snps and indels.
-    The sybstitutions are marked with "*" followed by the reference base and the substituting base,
-    the insertions with '+' followed by the bases inserted in comparison to the reference, and
-    the deletions with '-' followed by the bases deleted in comparison to the reference.
     :param string: Cigar-like string to be parsed
     :returns
+        - exact_matches: int with the number of identical bases
+        - snps: int with the number of substitutions
+        - indel: list with the insertions ('+' and length) followed by the deletions ('-' and length)
     """
-    indel = []
-
-    exact_matches = sum(map(int, re.findall(r':([\d]+)', string)))
+    exact_matches, substitutions, insertions, deletions = parse_cs_operations(string)
 
-    # substitutions
-    snps = len(re.findall(r'\*', string))
+    indel = ['+' + str(length) for length in insertions] + ['-' + str(length) for length in deletions]
 
-    # insertions
-    insertions = re.findall(r'\+([a-z]+)', string)
-    for insertion in insertions:
-        indel.append('+' + str(len(insertion)))
-
-    # deletion
-    deletions = re.findall(r'-([a-z]+)', string)
-    for deletion in deletions:
-        indel.append('-' + str(len(deletion)))
-
-    return exact_matches, snps, indel
+    return exact_matches, len(substitutions), indel
 
 
 def cs_parse_deletion(string):
     """
     Parses PAF's cigar string to obtain the length of the deletion
     """
-    deletion_lenght = 0
+    _, _, _, deletions = parse_cs_operations(string)
+
+    return sum(deletions)
 
-    deletions = re.findall(r'-([a-z]+)', string)
-    for deletion in deletions:
-        deletion_lenght += len(deletion)
-    
-    return deletion_lenght
 
 def cs_get_matched_bases(string):
-    return sum(map(int, re.findall(r':([\d]+)', string)))
+    exact_matches, _, _, _ = parse_cs_operations(string)
+    return exact_matches
 
 
 def adjust_reference_coord(coord, ref_len):
     """
-
-    :param coord:
-    :param ref_len:
+    Maps a coordinate in the triple reference (or in any reference with the replicon followed by a
+    wrap-around overlap) to the coordinates of the original replicon, in O(1). The coordinate ref_len is
+    kept as ref_len and only the coordinate 0 is mapped to 0.
+    :param coord: int with the coordinate in the triple reference
+    :param ref_len: int with the expected reference length
     :return: int coord adjusted to the real length of the reference
     """
     if coord <= ref_len:
         return (coord)
-    elif coord <= 2 * ref_len:
-        return (coord - ref_len)
+    return coord - ((coord - 1) // ref_len) * ref_len
+
+
+def fold_coords(coords, ref_len):
+    """
+    Vectorised version of adjust_reference_coord, to map all the triple reference coordinates of a
+    reference at once.
+    :param coords: list or numpy array with the coordinates in the triple reference
+    :param ref_len: int with the expected reference length
+    :return: numpy array with the coordinates adjusted to the real length of the reference
+    """
+    import numpy as np
+
+    coords = np.asarray(coords, dtype=np.int64)
+    return coords - np.maximum((coords - 1) // ref_len, 0) * ref_len
+
+
+def fold_intervals(intervals, ref_len):
+    """
+    Folds a list of [start, stop) intervals in the triple reference coordinates into the coordinates of the
+    original reference, splitting the intervals that cross the boundary between copies. As in
+    adjust_reference_coord, the coordinate ref_len is kept as ref_len and only the coordinate 0 is mapped to 0.
+    The intervals within a single copy, the vast majority, are folded at once with numpy.
+    :param intervals: list of lists containing start (0 based, closed) and stop (0 based, open) positions
+    :param ref_len: int with the expected reference length
+    :return: list of lists with the folded [start, stop) intervals (unsorted)
+    """
+    import numpy as np
+
+    ref_len = int(ref_len)
+    intervals = np.asarray(intervals, dtype=np.int64).reshape(-1, 2)
+    intervals = intervals[intervals[:, 0] < intervals[:, 1]]
+
+    folded = [[0, 1] for _ in range(int(np.count_nonzero(intervals[:, 0] == 0)))]
+
+    # shift by one so that the positions 1 to ref_len fold onto themselves
+    starts = np.maximum(intervals[:, 0], 1) - 1
+    stops = intervals[:, 1] - 1
+    start_copy = starts // ref_len
+    single_copy = start_copy == (stops - 1) // ref_len
+
+    offsets = start_copy[single_copy] * ref_len - 1
+    folded.extend(np.column_stack((starts[single_copy] - offsets, stops[single_copy] - offsets)).tolist())
+
+    for start, stop in zip(starts[~single_copy].tolist(), stops[~single_copy].tolist()):
+        while start < stop:
+            offset = start - (start % ref_len)
+            segment_stop = min(stop, offset + ref_len)
+            folded.append([start - offset + 1, segment_stop - offset + 1])
+            start = segment_stop
+    return folded
+
+
+def merge_intervals(intervals):
+    """
+    Sorts a list of [start, stop) intervals and merges the ones that overlap or are adjacent.
+    :param intervals: list of lists containing start (0 based, closed) and stop (0 based, open) positions
+    :return: sorted list of lists with the merged [start, stop) intervals
+    """
+    merged = []
+    for start, stop in sorted(intervals, key=lambda x: x[0]):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], stop)
+        else:
+            merged.append([start, stop])
+    return merged
+
+
+def split_wrapped_intervals(starts, stops, ref_len):
+    """
+    Splits the intervals that wrap around the end of a circular replicon into [start, ref_len] and [1, stop]. Once
+    the triple reference coordinates are folded one endpoint at a time (see adjust_reference_coord), an interval
+    crossing the boundary between copies has start > stop.
+    :param starts: list with the start coordinate of each interval (folded)
+    :param stops: list with the end coordinate of each interval (folded, closed)
+    :param ref_len: int with the reference length
+    :return: list of [start, stop, index] lists with start <= stop, and the index of the interval each one comes from
+    """
+    split = []
+    for i, (start, stop) in enumerate(zip(starts, stops)):
+        if start > stop:
+            split.append([start, ref_len, i])
+            split.append([1, stop, i])
+        else:
+            split.append([start, stop, i])
+    return split
+
+
+def get_coverage_steps(intervals, ref_len):
+    """
+    Computes the coverage depth of a list of intervals as a step function, with an endpoint sweep over the interval
+    boundaries (memory linear in the number of intervals, not in the number of bases).
+    :param intervals: list of [start, stop] intervals (0 based, both closed). Intervals with start > stop wrap around
+    the end of the reference and are split with split_wrapped_intervals
+    :param ref_len: int with the reference length, the end of the last uncovered region
+    :return: sorted list of (position, depth) tuples with the first and last position of each run of constant depth
+    (a single tuple for runs of one base)
+    """
+    if not intervals:
+        return []
+
+    # sparse difference array: change in depth at each boundary
+    depth_change = {}
+    for start, stop, _ in split_wrapped_intervals([interval[0] for interval in intervals],
+                                                  [interval[1] for interval in intervals], ref_len):
+        depth_change[start] = depth_change.get(start, 0) + 1
+        depth_change[stop + 1] = depth_change.get(stop + 1, 0) - 1
+
+    # runs of constant depth, as [start, depth], each one ending before the start of the next
+    runs = [] if min(depth_change) == 0 else [[0, 0]]
+    depth = 0
+    for position in sorted(depth_change):
+        depth += depth_change[position]
+        if not runs or depth != runs[-1][1]:
+            runs.append([position, depth])
+
+    steps = []
+    for (start, depth), (next_start, _) in zip(runs, runs[1:]):
+        steps.append((start, depth))
+        if next_start - 1 != start:
+            steps.append((next_start - 1, depth))
+
+    # the last run is uncovered and ends at the reference length
+    if runs[-1][0] < ref_len:
+        steps.extend(((runs[-1][0], 0), (ref_len, 0)))
+
+    return steps
+
+
+def get_track_segments(starts, stops, max_segments=MAX_TRACK_SEGMENTS, ref_len=None):
+    """
+    Sorts the segments of a track (e.g. the gaps or the misassembled blocks of an assembler). If there are more than
+    max_segments, the segments closer than (track span / max_segments) are merged, so the number of segments in the
+    track is capped at about max_segments.
+    :param starts: list with the start coordinate of each segment
+    :param stops: list with the end coordinate of each segment
+    :param max_segments: int with the maximum number of segments before merging
+    :param ref_len: int with the reference length. If given, the segments with start > stop, which wrap around the end
+    of the reference, are split with split_wrapped_intervals
+    :return: list of [start, stop, index, count] lists, with the index of the first segment merged and the number of
+    segments merged
+    """
+    if ref_len is not None:
+        pieces = split_wrapped_intervals(starts, stops, ref_len)
     else:
-        return (coord - (2 * ref_len))
+        pieces = [[start, stop, i] for i, (start, stop) in enumerate(zip(starts, stops))]
+    pieces.sort(key=lambda piece: (piece[0], piece[1]))
+    bin_size = (max(piece[1] for piece in pieces) - pieces[0][0]) / max_segments \
+        if len(pieces) > max_segments else None
+
+    segments = []
+    for start, stop, i in pieces:
+        if bin_size is not None and segments and start - segments[-1][1] <= bin_size:
+            segments[-1][1] = max(segments[-1][1], stop)
+            segments[-1][3] += 1
+        else:
+            segments.append([start, stop, i, 1])
+    return segments
+
+
+def get_track_coords(starts, stops, texts, y, merged_text, max_segments=MAX_TRACK_SEGMENTS, ref_len=None):
+    """
+    Builds the coordinates of a track of segments drawn as a single line trace, with the segments separated by None
+    (gaps in the line).
+    :param starts: list with the start coordinate of each segment
+    :param stops: list with the end coordinate of each segment
+    :param texts: list with the hover text of each segment
+    :param y: y coordinate of the track
+    :param merged_text: string with the hover text of merged segments, formatted with the number of segments merged
+    :param max_segments: int with the maximum number of segments before merging
+    :param ref_len: int with the reference length, to split the segments that wrap around its end
+    :return: tuple with the x, y and text lists of the trace
+    """
+    x_values, y_values, text_values = [], [], []
+    for start, stop, index, count in get_track_segments(starts, stops, max_segments, ref_len):
+        text = texts[index] if count == 1 else merged_text.format(count)
+        x_values.extend((start, stop, None))
+        y_values.extend((y, y, None))
+        text_values.extend((text, text, None))
+    return x_values, y_values, text_values
+
+
+def get_interval_stats(intervals, ref_len=None):
+    """
+    Computes the covered length, the gaps and the overlap of a list of [start, stop) intervals in
+    O(n log n) over the number of intervals. If the reference length is provided, the intervals are
+    considered to be in the triple reference coordinates and are folded into the original reference.
+    :param intervals: list of lists containing start (0 based, closed) and stop (0 based, open) positions
+    :param ref_len: int with the expected reference length (optional)
+    :return:
+        - covered: int with the number of positions covered by at least one interval
+        - gaps: list of lists with the last covered position before and the first covered position after each gap
+        - overlap: int with the number of positions covered more than once (counted per extra interval)
+    """
+    if ref_len is not None:
+        intervals = fold_intervals(intervals, ref_len)
+    else:
+        intervals = [[int(start), int(stop)] for start, stop in intervals if start < stop]
+
+    merged = merge_intervals(intervals)
+
+    covered = sum(stop - start for start, stop in merged)
+    overlap = sum(stop - start for start, stop in intervals) - covered
+    gaps = [[previous[1] - 1, current[0]] for previous, current in zip(merged, merged[1:])]
+
+    return covered, gaps, overlap
 
 
 def check_overlap(list_of_coords):
@@ -298,28 +1041,17 @@ def check_overlap(list_of_coords):
     :param list_of_coords: list of lists containing start (0 based, closed) and stop (0 based, open) positions
     return: True if there is an overlap, False otherwise
     """
-    sorted_list_of_coords = sorted(list_of_coords, key=lambda x: x[0])
-    list_of_ranges = []
-    for coods in sorted_list_of_coords:
-        x = range(coods[0],coods[1])
-        list_of_ranges.append(set(x))
-    for i in range(len(list_of_ranges)-1):
-        if len(list_of_ranges[i].intersection(list_of_ranges[i+1])) > 0:
-            return True
-    return False
+    return any(overlap > 0 for overlap in get_check_overlap(list_of_coords))
+
 
 def get_check_overlap(list_of_coords):
     """
-    Function that takes a list of coords and returns a list with overlap lengths 
+    Function that takes a list of coords and returns a list with overlap lengths.
+    The coords are sorted by start position and each block is compared with the next one, with the
+    overlap length computed from the interval endpoints, in O(k log k) for k blocks.
     :param list_of_coords: list of lists containing start (0 based, closed) and stop (0 based, open) positions
     return: list with overlap lengths 
     """
     sorted_list_of_coords = sorted(list_of_coords, key=lambda x: x[0])
-    list_of_ranges = []
-    overlaps = []
-    for coods in sorted_list_of_coords:
-        x = range(coods[0],coods[1])
-        list_of_ranges.append(set(x))
-    for i in range(len(list_of_ranges)-1):
-        overlaps.append(len(list_of_ranges[i].intersection(list_of_ranges[i+1])))
-    return overlaps
\ No newline at end of file
+    return [max(0, min(previous[1], current[1]) - max(previous[0], current[0]))
+            for previous, current in zip(sorted_list_of_coords, sorted_list_of_coords[1:])]
@@ -48,10 +48,29 @@ def test_fasta_iter():
     assert len(first_contig) == 1061
     assert sorted(set(first_contig)) == ['A', 'C', 'G', 'T']
 
+
+def test_fasta_stats_iter():
+    for (header, seq), (stats_header, length, Ns, GC) in zip(utils.fasta_iter(ASSEMBLY_TEST),
+                                                             utils.fasta_stats_iter(ASSEMBLY_TEST)):
+        assert header == stats_header
+        assert len(seq) == length
+        assert seq.upper().count('N') == Ns
+        assert seq.upper().count('G') + seq.upper().count('C') == GC
+
+
+def test_fasta_stats_iter_chunks(tmp_path):
+    fasta = tmp_path / "test.fasta"
+    fasta.write_text(">contig_1 description\nACGTN\nnnGC\n>contig_2\n>contig_3\r\nAC>G\r\nTT\n\n>contig_4\nGGCC")
+    expected = [('contig_1', 9, 3, 4), ('contig_2', 0, 0, 0), ('contig_3', 6, 0, 2), ('contig_4', 4, 0, 4)]
+
+    for chunk_size in range(1, 20):
+        assert list(utils.fasta_stats_iter(str(fasta), chunk_size)) == expected
+
+
 def test_get_contig_lists():
 
     # test LMAS
-    fasta_iterator = utils.fasta_iter(ASSEMBLY_TEST)
+    fasta_iterator = utils.fasta_stats_iter(ASSEMBLY_TEST)
     contigs_len, contigs_len_over_1000, Ns_all, Ns_over_1000 = assembly_stats_global.get_contig_lists(fasta_iterator, 1000)
 
     # get quast result 
@@ -74,7 +93,7 @@ def test_get_contig_lists():
     assert Ns_all == quast_ns
 
 def test_get_Nx():
-    fasta_iterator = utils.fasta_iter(ASSEMBLY_TEST)
+    fasta_iterator = utils.fasta_stats_iter(ASSEMBLY_TEST)
     contigs_len, contigs_len_over_1000, Ns_all, Ns_over_1000 = assembly_stats_global.get_contig_lists(fasta_iterator, 1000)
     n50_contigs = utils.get_Nx(contigs_len, 0.5)
     n50_contigs_over_min_len = utils.get_Nx(contigs_len_over_1000, 0.5)
@@ -11,8 +11,11 @@ pytest.fail
     Status for the test (Pass or Fail)
 """
 import csv
+import os
 import json
+import numpy as np
 import pytest
+import random
 from contextlib import contextmanager
 from itertools import groupby
 from templates import assembly_stats_mapping
@@ -58,6 +61,66 @@ def test_get_mapped_contigs_with_ref():
                                     'Pseudomonas_aeruginosa', 'Salmonella_enterica', 'Staphylococcus_aureus', 'Staphylococcus_aureus_plasmid1', 'Staphylococcus_aureus_plasmid2', 'Staphylococcus_aureus_plasmid3']
 
 
+def test_index_paf():
+
+    paf_index = utils.index_paf(MAPPING_TEST)
+
+    with open(MAPPING_TEST) as paf:
+        n_records = sum(1 for _ in paf)
+
+    assert len(paf_index.keys()) == 12
+    assert sum(len(records) for records in paf_index.values()) == n_records
+    for reference, records in paf_index.items():
+        for record in records:
+            assert record[5] == reference
+            assert record[2] <= record[3] <= record[1]
+            assert record[-1].startswith('cs:Z:')
+
+
+def test_paf_parquet_cache(tmp_path):
+
+    pytest.importorskip("pyarrow")
+
+    parquet_file = str(tmp_path / "assembly.parquet")
+    utils.paf_to_parquet(MAPPING_TEST, parquet_file)
+
+    assert list(utils.iter_paf(parquet_file)) == list(utils.iter_paf(MAPPING_TEST))
+    assert list(utils.iter_paf(parquet_file, ['tname', 'tstart'])) == list(utils.iter_paf(MAPPING_TEST, ['tname', 'tstart']))
+    assert all(primary for primary, in utils.iter_paf(parquet_file, ['primary']))
+    assert utils.index_paf(parquet_file) == utils.index_paf(MAPPING_TEST)
+    assert utils.get_mapped_contigs_with_ref(parquet_file) == utils.get_mapped_contigs_with_ref(MAPPING_TEST)
+
+
+def test_paf_parquet_cache_chunks(tmp_path):
+
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    parquet_file = str(tmp_path / "assembly.parquet")
+    utils.paf_to_parquet(MAPPING_TEST, parquet_file, chunk_rows=7)
+
+    n_records = len(list(utils.iter_paf(MAPPING_TEST, ['qname'])))
+    assert pq.ParquetFile(parquet_file).num_row_groups == (n_records + 6) // 7
+    assert list(utils.iter_paf(parquet_file)) == list(utils.iter_paf(MAPPING_TEST))
+    assert list(utils.iter_paf(parquet_file, ['cs', 'tname'])) == list(utils.iter_paf(MAPPING_TEST, ['cs', 'tname']))
+
+
+def test_iter_paf_primary(tmp_path):
+
+    paf_file = tmp_path / "secondary.paf"
+    with open(MAPPING_TEST) as paf:
+        records = [next(paf).rstrip('\n') for _ in range(3)]
+    with open(paf_file, "w") as fh:
+        fh.write(records[0] + '\n')
+        fh.write(records[1].replace('tp:A:P', 'tp:A:S') + '\n')
+        fh.write('\t'.join(records[2].split('\t')[:12]) + '\n')
+
+    qlens, primaries, cs_tags = zip(*utils.iter_paf(str(paf_file), ['qlen', 'primary', 'cs']))
+    assert primaries == (True, False, True)
+    assert list(qlens) == [int(record.split('\t')[1]) for record in records]
+    assert cs_tags[0].startswith('cs:Z:')
+    assert cs_tags[2] == ''
+
+
 def test_parse_assemblies():
 
     df = utils.parse_assemblies(
@@ -78,6 +141,42 @@ def test_contig_overlaps():
     assert sum(utils.get_check_overlap(list_with_overlap)) == 10
 
 
+def test_check_overlap():
+    """
+    The overlaps computed from the interval endpoints must match the set-based computation
+    """
+
+    def set_overlaps(list_of_coords):
+        sorted_list_of_coords = sorted(list_of_coords, key=lambda x: x[0])
+        list_of_ranges = [set(range(coords[0], coords[1])) for coords in sorted_list_of_coords]
+        return [len(list_of_ranges[i].intersection(list_of_ranges[i+1])) for i in range(len(list_of_ranges)-1)]
+
+    random.seed(42)
+    for _ in range(500):
+        list_of_coords = []
+        for _ in range(random.randint(0, 6)):
+            start = random.randint(0, 300)
+            list_of_coords.append([start, start + random.randint(-5, 150)])
+
+        overlaps = set_overlaps(list_of_coords)
+        assert utils.get_check_overlap(list_of_coords) == overlaps
+        assert utils.check_overlap(list_of_coords) == any(overlap > 0 for overlap in overlaps)
+
+    assert utils.get_check_overlap([[0, 2000000], [1000000, 3000000]]) == [1000000]
+    assert not utils.check_overlap([[0, 100], [100, 200]])
+
+
+def test_get_contiguity_curves():
+    targets = [round(x, 2) for x in np.arange(0.0, 1.01, 0.01)]
+    for mapped_contigs in [[], [5000], [5000, 5000], [100, 2500, 40000, 700, 12000, 12000]]:
+        for reference_length in [1000, 50000, 100000]:
+            nax, ngx, lx = utils.get_contiguity_curves(
+                mapped_contigs, reference_length, targets)
+            assert list(nax) == [utils.get_Nx(mapped_contigs, x) for x in targets]
+            assert list(ngx) == [utils.get_NGx(mapped_contigs, reference_length, x) for x in targets]
+            assert list(lx) == [utils.get_Lx(mapped_contigs, reference_length, x) for x in targets]
+
+
 def test_parse_paf_files():
 
     references = (x[1] for x in groupby(
@@ -115,6 +214,34 @@ def test_parse_paf_files():
         assert alignment_dict['Longest_Alignment'] <= sum_contig_length
 
 
+def test_reference_catalogue(tmp_path):
+
+    # original reference, with wrapped sequence lines
+    reference_sequences = [(header, seq[:len(seq) // 3]) for header, seq in utils.fasta_iter(REFERENCE_TEST)]
+    with open(tmp_path / "reference.fasta", "w") as fh:
+        for header, seq in reference_sequences:
+            fh.write(">{} test replicon\n".format(header))
+            fh.write("\n".join(seq[i:i + 80] for i in range(0, len(seq), 80)) + "\n")
+
+    catalogue = utils.build_reference_catalogue(str(tmp_path / "reference.fasta"))
+    assert catalogue['source'] == "reference"
+    assert [reference['name'] for reference in catalogue['references']] == [
+        header for header, _ in reference_sequences]
+    for reference, (header, seq) in zip(catalogue['references'], reference_sequences):
+        assert reference['length'] == len(seq)
+        assert reference['gc'] == sum(seq.upper().count(base) for base in 'GC')
+        assert reference['n'] == seq.upper().count('N')
+
+    with open(tmp_path / "reference_catalogue.json", "w") as fh:
+        json.dump(catalogue, fh)
+    assert utils.load_reference_catalogue(str(tmp_path / "reference_catalogue.json")) == catalogue
+    assert utils.load_reference_catalogue(REFERENCE_TEST)['references'] == catalogue['references']
+
+    # same mapping information from the catalogue and from the triple reference
+    assert assembly_stats_mapping.parse_paf_file(MAPPING_TEST, str(tmp_path / "reference_catalogue.json")) == \
+        assembly_stats_mapping.parse_paf_file(MAPPING_TEST, REFERENCE_TEST)
+
+
 def test_get_mapping_stats():
 
     df = utils.parse_assemblies(
@@ -178,10 +305,62 @@ def test_get_mapping_stats():
     assert list(to_plot_phred['Assembler'].unique()) == ['pytest_assembler']
     assert sorted(list(to_plot_phred['Reference'].unique())) == sorted(reference_list)
 
+    # the mapping list is left unchanged, the phred score of each contig comes from its identity
+    phred_scores = dict(zip(zip(to_plot_phred['Reference'], to_plot_phred['Contig']),
+                            to_plot_phred['Phred Quality Score']))
     for alignment_dictitonary in alignment_dictitonary_list:
         for contig in alignment_dictitonary['Contigs']:
-            assert assembly_stats_mapping.get_phred_quality_score( alignment_dictitonary['Contigs'][contig]['Identity']) ==  alignment_dictitonary['Contigs'][contig]['Phred']
-            if alignment_dictitonary['Contigs'][contig]['Phred'] == 60:
-                assert alignment_dictitonary['Contigs'][contig]['Identity'] <= 1 # TODO: some cases identity > 1. How??? 
+            identity = alignment_dictitonary['Contigs'][contig]['Base_Matches'] / \
+                alignment_dictitonary['Contigs'][contig]['Length']
+            phred = phred_scores[(alignment_dictitonary['Reference'], contig)]
+            assert assembly_stats_mapping.get_phred_quality_score(identity) == phred
+            if phred == 60:
+                assert identity <= 1 # TODO: some cases identity > 1. How??? 
             else:
-                assert alignment_dictitonary['Contigs'][contig]['Identity'] < 1
\ No newline at end of file
+                assert identity < 1
+
+
+def test_batch_main(tmp_path, monkeypatch):
+
+    reference = os.path.abspath(REFERENCE_TEST)
+    assembly = os.path.abspath(ASSEMBLY_TEST)
+    mapping = os.path.abspath(MAPPING_TEST)
+    assemblers = ["pytest_assemblerA", "pytest_assemblerB"]
+
+    # one task per assembly
+    (tmp_path / "single").mkdir()
+    monkeypatch.chdir(tmp_path / "single")
+    for assembler in assemblers:
+        assembly_stats_mapping.main("pytest_sample", assembler, assembly, mapping, reference, 0.5, 0.9)
+
+    # all assemblies in one task, with a worker pool (and workers for the references of each assembly)
+    (tmp_path / "batch").mkdir()
+    monkeypatch.chdir(tmp_path / "batch")
+    assembly_stats_mapping.main("pytest_sample", assemblers, [assembly] * 2, [mapping] * 2, reference, 0.5, 0.9,
+                                cpus=4)
+
+    single_files = sorted(os.listdir(tmp_path / "single"))
+    assert single_files == sorted(os.listdir(tmp_path / "batch"))
+    assert len(single_files) == 14
+    for file_name in single_files:
+        assert (tmp_path / "single" / file_name).read_bytes() == (tmp_path / "batch" / file_name).read_bytes()
+
+
+def test_get_mapping_stats_parallel():
+
+    df = utils.parse_assemblies(
+        "pytest_sample", "pytest_assembler", ASSEMBLY_TEST, MAPPING_TEST)
+
+    mapping_list = assembly_stats_mapping.parse_paf_file(MAPPING_TEST, REFERENCE_TEST)
+
+    sequential = assembly_stats_mapping.mapping_stats(
+        "pytest_sample", "pytest_assembler", df, mapping_list, 0.5, 0.9)
+    parallel = assembly_stats_mapping.mapping_stats(
+        "pytest_sample", "pytest_assembler", df, mapping_list, 0.5, 0.9, cpus=3)
+
+    # same results, in the same order
+    for df_sequential, df_parallel in zip(sequential[:5], parallel[:5]):
+        assert df_sequential.equals(df_parallel)
+    assert json.dumps(sequential[5]) == json.dumps(parallel[5])
+    # the mapping list given to the workers is left unchanged
+    assert mapping_list == assembly_stats_mapping.parse_paf_file(MAPPING_TEST, REFERENCE_TEST)
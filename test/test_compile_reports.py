@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Module to test the LMAS report compilation
+
+Raises
+------
+pytest.fail
+    Status for the test (Pass or Fail)
+"""
+import json
+import tempfile
+from templates import compile_reports
+
+
+def test_write_plot_data(tmp_path, monkeypatch):
+
+    monkeypatch.chdir(tmp_path)
+
+    def plot(name):
+        return {"data": [{"type": "scatter", "x": [1, 2], "y": [3, 4], "name": name}], "layout": {"title": name}}
+
+    plot_files = {}
+    for plot_type in ("completness", "lx", "gaps"):
+        plot_json = {"S1": {"PlotData": {"RefA": [plot("old"), plot("S1_RefA_" + plot_type)],
+                                         "RefB": [plot("S1_RefB_" + plot_type)], "RefC": []}}}
+        if plot_type != "gaps":
+            plot_json["S2"] = {"PlotData": {"RefA": [plot("S2_RefA_" + plot_type)]}}
+        plot_files[plot_type] = plot_type + ".json"
+        with open(plot_files[plot_type], "w") as fh:
+            json.dump(plot_json, fh)
+
+    global_plots = []
+    for sample_id in ("S1", "S2"):
+        global_plots.append(sample_id + "_contig_size.json")
+        with open(global_plots[-1], "w") as fh:
+            json.dump(plot(sample_id + "_contig_size"), fh)
+
+    plot_index = {}
+    with tempfile.TemporaryFile() as spill_fh:
+        for sample_id in ("S1", "S2"):
+            plot_index[sample_id] = {"Global": {}}
+            compile_reports.add_global_plot(plot_index, spill_fh, sample_id, global_plots, "contig_size")
+        compile_reports.add_reference_plots(plot_index, spill_fh, plot_files["completness"], "completness",
+                                            replace=True)
+        compile_reports.add_reference_plots(plot_index, spill_fh, plot_files["lx"], "lx")
+        compile_reports.add_reference_plots(plot_index, spill_fh, plot_files["gaps"], "gaps", optional=True)
+
+        plot_scripts = compile_reports.write_plot_data(plot_index, spill_fh, "plots.json", "report_data")
+
+    expected = {sample_id: {"PlotData": {"Global": {"contig_size": plot(sample_id + "_contig_size")}}}
+                for sample_id in ("S1", "S2")}
+    for reference in ("RefA", "RefB"):
+        expected["S1"]["PlotData"][reference] = {plot_type: plot("S1_{}_{}".format(reference, plot_type))
+                                                 for plot_type in ("completness", "lx", "gaps")}
+    expected["S2"]["PlotData"]["RefA"] = {plot_type: plot("S2_RefA_" + plot_type)
+                                          for plot_type in ("completness", "lx")}
+
+    with open("plots.json") as fh:
+        plots_json = fh.read()
+
+    assert plots_json == json.dumps(expected, separators=(",", ":"))
+    assert plot_scripts == ["report_data/plots_S1.js", "report_data/plots_S2.js"]
@@ -10,7 +10,9 @@ pytest.fail
     Status for the test (Pass or Fail)
 """
 from templates.gap_assessment import get_gaps
+from templates import utils
 import pytest
+import random
 from contextlib import contextmanager
 try:
     from templates import gap_assessment
@@ -41,6 +43,7 @@ def not_raises(exception, msg):
 
 GAPS_PAF = "test/data/gaps/tiny.paf"
 GAPS_PAF_BAD = "test/data/gaps/tiny_bad.paf"
+ASSEMBLY_PAF = "test/data/assembly.paf"
 
 def test_get_gaps_simple():
 
@@ -74,3 +77,157 @@ def test_get_gaps_bad_assembly():
     assert len(gap_sizes) == len(gaps)
     for gap_size in gap_sizes:
         assert gap_size > 0 
+
+
+def test_get_covered_intervals():
+
+    # a single pass of the paf collects the coords of every reference, in file order
+    covered_intervals = gap_assessment.get_covered_intervals(ASSEMBLY_PAF)
+    paf_records = list(utils.iter_paf(ASSEMBLY_PAF, ['tname', 'tstart', 'tend']))
+
+    assert sorted(covered_intervals) == sorted(set(name for name, _, _ in paf_records))
+    for reference, intervals in covered_intervals.items():
+        assert intervals == [[start, end] for name, start, end in paf_records if name == reference]
+
+    assert gap_assessment.get_reference_gaps(covered_intervals["Bacillus_subtilis"], 4045677) == \
+        gap_assessment.get_gaps(ASSEMBLY_PAF, "Bacillus_subtilis", 4045677)
+
+
+def test_interval_stats_triple_reference():
+    """
+    The interval arithmetic must match the per-base folding of the triple reference coordinates
+    """
+    random.seed(42)
+    ref_len = 97
+    for _ in range(200):
+        intervals = []
+        for _ in range(random.randint(1, 8)):
+            start = random.randint(0, 3 * ref_len - 1)
+            intervals.append([start, random.randint(start + 1, 3 * ref_len)])
+
+        covered_bases = set()
+        n_bases = 0
+        for start, stop in intervals:
+            for base in range(start, stop):
+                covered_bases.add(utils.adjust_reference_coord(base, ref_len))
+                n_bases += 1
+        covered_bases = sorted(covered_bases)
+        expected_gaps = [[s, e] for s, e in zip(covered_bases, covered_bases[1:]) if s+1 < e]
+
+        covered, gaps, overlap = utils.get_interval_stats(intervals, ref_len)
+
+        assert covered == len(covered_bases)
+        assert gaps == expected_gaps
+        assert overlap == n_bases - len(covered_bases)
+
+
+def test_fold_coords():
+    """
+    The vectorised folding must match adjust_reference_coord, for the triple reference and for a
+    replicon followed by a shorter wrap-around overlap
+    """
+    ref_len = 97
+    triple_coords = list(range(0, 3 * ref_len + 1))
+    assert utils.fold_coords(triple_coords, ref_len).tolist() == \
+        [utils.adjust_reference_coord(coord, ref_len) for coord in triple_coords]
+    assert utils.fold_coords([0, 1, ref_len, ref_len + 1, 2 * ref_len, 3 * ref_len], ref_len).tolist() == \
+        [0, 1, ref_len, 1, ref_len, ref_len]
+
+    # replicon followed by an overlap of 20 bases, the same positions in the original reference
+    overlap_coords = list(range(ref_len - 10, ref_len + 20 + 1))
+    assert utils.fold_coords(overlap_coords, ref_len).tolist() == \
+        [utils.adjust_reference_coord(coord, ref_len) for coord in overlap_coords] == \
+        list(range(ref_len - 10, ref_len + 1)) + list(range(1, 21))
+
+    covered, gaps, _ = utils.get_interval_stats([[ref_len - 10, ref_len + 20]], ref_len)
+    assert covered == 30
+    assert gaps == [[19, ref_len - 10]]
+
+
+def test_get_track_coords():
+
+    starts = [590, 10, 300, 30]
+    stops = [600, 20, 310, 40]
+    texts = ['d', 'a', 'c', 'b']
+
+    # every segment is drawn, sorted and separated by None
+    x_values, y_values, text_values = utils.get_track_coords(starts, stops, texts, 2, 'merged: {}')
+    assert x_values == [10, 20, None, 30, 40, None, 300, 310, None, 590, 600, None]
+    assert y_values == [2, 2, None] * 4
+    assert text_values == ['a', 'a', None, 'b', 'b', None, 'c', 'c', None, 'd', 'd', None]
+
+    # above the maximum number of segments, the segments closer than span / max_segments are merged
+    x_values, y_values, text_values = utils.get_track_coords(starts, stops, texts, 2, 'merged: {}', max_segments=3)
+    assert x_values == [10, 40, None, 300, 310, None, 590, 600, None]
+    assert text_values == ['merged: 2', 'merged: 2', None, 'c', 'c', None, 'd', 'd', None]
+
+    random.seed(42)
+    starts = [random.randint(0, 10**6) for _ in range(50000)]
+    stops = [start + random.randint(1, 1000) for start in starts]
+    segments = utils.get_track_segments(starts, stops, max_segments=1000)
+    assert len(segments) <= 1001
+    assert sum(segment[3] for segment in segments) == 50000
+
+    # a block wrapping around the end of the reference (start > stop once folded) is drawn as two segments
+    x_values, _, text_values = utils.get_track_coords([90, 30], [10, 40], ['wrap', 'b'], 0, 'merged: {}',
+                                                      ref_len=100)
+    assert x_values == [1, 10, None, 30, 40, None, 90, 100, None]
+    assert text_values == ['wrap', 'wrap', None, 'b', 'b', None, 'wrap', 'wrap', None]
+
+
+def test_get_coverage_steps():
+
+    assert utils.get_coverage_steps([], 100) == []
+    # overlapping and adjacent intervals, a single base run and the uncovered regions up to the reference length
+    assert utils.get_coverage_steps([[10, 19], [15, 24], [25, 30], [40, 40]], 100) == \
+        [(0, 0), (9, 0), (10, 1), (14, 1), (15, 2), (19, 2), (20, 1), (30, 1), (31, 0), (39, 0), (40, 1),
+         (41, 0), (100, 0)]
+    assert utils.get_coverage_steps([[0, 9], [5, 99]], 100) == [(0, 1), (4, 1), (5, 2), (9, 2), (10, 1), (99, 1)]
+    # an interval wrapping around the end of the reference covers its end and its start, never a negative depth
+    assert utils.get_coverage_steps([[90, 10], [30, 40]], 100) == \
+        [(0, 0), (1, 1), (10, 1), (11, 0), (29, 0), (30, 1), (40, 1), (41, 0), (89, 0), (90, 1), (100, 1)]
+    assert utils.get_coverage_steps([[90, 10], [95, 5]], 100) == \
+        [(0, 0), (1, 2), (5, 2), (6, 1), (10, 1), (11, 0), (89, 0), (90, 1), (94, 1), (95, 2), (100, 2)]
+
+    # the runs of the step function match the per base depth
+    random.seed(42)
+    ref_len = 500
+    intervals = []
+    for _ in range(50):
+        start = random.randint(0, ref_len - 1)
+        intervals.append([start, min(ref_len - 1, start + random.randint(0, 60))])
+    depth = [0] * ref_len
+    for start, stop in intervals:
+        for base in range(start, stop + 1):
+            depth[base] += 1
+
+    steps = utils.get_coverage_steps(intervals, ref_len)
+    assert [position for position, _ in steps] == sorted(set(position for position, _ in steps))
+    for position, value in steps:
+        assert depth[position] == value if position < ref_len else value == 0
+    for (start, value), (next_start, next_value) in zip(steps, steps[1:]):
+        if value == next_value:
+            assert depth[start:next_start + 1] == [value] * (next_start + 1 - start) or next_start == ref_len
+        else:
+            assert next_start == start + 1
+
+
+def test_group_rows():
+
+    import pandas as pd
+
+    frame = pd.DataFrame({'Sample': ['S1', 'S1', 'S2', 'S1', 'S1'],
+                          'Reference': ['ref_A', 'ref_B', 'ref_A', 'ref_A', 'ref_A'],
+                          'Assembler': ['SPAdes', 'SPAdes', 'SPAdes', 'MEGAHIT', 'SPAdes'],
+                          'Gap Start': [10, 20, 30, 40, 50]})
+    groups = utils.group_rows(frame)
+
+    assert list(groups.keys()) == [('S1', 'ref_A', 'SPAdes'), ('S1', 'ref_B', 'SPAdes'), ('S2', 'ref_A', 'SPAdes'),
+                                   ('S1', 'ref_A', 'MEGAHIT')]
+    # same rows, in the same order, as the boolean mask for each combination
+    for (sample, reference, assembler), rows in groups.items():
+        mask = (frame['Sample'] == sample) & (frame['Reference'] == reference) & (frame['Assembler'] == assembler)
+        assert rows.equals(frame[mask])
+    assert ('S2', 'ref_B', 'SPAdes') not in groups
+
+    assert list(utils.group_rows(frame, ('Sample', 'Assembler'))[('S1', 'SPAdes')]['Gap Start']) == [10, 20, 50]
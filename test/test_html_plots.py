@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Module to test the LMAS writing of the standalone HTML plots
+
+Raises
+------
+pytest.fail
+    Status for the test (Pass or Fail)
+"""
+import os
+import json
+import pytest
+from templates import utils
+
+go = pytest.importorskip("plotly.graph_objects")
+
+PLOTLYJS_CDN = 'src="https://cdn.plot.ly/plotly-'
+PLOTLYJS_DIRECTORY = 'src="plotly.min.js"'
+
+
+def get_html_plots():
+
+    dict_figure = {"data": [{"type": "scatter", "x": [1, 2], "y": [3, 4], "name": "dict"}],
+                   "layout": {"title": {"text": "dict"}}}
+    go_figure = go.Figure(go.Scatter(x=[1, 2], y=[4, 3], name="figure"))
+    return [("S1_RefA_dict.html", dict_figure), ("S1_RefA_figure.html", go_figure)]
+
+
+@pytest.mark.parametrize("html_mode", ["standalone", "directory", "cdn", "none"])
+def test_write_html_plots(tmp_path, monkeypatch, html_mode):
+
+    monkeypatch.chdir(tmp_path)
+
+    utils.write_html_plots(get_html_plots(), html_mode, cpus=2)
+
+    html_files = ["S1_RefA_dict.html", "S1_RefA_figure.html"]
+    if html_mode == 'none':
+        assert os.listdir(tmp_path) == []
+        return
+
+    # a single plotly.js file is shared by all the plots in the 'directory' mode
+    expected_files = html_files + ["plotly.min.js"] if html_mode == 'directory' else html_files
+    assert sorted(os.listdir(tmp_path)) == sorted(expected_files)
+
+    for html_file, name in zip(html_files, ["dict", "figure"]):
+        with open(html_file) as fh:
+            html = fh.read()
+        assert '"name":"{}"'.format(name) in html
+        assert (PLOTLYJS_DIRECTORY in html) == (html_mode == 'directory')
+        assert (PLOTLYJS_CDN in html) == (html_mode == 'cdn')
+        # only the standalone plots embed the plotly.js library
+        assert (len(html) > 1000000) == (html_mode == 'standalone')
+
+
+def test_plot_template_html_mode(tmp_path, monkeypatch):
+
+    monkeypatch.chdir(tmp_path)
+    from templates import lx_plot
+
+    lx_files = []
+    for sample_id in ("S1", "S2"):
+        lx_files.append("{}_spades_lx.csv".format(sample_id))
+        with open(lx_files[-1], "w") as fh:
+            fh.write(",Reference,Assembler,Lx,nContigs\n")
+            for i, n_contigs in enumerate([0, 1, 3]):
+                fh.write("{0},RefA,spades,{0},{1}\n".format(i, n_contigs))
+
+    lx_plot.main(lx_files, 0.9, 'linear', html_mode='directory', cpus=2)
+
+    assert sorted(os.listdir(tmp_path)) == sorted(lx_files + ["lx.json", "plotly.min.js",
+                                                              "S1_RefA_lx.html", "S2_RefA_lx.html"])
+    with open("lx.json") as fh:
+        assert sorted(json.load(fh)) == ["S1", "S2"]
+    with open("S1_RefA_lx.html") as fh:
+        assert PLOTLYJS_DIRECTORY in fh.read()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Module to test the import time of the LMAS templates. Every template is started once per task, so the
+templates that do not build plots should not load the heavy libraries (pandas, numpy, plotly, scipy,
+pyarrow) before they are needed.
+
+Raises
+------
+pytest.fail
+    Status for the test (Pass or Fail)
+"""
+import os
+import subprocess
+import sys
+import pytest
+
+HEAVY_MODULES = {'pandas', 'numpy', 'plotly', 'scipy', 'pyarrow'}
+
+# templates that build plots, which need plotly (and pandas) for their whole run
+PLOT_TEMPLATES = {'completness_plot', 'lx_plot', 'nax_plot', 'ngx_plot', 'plot_contig_size', 'plot_gap_reference',
+                  'plot_gap_sizes', 'plot_misassembly', 'plot_snp', 'process_misassembly', 'shrimp_plot'}
+
+TEMPLATES = sorted(os.path.splitext(template)[0] for template in os.listdir("templates")
+                   if template.endswith(".py") and template != "__init__.py")
+
+
+def import_time(module):
+    """
+    Imports a module in a new interpreter with `python -X importtime`.
+    :param module: string with the module name
+    :return: dict with the cumulative import time (in microseconds) of every module imported
+    """
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", "import {}".format(module)],
+                             stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    imported = {}
+    for line in process.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                imported[name.strip()] = int(cumulative)
+    return imported
+
+
+@pytest.mark.parametrize("template", [template for template in TEMPLATES if template not in PLOT_TEMPLATES])
+def test_template_lazy_imports(template):
+
+    imported = import_time("templates." + template)
+    heavy = sorted(name for name in imported if name.split('.')[0] in HEAVY_MODULES)
+
+    assert not heavy, "templates.{} imports {} at load time ({:.0f} ms)".format(
+        template, ', '.join(sorted(set(name.split('.')[0] for name in heavy))),
+        imported["templates." + template] / 1000)
@@ -195,3 +195,23 @@ def test_make_df():
     #bubu = misassembly.make_df('pytest_sample', 'pytest', classified_mis_dict, filter_paf_dict)
     #print(bubu)
 """
+
+
+def test_make_plot_table(tmp_path, monkeypatch):
+    """
+    test module to write the misassembled contigs table used to build the global plot
+    """
+    pytest.importorskip("pyarrow")
+    from templates import utils
+
+    paf_dict = misassembly.parse_paf(MISASSEMBLY_PAF_FILE_ALL)
+    classified_mis_dict = classify_misassembled_contigs(misassembly.filter_dict(paf_dict))
+
+    monkeypatch.chdir(tmp_path)
+    misassembly.make_plot_table(classified_mis_dict, 'pytest_sample', 'pytest')
+    table = utils.read_parquet('pytest_sample_pytest_misassembled_contigs.parquet')
+
+    assert table['Contig ID'] == list(classified_mis_dict.keys())
+    assert table['Contig Length'] == [value['contig length'] for value in classified_mis_dict.values()]
+    assert table['n blocks'] == [value['n blocks'] for value in classified_mis_dict.values()]
+    assert table['Misassembly'] == [value['misassembly'] for value in classified_mis_dict.values()]
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Module to test the LMAS read counting
+
+Raises
+------
+pytest.fail
+    Status for the test (Pass or Fail)
+"""
+import gzip
+import io
+import json
+import pytest
+from templates import utils
+from templates import process_reads
+
+
+@pytest.mark.parametrize("compressed", [False, True])
+@pytest.mark.parametrize("trailing_newline", [False, True])
+def test_count_lines(tmp_path, compressed, trailing_newline):
+
+    records = ''.join("@read{}/1\nACGTACGTAC\n+\nIIIIIIIIII\n".format(i) for i in range(1000))
+    if not trailing_newline:
+        records = records[:-1]
+
+    fastq = str(tmp_path / ("reads_1.fq.gz" if compressed else "reads_1.fq"))
+    with (gzip.open(fastq, 'wt') if compressed else open(fastq, 'w')) as fh:
+        fh.write(records)
+
+    with (gzip.open(fastq, 'rb') if compressed else open(fastq, 'rb')) as fh:
+        expected = sum(1 for line in fh)
+
+    # small chunks, so that the records are split between chunks
+    assert utils.count_lines(fastq, chunk_size=1000) == expected == 4000
+    assert utils.count_lines(fastq) == expected
+
+
+def test_reads_report(tmp_path, monkeypatch):
+
+    with gzip.open(str(tmp_path / "pytest_1.fq.gz"), 'wt') as fh:
+        fh.write(''.join("@read{}/1\nACGT\n+\nIIII\n".format(i) for i in range(250)))
+
+    monkeypatch.chdir(tmp_path)
+    process_reads.main("pytest", [str(tmp_path / "pytest_1.fq.gz")])
+
+    with open("pytest_reads_report.json") as fh:
+        assert json.load(fh) == {"pytest": {"reads": 250}}
+    assert utils.load_read_count("pytest_reads_report.json", "pytest") == 250
+
+
+def test_count_mapped_reads():
+
+    sam_lines = ["@SQ\tSN:contig1\tLN:5000\n",
+                 "read1\t99\tcontig1\t11\t60\t150M\t=\t200\t340\t*\t*\n",
+                 "read1\t147\tcontig2\t1\t60\t120M30S\t=\t11\t-340\t*\t*\n",  # same name, other mate
+                 "read1\t2147\tcontig3\t1\t60\t120H30M\t*\t0\t0\t*\t*\n",  # supplementary
+                 "read2\t73\tcontig1\t901\t60\t100M50S\t*\t0\t0\t*\t*\n",  # under the threshold
+                 "read2\t133\t*\t0\t0\t*\tcontig1\t901\t0\t*\t*\n",  # unmapped mate
+                 "read3\t89\tcontig3\t1\t0\t90M2I8M\t*\t0\t0\t*\t*\n"]
+
+    # both mates of read1 are counted, as reads and not as pairs
+    assert utils.count_mapped_reads(sam_lines, 0.75) == (3, 3, None)
+    assert utils.count_mapped_reads(sam_lines, 0.5) == (4, 4, None)
+    assert utils.count_mapped_reads([], 0.75) == (0, 0, None)
+
+    # reads mapped to a subset of the contigs (e.g. the contigs over the minimum length)
+    assert utils.count_mapped_reads(sam_lines, 0.75, contig_subset={'contig2', 'contig3'}) == (3, 3, 2)
+    assert utils.count_mapped_reads(sam_lines, 0.75, contig_subset={'contig1'}) == (3, 3, 1)
+    assert utils.count_mapped_reads(sam_lines, 0.75, contig_subset=set()) == (3, 3, 0)
+
+    # the records can be written while they are counted
+    sam_handle = io.StringIO()
+    utils.count_mapped_reads(sam_lines, 0.75, sam_handle)
+    assert sam_handle.getvalue() == ''.join(sam_lines)
@@ -12,6 +12,8 @@ pytest.fail
 import pytest
 import re
 from contextlib import contextmanager
+from templates import utils
+from templates import snp_assessment
 
 @contextmanager
 def not_raises(exception, msg):
@@ -39,6 +41,7 @@ def not_raises(exception, msg):
 CIGAR_PERFECT_MATCH = "cs:Z::8029"
 CIGAR_SUBSTITUTION = "cs:Z::935*ct:32*ct:117*ga:23*at:204"
 CIGAR_SUBSTITUTION_DELETION = "cs:Z::329-gttgctccggttgctcccgttactccagttactccagttgcgccagcttccccggttgcaccagttactcctgttgctccagttgatcctgttaaccctgttgatcctgtttctcccgttgctccagttggacctgttgatcccgttacgccagttgctccggttgcaccagttgttcccgttgctcctgttgatcccgttgctccagtttccccggttgcaccagttgatcccgttgctcctgttgatcctgtttccccggttgcaccagttactcccgttgctccagttgcaccagtggcaccagttactcccgttactcccgttactcccgttactcccgttgcgccagtttccccggttgcaccagttgatccc:5*ta:2*ta:4*at:17*ca:3*ac:25184"
+SNPS_PAF = "test/data/assembly.paf"
 
 
 def get_snps(cigar):
@@ -75,4 +78,60 @@ def test_substitution():
 
 def test_substitution_deletion():
     snps = get_snps(CIGAR_SUBSTITUTION_DELETION)
-    assert sum(1 for _ in snps) == len(re.findall(r'\*', CIGAR_SUBSTITUTION_DELETION))
\ No newline at end of file
+    assert sum(1 for _ in snps) == len(re.findall(r'\*', CIGAR_SUBSTITUTION_DELETION))
+
+def test_parse_cs_operations():
+    """
+    The single pass cs tag parser must match the regular expressions used before, for all the cs tags
+    """
+    cigar_indels = "cs:Z::120+ag:30-tc*ga:7-a:12+ttt*ct:3"
+
+    for cigar in [CIGAR_PERFECT_MATCH, CIGAR_SUBSTITUTION, CIGAR_SUBSTITUTION_DELETION, cigar_indels]:
+        exact_matches, substitutions, insertions, deletions = utils.parse_cs_operations(cigar, 100)
+
+        assert exact_matches == sum(map(int, re.findall(r':([\d]+)', cigar)))
+        assert len(substitutions) == len(re.findall(r'\*', cigar))
+        assert [bases for _, bases in substitutions] == re.findall(r'\*([a-z]+)', cigar)
+        assert insertions == [len(bases) for bases in re.findall(r'\+([a-z]+)', cigar)]
+        assert deletions == [len(bases) for bases in re.findall(r'-([a-z]+)', cigar)]
+
+        assert utils.parse_cs(cigar) == (exact_matches, len(substitutions),
+                                         ['+' + str(length) for length in insertions] +
+                                         ['-' + str(length) for length in deletions])
+        assert utils.cs_parse_deletion(cigar) == sum(deletions)
+        assert utils.cs_get_matched_bases(cigar) == exact_matches
+
+    # reference positions of the substitutions, after the exact matches and deletions
+    _, substitutions, _, _ = utils.parse_cs_operations(cigar_indels, 100)
+    assert substitutions == [(100 + 120 + 30 + 2 + 1, 'ga'), (100 + 120 + 30 + 2 + 1 + 7 + 1 + 12 + 1, 'ct')]
+
+
+def test_get_snps_all_references():
+    """
+    The single pass over the paf file must give, for each reference, the folded substitutions of its own alignments
+    """
+    reference_lengths = {}
+    with open(SNPS_PAF) as paf:
+        for line in paf:
+            parts = line.split('\t')
+            reference_lengths[parts[5]] = int(parts[6]) // 3
+    # alignments to references not in the catalogue are ignored
+    ignored_reference = 'Escherichia_coli'
+    all_snps = snp_assessment.get_snps(SNPS_PAF, {reference: length for reference, length in reference_lengths.items()
+                                                  if reference != ignored_reference})
+
+    assert ignored_reference not in all_snps
+    assert sum(len(snps) for snps in all_snps.values()) > 0
+    for reference, ref_len in reference_lengths.items():
+        if reference == ignored_reference:
+            continue
+        expected_snps = []
+        with open(SNPS_PAF) as paf:
+            for line in paf:
+                parts = line.rstrip('\n').split('\t')
+                if parts[5] != reference:
+                    continue
+                start = int(parts[7]) if parts[4] == '+' else int(parts[8])
+                for coord, substitution in snp_assessment.get_position(start, None, parts[-1]):
+                    expected_snps.append((utils.adjust_reference_coord(coord, ref_len), substitution))
+        assert all_snps.get(reference, []) == expected_snps